@@ -0,0 +1,128 @@
+# Thread capture kamera dengan ring buffer frame terbaru
+# File ini berisi CapturedFrame (frame + nomor urut + waktu capture) dan FrameGrabber (thread grab/retrieve)
+# Tujuan: Kamera dibaca terus-menerus di thread sendiri, preview dan OCR selalu mengambil frame terbaru
+#         (frame lama dilewati), sehingga preview yang lambat tidak menahan kamera dan OCR tidak memproses frame basi
+import threading  #Import threading untuk thread capture dan condition frame baru
+import time  #Import time untuk timestamp monotonic dan umur frame
+from collections import deque  #Import deque untuk ring buffer frame (maxlen)
+
+from frame_views import FrameViews  #Import cache turunan frame (crop, resize, edge, split) dipakai bersama preview dan OCR
+
+
+class CapturedFrame:
+    # 1 frame hasil capture: nomor urut (naik terus), waktu capture (time.monotonic), dan numpy array BGR
+    # Frame dari cap.retrieve() adalah array baru per frame, consumer tidak boleh mengubahnya (copy dulu jika perlu)
+    # views: turunan frame (crop, edge, resize, split canvas) yang dihitung lazy dan dipakai bersama preview dan OCR
+
+    __slots__ = ('sequence', 'timestamp', 'frame', 'views')
+
+    def __init__(self, sequence, timestamp, frame):
+        self.sequence = sequence
+        self.timestamp = timestamp
+        self.frame = frame
+        self.views = FrameViews(frame)
+
+    def age(self, now=None):
+        # Return: umur frame dalam detik sejak di-capture
+        return (now if now is not None else time.monotonic()) - self.timestamp
+
+
+class FrameGrabber(threading.Thread):
+    # Thread yang hanya menjalankan cap.grab() + cap.retrieve() ke ring buffer kecil
+    # Consumer (preview, OCR) memanggil latest(): selalu dapat frame paling baru, frame di antaranya dianggap dropped
+
+    def __init__(self, cap, ring_size=3):
+        super().__init__(name="FrameGrabber", daemon=True)
+        self.cap = cap
+        self._ring = deque(maxlen=max(1, ring_size))  #Frame terakhir (paling baru di kanan)
+        self._condition = threading.Condition()  #Notify consumer saat ada frame baru / grabber berhenti
+        self._running = True
+        self._sequence = 0  #Nomor urut frame berikutnya
+        self.failed = False  #True jika kamera gagal dibaca (grab/retrieve gagal)
+        self._started_at = None  #Waktu frame pertama (untuk hitung fps)
+        self._consumers = {}  #Nama consumer -> statistik (frame diambil, frame dilewati, umur frame)
+
+    def run(self):
+        while self._running:
+            # grab() mengambil frame dari driver, retrieve() decode (dipisah agar grab tidak tertahan decode lain)
+            ok = self.cap.grab()
+            if ok:
+                ok, frame = self.cap.retrieve()
+            if not ok or frame is None:
+                if self._running:
+                    self.failed = True  #Kamera terputus / gagal dibaca
+                break
+
+            now = time.monotonic()
+            with self._condition:
+                if self._started_at is None:
+                    self._started_at = now
+                self._ring.append(CapturedFrame(self._sequence, now, frame))
+                self._sequence += 1
+                self._condition.notify_all()
+
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()  #Bangunkan consumer yang sedang menunggu frame
+
+    def stop(self, timeout=1.0):
+        # Fungsi hentikan thread capture dan tunggu sampai grab() terakhir selesai (sebelum cap.release())
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self.is_alive() and threading.current_thread() is not self:
+            self.join(timeout)
+
+    @property
+    def running(self):
+        return self._running
+
+    def latest(self, after_sequence=-1, timeout=None, consumer=None):
+        # Fungsi ambil frame paling baru yang lebih baru dari after_sequence
+        # Parameter: after_sequence (nomor urut frame terakhir yang sudah diproses consumer, -1 = frame apa saja),
+        #            timeout (detik menunggu frame baru, None = tunggu terus), consumer (nama untuk statistik umur/dropped)
+        # Return: CapturedFrame, atau None jika timeout / grabber sudah berhenti
+        with self._condition:
+            if not self._condition.wait_for(
+                    lambda: (self._ring and self._ring[-1].sequence > after_sequence) or not self._running,
+                    timeout):
+                return None
+            if not self._ring or self._ring[-1].sequence <= after_sequence:
+                return None  #Grabber berhenti tanpa frame baru
+            captured = self._ring[-1]
+            if consumer is not None:
+                self._record(consumer, captured, after_sequence)
+            return captured
+
+    def _record(self, consumer, captured, after_sequence):
+        # Update statistik consumer (dipanggil dengan lock): frame yang dilewati dan umur frame saat diambil
+        stats = self._consumers.setdefault(consumer, {'frames': 0, 'dropped': 0, 'age_total': 0.0, 'age_last': 0.0, 'age_max': 0.0})
+        if after_sequence >= 0:
+            stats['dropped'] += max(0, captured.sequence - after_sequence - 1)
+        age = captured.age()
+        stats['frames'] += 1
+        stats['age_total'] += age
+        stats['age_last'] = age
+        stats['age_max'] = max(stats['age_max'], age)
+
+    def get_stats(self):
+        # Return: dictionary statistik capture (fps, jumlah frame) dan per consumer (dropped, umur frame dalam ms)
+        with self._condition:
+            now = time.monotonic()
+            elapsed = (now - self._started_at) if self._started_at is not None else 0.0
+            stats = {
+                'captured': self._sequence,
+                'fps': round(self._sequence / elapsed, 1) if elapsed > 0 else 0.0,
+                'latest_age_ms': round(self._ring[-1].age(now) * 1000, 1) if self._ring else None,
+                'consumers': {},
+            }
+            for name, consumer in self._consumers.items():
+                frames = consumer['frames']
+                stats['consumers'][name] = {
+                    'frames': frames,
+                    'dropped': consumer['dropped'],
+                    'age_avg_ms': round(consumer['age_total'] / frames * 1000, 1) if frames else 0.0,
+                    'age_last_ms': round(consumer['age_last'] * 1000, 1),
+                    'age_max_ms': round(consumer['age_max'] * 1000, 1),
+                }
+            return stats
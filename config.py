@@ -23,6 +23,32 @@ IMAGE_DIR = "images"  # Direktori untuk menyimpan gambar scan | Folder tempat sc
 EXCEL_DIR = "file_excel"  # Direktori untuk menyimpan file Excel export | Folder tempat file export di-save
 DB_FILE = "detection.db"  # File database SQLite | Database file untuk menyimpan semua deteksi
 
+# === KONEKSI DATABASE ===
+# 1 koneksi writer yang dipakai terus + pool koneksi read-only, journal mode WAL
+# Tujuan: Export/query panjang tidak memblokir insert deteksi live (reader dan writer jalan bersamaan)
+DB_SYNCHRONOUS = "NORMAL"  # PRAGMA synchronous | NORMAL aman untuk WAL dan jauh lebih cepat dari FULL
+DB_CACHE_SIZE_KB = 16384  # PRAGMA cache_size per koneksi (KB)
+DB_BUSY_TIMEOUT_MS = 5000  # Waktu tunggu jika database sedang di-lock (ms)
+DB_READER_POOL_SIZE = 4  # Jumlah koneksi read-only yang disimpan di pool
+DB_STATEMENT_CACHE = 256  # Jumlah prepared statement yang di-cache per koneksi
+
+# === PENYIMPANAN DETEKSI (WRITE-BEHIND) ===
+# Gambar dan record deteksi disimpan oleh writer thread, bukan di thread OCR
+# Tujuan: Hasil OK/Not OK langsung tampil, disk I/O dan commit database tidak menahan scan
+PERSIST_QUEUE_SIZE = 256  # Maksimal deteksi yang menunggu disimpan | Jika penuh, thread OCR menunggu (data tidak dibuang)
+PERSIST_BATCH_SIZE = 32  # Maksimal record per executemany + commit
+PERSIST_COMMIT_INTERVAL = 0.5  # Jeda maksimal (detik) sebelum record yang sudah masuk antrian di-commit
+PERSIST_RETRY_INTERVAL = 1.0  # Jeda awal (detik) sebelum record yang gagal di-commit dicoba lagi | Digandakan setiap gagal
+PERSIST_RETRY_MAX_INTERVAL = 10.0  # Jeda retry maksimal (detik) | Record gagal tidak dibuang, dicoba terus sampai berhasil
+PERSIST_FLUSH_TIMEOUT = 2.0  # Waktu tunggu maksimal (detik) flush dari UI thread (hapus data / refresh) | Jika lewat, aksi dibatalkan
+
+# === DEDUPLIKASI GAMBAR ===
+# Gambar yang isinya sama (hash SHA-256 dari file JPEG) hanya disimpan 1 kali, dipakai bersama oleh banyak record
+# Tujuan: Karton yang sama disimpan berulang tidak menambah file baru di folder images
+IMAGE_DEDUP_ENABLED = True  # Aktifkan deduplikasi gambar berdasarkan isi file
+IMAGE_DEDUP_PERCEPTUAL = False  # Juga anggap sama jika perceptual hash (dHash gambar edge) sama | Gabung gambar yang hampir identik
+IMAGE_DEDUP_HASH_SIZE = 8  # Ukuran grid dHash (8 = hash 64 bit)
+
 # === KAMERA ===
 # PENGATURAN untuk konfigurasi kamera dan pengolahan frame
 # Tujuan: Define camera resolution dan processing parameters
@@ -34,6 +60,62 @@ BUFFER_SIZE = 1  # Ukuran buffer kamera (untuk mengurangi lag) | Jumlah frame ya
 SCAN_INTERVAL = 2.0  # Interval scan OCR (detik) | Berapa lama tunggu sebelum scan ulang
 MAX_CAMERAS = 5  # Maksimal kamera yang dicek | Berapa banyak index kamera yang di-test
 
+# === CAPTURE THREAD ===
+# PENGATURAN untuk thread capture kamera (capture.FrameGrabber)
+# Tujuan: Kamera dibaca di thread sendiri, preview dan OCR selalu memakai frame terbaru (frame lama dilewati)
+CAPTURE_RING_SIZE = 3  # Jumlah frame terakhir yang disimpan di ring buffer | Frame lebih lama otomatis dibuang
+CAPTURE_READ_TIMEOUT = 1.0  # Waktu tunggu frame baru (detik) | Jika lewat, kamera dianggap berhenti mengirim frame
+
+# === PREVIEW ===
+# PENGATURAN untuk kecepatan kirim frame preview ke UI (preview.PreviewScheduler)
+# Tujuan: Preview tidak melebihi kemampuan UI menampilkan frame, dan CPU diprioritaskan ke OCR saat scan berjalan
+PREVIEW_MAX_FPS = 30  # Batas fps preview normal | 0 = tanpa batas (ikuti kamera)
+PREVIEW_SCAN_FPS = 10  # Batas fps preview saat scan OCR sedang berjalan | Lebih rendah agar CPU dipakai OCR
+PREVIEW_ACK_TIMEOUT = 0.5  # Waktu tunggu maksimal UI selesai menampilkan frame (detik) | Setelah itu frame baru tetap dikirim
+
+# === OCR ENGINE ===
+# PENGATURAN untuk EasyOCR reader yang dipakai bersama oleh semua sesi deteksi
+# Tujuan: Model detector dan recognizer cukup di-load sekali per proses aplikasi
+OCR_LANGUAGES = ['en']  # Bahasa model EasyOCR | Hanya English karena kode baterai alfanumerik
+OCR_USE_GPU = True  # Gunakan GPU jika tersedia | EasyOCR otomatis fallback ke CPU jika CUDA tidak ada
+OCR_STAGED_MODE = True  # Deteksi text box sekali per frame, recognizer saja per preprocessing stage
+OCR_RECOGNIZER_BATCH_SIZE = 32  # Batch size recognizer | Semua crop dari semua stage diproses dalam 1 panggilan
+OCR_CASCADE_MODE = True  # Jalankan stage pertama dulu dan berhenti jika ada kandidat yang cukup yakin | Staged mode: sisa stage 1 batch recognizer
+CASCADE_MIN_MATCH_SCORE = 0.95  # Skor fuzzy match minimal untuk early-exit | 1.0 = sama persis dengan label
+CASCADE_MIN_CONFIDENCE = 0.60  # Confidence OCR minimal untuk early-exit | Diabaikan jika OCR tanpa confidence (paragraph DIN)
+
+# === SELF-TUNING URUTAN STAGE ===
+# Statistik menang/latency per stage (per preset dan label) untuk mengurutkan ulang stage cascade
+# Tujuan: Stage yang paling sering menghasilkan match dijalankan lebih dulu, stage yang jarang membantu dilewati
+STAGE_TUNING_ENABLED = True  # Aktifkan pengurutan stage otomatis
+STAGE_TUNING_MIN_SCANS = 20  # Jumlah scan minimal per preset+label sebelum urutan default diubah
+STAGE_DROP_MIN_RUNS = 30  # Stage baru boleh dilewati setelah dijalankan minimal sebanyak ini
+STAGE_DROP_WIN_RATE = 0.02  # Stage dengan win rate di bawah ini dilewati (kecuali saat eksplorasi)
+STAGE_EXPLORE_EVERY = 25  # Setiap N scan, semua stage dijalankan dengan urutan default (eksplorasi)
+STAGE_STATS_FLUSH_EVERY = 20  # Simpan statistik ke database setiap N scan
+
+# === CACHE HASIL MATCHING TEXT OCR ===
+# Text mentah OCR yang sama (mis. "50D23L", "5OD23L") muncul berulang di frame berikutnya
+# Tujuan: Hasil koreksi + fuzzy matching (label, score) disimpan per preset dan text mentah
+MATCH_CACHE_SIZE = 4096  # Jumlah maksimal text yang disimpan | Entry paling lama tidak dipakai dibuang lebih dulu
+
+# === DUPLICATE SUPPRESSION (LIVE CAMERA) ===
+# Code yang sama tidak disimpan lagi jika masih dalam window sejak terakhir disimpan
+DUPLICATE_WINDOW = 5.0  # Window duplicate dalam detik | Dihitung dengan waktu monotonic (tidak terpengaruh ubah jam sistem)
+
+# === EXPORT EXCEL ===
+# Export membaca hasil query per chunk dan menulis baris langsung ke file (xlsxwriter constant_memory)
+# Tujuan: Export 1 bulan tetap memakai memory terbatas (tidak ada DataFrame / workbook penuh di memory)
+EXPORT_FETCH_SIZE = 500  # Jumlah row yang diambil dari cursor database per chunk
+EXPORT_THUMBNAIL_WORKERS = None  # Jumlah process untuk render thumbnail | None = jumlah CPU - 1, 0 = render di thread export (tanpa process pool)
+THUMBNAIL_MAX_WIDTH = 210  # Lebar maksimal thumbnail di kolom Image (pixels) | 30 karakter * 7 pixel
+THUMBNAIL_MAX_HEIGHT = 150  # Tinggi maksimal thumbnail / row Excel (pixels)
+THUMBNAIL_AT_DETECTION = True  # Buat thumbnail export (dengan caption) saat deteksi disimpan | Export tidak perlu render ulang
+THUMBNAIL_BACKFILL_BATCH = 200  # Jumlah gambar per batch saat backfill thumbnail record lama (python thumbnails.py)
+EXPORT_FORMATS = ["Excel", "CSV", "Parquet"]  # Format export di dialog | CSV/Parquet: log mentah tanpa gambar (path gambar sebagai referensi)
+EXPORT_TABULAR_FETCH_SIZE = 50000  # Jumlah row per chunk untuk export CSV/Parquet (1 chunk = 1 row group Parquet)
+EXPORT_PARQUET_COMPRESSION = "zstd"  # Kompresi file Parquet | Butuh library pyarrow (opsional: pip install pyarrow)
+
 # === PENGATURAN RESAMPLING GAMBAR (KOMPATIBILITAS PILLOW) ===
 # Pillow adalah library Python yang digunakan untuk mengolah gambar,
 # seperti membaca, mengubah ukuran, dan memproses gambar.
@@ -1,8 +1,101 @@
 # Operasi database SQLite untuk menyimpan dan mengambil data deteksi
 # File ini berisi semua fungsi database untuk CRUD operations dan migrasi schema
 import sqlite3  #Import library SQLite untuk database operations
-from datetime import datetime  #Modul untuk date/time handling
-from config import DB_FILE  #Import path database file dari config.py
+import threading  #Import threading untuk lock setup database sekali per proses
+import atexit  #Import atexit untuk tutup koneksi saat aplikasi exit
+from collections import Counter  #Import Counter untuk hitung referensi gambar yang dihapus
+from contextlib import contextmanager  #Import contextmanager untuk pinjam koneksi writer/reader
+from datetime import datetime, timedelta  #Modul untuk date/time handling
+from config import (
+    DB_FILE, DB_SYNCHRONOUS, DB_CACHE_SIZE_KB, DB_BUSY_TIMEOUT_MS,
+    DB_READER_POOL_SIZE, DB_STATEMENT_CACHE
+)  #Import path database file dan pengaturan koneksi dari config.py
+
+SCHEMA_VERSION = 5  #Versi schema terbaru (disimpan di PRAGMA user_version)
+
+_database_ready = False  #Flag apakah setup_database sudah dijalankan di proses ini
+_database_lock = threading.Lock()  #Lock agar setup tidak berjalan bersamaan dari 2 thread
+
+_writer_conn = None  #Koneksi writer (dipakai terus selama proses berjalan)
+_writer_lock = threading.RLock()  #Lock agar hanya 1 thread yang menulis dalam 1 waktu
+_reader_pool = []  #Pool koneksi read-only yang siap dipinjam
+_reader_pool_lock = threading.Lock()  #Lock untuk akses pool reader
+
+
+def _open_connection(read_only=False):
+    # Fungsi buka koneksi SQLite dengan PRAGMA yang sudah di-tuning | Tujuan: Semua koneksi punya setting yang sama
+    # Parameter: read_only = True untuk koneksi reader (query_only, tidak bisa menulis)
+    # Return: sqlite3.Connection
+
+    # check_same_thread=False: koneksi dipakai lintas thread, akses diatur oleh lock/pool
+    # cached_statements: query parameterized yang sama dipakai ulang sebagai prepared statement
+    conn = sqlite3.connect(DB_FILE, timeout=DB_BUSY_TIMEOUT_MS / 1000.0,
+                           check_same_thread=False, cached_statements=DB_STATEMENT_CACHE)
+    if not read_only:
+        # WAL: reader tidak memblokir writer dan sebaliknya (setting tersimpan di file database)
+        conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{int(DB_CACHE_SIZE_KB)}")
+    conn.execute(f"PRAGMA busy_timeout={int(DB_BUSY_TIMEOUT_MS)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    if read_only:
+        conn.execute("PRAGMA query_only=ON")
+    return conn
+
+
+@contextmanager
+def write_connection():
+    # Context manager untuk pakai koneksi writer | Tujuan: Commit otomatis jika sukses, rollback jika error
+    # Contoh: with write_connection() as conn: conn.execute("INSERT ...")
+    global _writer_conn
+
+    with _writer_lock:
+        if _writer_conn is None:
+            _writer_conn = _open_connection()
+        try:
+            yield _writer_conn
+            _writer_conn.commit()
+        except Exception:
+            _writer_conn.rollback()
+            raise
+
+
+@contextmanager
+def read_connection():
+    # Context manager untuk pinjam koneksi read-only dari pool | Tujuan: Query (load data, export) paralel dengan writer
+    # Koneksi dikembalikan ke pool setelah selesai (atau ditutup jika pool sudah penuh)
+    with _reader_pool_lock:
+        conn = _reader_pool.pop() if _reader_pool else None
+    if conn is None:
+        conn = _open_connection(read_only=True)
+    try:
+        yield conn
+    finally:
+        # Akhiri transaksi baca supaya snapshot WAL tidak ditahan terus
+        if conn.in_transaction:
+            conn.rollback()
+        with _reader_pool_lock:
+            if len(_reader_pool) < DB_READER_POOL_SIZE:
+                _reader_pool.append(conn)
+                conn = None
+        if conn is not None:
+            conn.close()
+
+
+def close_connections():
+    # Fungsi tutup semua koneksi database | Tujuan: Dipanggil saat aplikasi exit (checkpoint WAL ke file utama)
+    global _writer_conn
+
+    with _reader_pool_lock:
+        while _reader_pool:
+            _reader_pool.pop().close()
+    with _writer_lock:
+        if _writer_conn is not None:
+            _writer_conn.close()
+            _writer_conn = None
+
+
+atexit.register(close_connections)  #Tutup koneksi otomatis saat proses exit
 
 
 def setup_database():
@@ -10,9 +103,24 @@ def setup_database():
     # Juga melakukan migration untuk menambah kolom baru jika diperlukan
     # Return: None (void function, hanya modifikasi database)
 
-    conn = sqlite3.connect(DB_FILE)  # Koneksi ke database SQLite
-    
-    cursor = conn.cursor() #Buat cursor object untuk execute SQL commands
+    with write_connection() as conn:  # Koneksi writer (commit otomatis di akhir blok)
+        cursor = conn.cursor()
+        
+        # Versi schema database saat ini (0 = database baru atau dibuat sebelum ada versioning)
+        version = cursor.execute("PRAGMA user_version").fetchone()[0]
+        
+        # Jalankan migration yang belum pernah dijalankan secara berurutan
+        for target_version, migrate in _MIGRATIONS:
+            if version < target_version:
+                migrate(cursor)
+                # PRAGMA tidak mendukung parameter ?, nilai integer dari list migration
+                cursor.execute(f"PRAGMA user_version = {int(target_version)}")
+                version = target_version
+
+
+def _migrate_v1(cursor):
+    # Migration v1: table detected_codes (+ kolom status/target_session untuk database lama) dan stage_stats
+    # Aman dijalankan di database lama tanpa versi karena setiap langkah cek schema dulu
     
     # Check apakah table 'detected_codes' sudah ada di database
     # Query ke sqlite_master (system table yang menyimpan metadata schema)
@@ -68,9 +176,101 @@ def setup_database():
                 # Silent fail jika ada error
                 pass
     
-    conn.commit() #Commit semua perubahan ke database (save changes)
-    
-    conn.close() #Tutup koneksi database
+    # Table statistik preprocessing stage OCR (per preset, per label, per stage)
+    # Dipakai untuk self-tuning urutan stage dan bertahan walaupun aplikasi di-restart
+    cursor.execute('''CREATE TABLE IF NOT EXISTS stage_stats (
+                        preset TEXT NOT NULL,
+                        label TEXT NOT NULL,
+                        stage TEXT NOT NULL,
+                        runs INTEGER DEFAULT 0,
+                        wins INTEGER DEFAULT 0,
+                        total_ms REAL DEFAULT 0,
+                        PRIMARY KEY (preset, label, stage)
+                      )''')
+
+
+def _migrate_v2(cursor):
+    # Migration v2: index untuk query range tanggal, filter preset dan target session
+    # timestamp TEXT berformat 'YYYY-MM-DD HH:MM:SS' urut secara leksikografis,
+    # sehingga range predicate (>=, <, BETWEEN) bisa langsung memakai index
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_detected_codes_timestamp ON detected_codes (timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_detected_codes_preset_timestamp ON detected_codes (preset, timestamp)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_detected_codes_session_timestamp ON detected_codes (target_session, timestamp)")
+
+
+def _migrate_v3(cursor):
+    # Migration v3: index file gambar (path, tanggal folder, ukuran) yang ditulis oleh image_store
+    # Tujuan: Cek/hapus gambar per path atau per hari lewat query, tanpa listing folder gambar
+    cursor.execute('''CREATE TABLE IF NOT EXISTS image_files (
+                        path TEXT PRIMARY KEY,
+                        day TEXT,
+                        size INTEGER,
+                        created_at TEXT
+                      )''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_image_files_day ON image_files (day)")
+
+
+def _migrate_v4(cursor):
+    # Migration v4: deduplikasi gambar berdasarkan isi file
+    # content_hash = SHA-256 file, phash = perceptual hash (opsional), ref_count = jumlah record detected_codes yang memakai file
+    # Gambar lama (sebelum v4) tetap ref_count 1 dan tanpa hash (tidak pernah dipakai bersama)
+    cursor.execute("PRAGMA table_info(image_files)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'content_hash' not in columns:
+        cursor.execute("ALTER TABLE image_files ADD COLUMN content_hash TEXT")
+    if 'phash' not in columns:
+        cursor.execute("ALTER TABLE image_files ADD COLUMN phash TEXT")
+    if 'ref_count' not in columns:
+        cursor.execute("ALTER TABLE image_files ADD COLUMN ref_count INTEGER NOT NULL DEFAULT 1")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_image_files_content_hash ON image_files (content_hash)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_image_files_phash ON image_files (phash)")
+    # Cek "masih ada record yang memakai gambar ini?" saat delete gambar yang tidak ada di image_files
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_detected_codes_image_path ON detected_codes (image_path)")
+
+
+def _migrate_v5(cursor):
+    # Migration v5: thumbnail export (PNG dengan caption) yang dibuat saat deteksi disimpan
+    # 1 thumbnail per (file gambar, label), direferensikan dari detected_codes.thumbnail_id
+    cursor.execute('''CREATE TABLE IF NOT EXISTS thumbnails (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        source_path TEXT NOT NULL,
+                        label TEXT NOT NULL,
+                        width INTEGER,
+                        height INTEGER,
+                        png BLOB,
+                        created_at TEXT,
+                        UNIQUE (source_path, label)
+                      )''')
+    cursor.execute("PRAGMA table_info(detected_codes)")
+    columns = [column[1] for column in cursor.fetchall()]
+    if 'thumbnail_id' not in columns:
+        cursor.execute("ALTER TABLE detected_codes ADD COLUMN thumbnail_id INTEGER")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_detected_codes_thumbnail ON detected_codes (thumbnail_id)")
+
+
+# Daftar migration berurutan: (versi schema setelah migration, fungsi migration)
+_MIGRATIONS = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+    (3, _migrate_v3),
+    (4, _migrate_v4),
+    (5, _migrate_v5),
+]
+
+
+def ensure_database():
+    # Fungsi setup database hanya sekali per proses | Tujuan: Hindari cek schema ulang setiap START deteksi
+    # Return: None (setup_database hanya dipanggil pada pemanggilan pertama)
+    global _database_ready
+
+    # Fast path: database sudah siap
+    if _database_ready:
+        return
+
+    with _database_lock:
+        if not _database_ready:
+            setup_database()
+            _database_ready = True
 
 
 def load_existing_data(current_date):
@@ -80,76 +280,15 @@ def load_existing_data(current_date):
     
     detected_codes = [] #Inisialisasi list kosong untuk menyimpan hasil query
     
-    # Format current_date menjadi string YYYY-MM-DD untuk LIKE query
-    today_date_str = current_date.strftime("%Y-%m-%d")
+    # Range 1 hari: timestamp >= 'YYYY-MM-DD' AND timestamp < 'YYYY-MM-DD' hari berikutnya
+    # Sama dengan LIKE 'YYYY-MM-DD%' tapi bisa memakai index timestamp
+    day_range = (current_date.strftime("%Y-%m-%d"), (current_date + timedelta(days=1)).strftime("%Y-%m-%d"))
     
     try:
-        # Buka koneksi ke database
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # Check kolom apa saja yang ada di table untuk backward compatibility
-        # Ini penting karena database lama mungkin belum punya kolom status/target_session
-        cursor.execute("PRAGMA table_info(detected_codes)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        # Flag untuk cek apakah kolom status dan target_session ada
-        has_status = 'status' in columns
-        has_target_session = 'target_session' in columns
-        
-        # Load data dengan schema yang tersedia
-        # Build query berbeda tergantung kolom yang ada
-        
-        if has_status and has_target_session:
-            # Full schema dengan status dan target_session
-            # Query untuk load semua data hari ini (LIKE '%' untuk match YYYY-MM-DD HH:MM:SS)
-            cursor.execute(f"SELECT id, timestamp, code, preset, image_path, status, target_session FROM detected_codes WHERE timestamp LIKE '{today_date_str}%' ORDER BY timestamp ASC")
-            
-            # Iterate setiap row hasil query dan convert ke dictionary
-            for row in cursor.fetchall():
-                detected_codes.append({
-                    'ID': row[0],  # id dari database
-                    'Time': row[1],  # timestamp (YYYY-MM-DD HH:MM:SS)
-                    'Code': row[2],  # code yang terdeteksi (e.g., 55D23L)
-                    'Type': row[3],  # preset (JIS/DIN)
-                    'ImagePath': row[4],  # path ke file gambar
-                    'Status': row[5] if row[5] else 'OK',  # status (default 'OK' jika NULL)
-                    'TargetSession': row[6] if row[6] else row[2]  # target session (default code jika NULL)
-                })
-        elif has_status:
-            # Schema tanpa target_session (database agak lama)
-            # Query hanya SELECT kolom yang ada
-            cursor.execute(f"SELECT id, timestamp, code, preset, image_path, status FROM detected_codes WHERE timestamp LIKE '{today_date_str}%' ORDER BY timestamp ASC")
-            
-            # Iterate dan append dengan target_session = code sebagai fallback
-            for row in cursor.fetchall():
-                detected_codes.append({
-                    'ID': row[0],
-                    'Time': row[1],
-                    'Code': row[2],
-                    'Type': row[3],
-                    'ImagePath': row[4],
-                    'Status': row[5] if row[5] else 'OK',
-                    'TargetSession': row[2]  # Gunakan code sebagai target_session
-                })
-        else:
-            # Schema minimal tanpa status dan target_session (database sangat lama)
-            # Query hanya kolom dasar
-            cursor.execute(f"SELECT id, timestamp, code, preset, image_path FROM detected_codes WHERE timestamp LIKE '{today_date_str}%' ORDER BY timestamp ASC")
-            
-            # Iterate dan append dengan default values untuk status dan target_session
-            for row in cursor.fetchall():
-                detected_codes.append({
-                    'ID': row[0],
-                    'Time': row[1],
-                    'Code': row[2],
-                    'Type': row[3],
-                    'ImagePath': row[4],
-                    'Status': 'OK',  # Default semua OK
-                    'TargetSession': row[2]  # Gunakan code sebagai target_session
-                })
-        
-        conn.close() #Tutup koneksi database
+        # Pinjam koneksi read-only dari pool (tidak memblokir insert deteksi)
+        with read_connection() as conn:
+            cursor = conn.cursor()
+            _fetch_existing_data(cursor, day_range, detected_codes)
         
         return detected_codes #Return list of dictionaries berisi data deteksi
         
@@ -159,6 +298,70 @@ def load_existing_data(current_date):
         return detected_codes
 
 
+def _fetch_existing_data(cursor, day_range, detected_codes):
+    # Fungsi query data 1 tanggal sesuai schema yang ada | Tujuan: Isi list detected_codes dengan dictionary per record
+    # Check kolom apa saja yang ada di table untuk backward compatibility
+    # Ini penting karena database lama mungkin belum punya kolom status/target_session
+    cursor.execute("PRAGMA table_info(detected_codes)")
+    columns = [column[1] for column in cursor.fetchall()]
+    
+    # Flag untuk cek apakah kolom status dan target_session ada
+    has_status = 'status' in columns
+    has_target_session = 'target_session' in columns
+    
+    # Load data dengan schema yang tersedia
+    # Build query berbeda tergantung kolom yang ada
+    
+    if has_status and has_target_session:
+        # Full schema dengan status dan target_session
+        # Query untuk load semua data hari ini (range parameterized, memakai index timestamp)
+        cursor.execute("SELECT id, timestamp, code, preset, image_path, status, target_session FROM detected_codes WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp ASC", day_range)
+        
+        # Iterate setiap row hasil query dan convert ke dictionary
+        for row in cursor.fetchall():
+            detected_codes.append({
+                'ID': row[0],  # id dari database
+                'Time': row[1],  # timestamp (YYYY-MM-DD HH:MM:SS)
+                'Code': row[2],  # code yang terdeteksi (e.g., 55D23L)
+                'Type': row[3],  # preset (JIS/DIN)
+                'ImagePath': row[4],  # path ke file gambar
+                'Status': row[5] if row[5] else 'OK',  # status (default 'OK' jika NULL)
+                'TargetSession': row[6] if row[6] else row[2]  # target session (default code jika NULL)
+            })
+    elif has_status:
+        # Schema tanpa target_session (database agak lama)
+        # Query hanya SELECT kolom yang ada
+        cursor.execute("SELECT id, timestamp, code, preset, image_path, status FROM detected_codes WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp ASC", day_range)
+        
+        # Iterate dan append dengan target_session = code sebagai fallback
+        for row in cursor.fetchall():
+            detected_codes.append({
+                'ID': row[0],
+                'Time': row[1],
+                'Code': row[2],
+                'Type': row[3],
+                'ImagePath': row[4],
+                'Status': row[5] if row[5] else 'OK',
+                'TargetSession': row[2]  # Gunakan code sebagai target_session
+            })
+    else:
+        # Schema minimal tanpa status dan target_session (database sangat lama)
+        # Query hanya kolom dasar
+        cursor.execute("SELECT id, timestamp, code, preset, image_path FROM detected_codes WHERE timestamp >= ? AND timestamp < ? ORDER BY timestamp ASC", day_range)
+        
+        # Iterate dan append dengan default values untuk status dan target_session
+        for row in cursor.fetchall():
+            detected_codes.append({
+                'ID': row[0],
+                'Time': row[1],
+                'Code': row[2],
+                'Type': row[3],
+                'ImagePath': row[4],
+                'Status': 'OK',  # Default semua OK
+                'TargetSession': row[2]  # Gunakan code sebagai target_session
+            })
+
+
 def delete_codes(record_ids):
     # Fungsi menghapus data berdasarkan daftar ID | Tujuan: Hapus data dan file gambar terkait dari database dan disk
     # Parameter: record_ids = List of integer IDs yang akan dihapus
@@ -169,41 +372,54 @@ def delete_codes(record_ids):
         return False
 
     try:
-        # Buka koneksi database
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # Buat placeholders untuk SQL IN clause
-        # Jika record_ids = [1, 2, 3], placeholders = '?,?,?'
-        placeholders = ','.join('?' for _ in record_ids)
-        
-        # Ambil image paths sebelum delete (untuk dihapus dari disk)
-        # Penting ambil dulu sebelum DELETE karena setelah delete data hilang
-        cursor.execute(f"SELECT image_path FROM detected_codes WHERE id IN ({placeholders})", record_ids)
-        image_paths = cursor.fetchall()  # List of tuples [(path1,), (path2,), ...]
-        
-        # Delete records dari database
-        # WHERE id IN (?, ?, ?) dengan values dari record_ids
-        cursor.execute(f"DELETE FROM detected_codes WHERE id IN ({placeholders})", record_ids)
-        
-        conn.commit() #Commit perubahan ke database (save delete operation)
-        
-        conn.close() #Tutup koneksi database
+        # Pakai koneksi writer (commit otomatis di akhir blok, rollback jika error)
+        with write_connection() as conn:
+            cursor = conn.cursor()
+            
+            # Buat placeholders untuk SQL IN clause
+            # Jika record_ids = [1, 2, 3], placeholders = '?,?,?'
+            placeholders = ','.join('?' for _ in record_ids)
+            
+            # Ambil image paths sebelum delete (untuk dihapus dari disk)
+            # Penting ambil dulu sebelum DELETE karena setelah delete data hilang
+            cursor.execute(f"SELECT image_path, thumbnail_id FROM detected_codes WHERE id IN ({placeholders})", record_ids)
+            image_paths = cursor.fetchall()  # List of tuples [(path1, thumbnail_id1), (path2, thumbnail_id2), ...]
+            
+            # Delete records dari database
+            # WHERE id IN (?, ?, ?) dengan values dari record_ids
+            cursor.execute(f"DELETE FROM detected_codes WHERE id IN ({placeholders})", record_ids)
+            
+            # Hapus thumbnail yang sudah tidak direferensikan record manapun
+            thumbnail_ids = list({path_tuple[1] for path_tuple in image_paths if path_tuple[1] is not None})
+            if thumbnail_ids:
+                cursor.execute(f"DELETE FROM thumbnails WHERE id IN ({','.join('?' for _ in thumbnail_ids)}) "
+                               "AND NOT EXISTS (SELECT 1 FROM detected_codes WHERE thumbnail_id = thumbnails.id)", thumbnail_ids)
+            
+            # Gambar bisa dipakai bersama oleh banyak record (deduplikasi): kurangi ref_count,
+            # file hanya dihapus jika tidak ada record lain yang masih memakainya
+            files_to_remove = []
+            for image_path, removed_refs in Counter(path_tuple[0] for path_tuple in image_paths if path_tuple[0]).items():
+                cursor.execute("SELECT ref_count FROM image_files WHERE path = ?", (image_path,))
+                index_row = cursor.fetchone()
+                if index_row is not None:
+                    remaining_refs = (index_row[0] or 1) - removed_refs
+                    if remaining_refs > 0:
+                        cursor.execute("UPDATE image_files SET ref_count = ? WHERE path = ?", (remaining_refs, image_path))
+                        continue
+                    cursor.execute("DELETE FROM image_files WHERE path = ?", (image_path,))
+                else:
+                    # Gambar lama (tidak ada di index): cek langsung apakah masih dipakai record lain
+                    cursor.execute("SELECT 1 FROM detected_codes WHERE image_path = ? LIMIT 1", (image_path,))
+                    if cursor.fetchone() is not None:
+                        continue
+                files_to_remove.append(image_path)
 
-        import os #Import os untuk file operations
+        from image_store import IMAGE_STORE #Import image store untuk hapus file gambar
         
-        # Iterate setiap path dan hapus file jika exist
-        for path_tuple in image_paths:
-            image_path = path_tuple[0]  # Extract string path dari tuple
-            
-            # Check apakah path valid dan file exist
-            if image_path and os.path.exists(image_path):
-                try:
-                    os.remove(image_path) #Hapus file dari disk
-                except Exception as file_e:
-                    # Print warning jika gagal hapus file (file locked, permission denied, dll)
-                    # Tapi proses delete tetap lanjut untuk file lain
-                    print(f"Warning: Gagal menghapus file gambar {image_path}: {file_e}")
+        # Hapus file yang sudah tidak dipakai lewat IMAGE_STORE (file yang tidak ada dianggap sudah terhapus)
+        # Gagal hapus 1 file (file locked, permission denied, dll) hanya warning, file lain tetap diproses
+        for image_path in files_to_remove:
+            IMAGE_STORE.delete(image_path)
 
         return True #Return True jika semua proses berhasil
 
@@ -213,34 +429,99 @@ def delete_codes(record_ids):
         return False
 
 
-def insert_detection(timestamp, code, preset, image_path, status, target_session):
-    # Fungsi insert deteksi baru ke database | Tujuan: Simpan informasi lengkap deteksi ke database
-    # Parameter: timestamp (format YYYY-MM-DD HH:MM:SS), code, preset (JIS/DIN), image_path, status (OK/Not OK), target_session
-    # Return: Integer ID baru dari inserted record, atau None jika gagal
+def get_next_detection_id():
+    # Fungsi ambil ID berikutnya untuk detected_codes | Tujuan: ID bisa dialokasikan di memory sebelum insert (write-behind)
+    # Return: Integer ID berikutnya (lebih besar dari semua ID yang pernah dipakai, termasuk yang sudah dihapus)
+    with write_connection() as conn:
+        max_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM detected_codes").fetchone()[0]
+        # sqlite_sequence menyimpan ID AUTOINCREMENT terakhir (juga untuk row yang sudah dihapus)
+        seq_row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'detected_codes'").fetchone()
+        return max(max_id, seq_row[0] if seq_row else 0) + 1
+
+
+def insert_detections(rows, image_rows=None, image_refs=None, thumbnail_rows=None):
+    # Fungsi insert banyak deteksi sekaligus dengan ID yang sudah dialokasikan | Tujuan: 1 executemany + 1 commit per batch
+    # Parameter: rows = List of tuple (id, timestamp, code, preset, image_path, status, target_session)
+    #            image_rows = List of tuple (path, day, size, created_at, content_hash, phash) untuk file gambar baru (opsional)
+    #            image_refs = List of path gambar yang sudah ada dan dipakai lagi oleh record baru (ref_count + 1 per item)
+    #            thumbnail_rows = List of tuple (source_path, label, width, height, png, created_at) untuk thumbnail baru
+    # Return: Boolean True jika berhasil, False jika gagal
+    if not rows and not image_rows and not image_refs and not thumbnail_rows:
+        return True
     
     try:
-        # Buka koneksi database
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # Execute INSERT statement dengan parameterized query (untuk SQL injection protection)
-        # ? adalah placeholder yang akan diganti dengan values dari tuple parameter
-        cursor.execute("INSERT INTO detected_codes (timestamp, code, preset, image_path, status, target_session) VALUES (?, ?, ?, ?, ?, ?)",
-                      (timestamp, code, preset, image_path, status, target_session))
-        
-        # Ambil ID dari row yang baru saja di-insert
-        # lastrowid adalah auto-generated ID dari AUTOINCREMENT column
-        new_id = cursor.lastrowid
-        
-        conn.commit() #Commit perubahan ke database (save insert operation)
-        
-        conn.close() #Tutup koneksi database
-        
-        return new_id #Return ID baru untuk reference (bisa digunakan untuk update UI atau operasi lanjutan)
+        # Record deteksi, index gambar, dan thumbnail di-commit dalam 1 transaksi
+        with write_connection() as conn:
+            if thumbnail_rows:
+                conn.executemany("INSERT OR IGNORE INTO thumbnails (source_path, label, width, height, png, created_at) VALUES (?, ?, ?, ?, ?, ?)", thumbnail_rows)
+            # thumbnail_id diisi dari thumbnail (image_path, code) jika ada, NULL jika belum ada thumbnail
+            conn.executemany("INSERT INTO detected_codes (id, timestamp, code, preset, image_path, status, target_session, thumbnail_id) "
+                             "VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?7, (SELECT id FROM thumbnails WHERE source_path = ?5 AND label = ?3))", rows)
+            if image_rows:
+                conn.executemany("INSERT OR REPLACE INTO image_files (path, day, size, created_at, content_hash, phash, ref_count) VALUES (?, ?, ?, ?, ?, ?, 1)", image_rows)
+            if image_refs:
+                # File baru di batch yang sama sudah di-insert di atas, jadi referensi ke file tersebut juga terhitung
+                conn.executemany("UPDATE image_files SET ref_count = ref_count + 1 WHERE path = ?", [(path,) for path in image_refs])
+        return True
         
     except Exception as e:
-        # Jika ada error saat insert, print error message dan return None
-        print(f"Error inserting detection: {e}")
+        print(f"Error inserting detections: {e}")
+        return False
+
+
+def has_thumbnail(source_path, label):
+    # Fungsi cek apakah thumbnail untuk (file gambar, label) sudah ada | Return: Boolean
+    try:
+        with read_connection() as conn:
+            return conn.execute("SELECT 1 FROM thumbnails WHERE source_path = ? AND label = ? LIMIT 1", (source_path, label)).fetchone() is not None
+    except Exception as e:
+        print(f"Error checking thumbnail: {e}")
+        return False
+
+
+def get_images_without_thumbnail(after=None, limit=200):
+    # Fungsi ambil pasangan (image_path, code) yang record-nya belum punya thumbnail (untuk backfill)
+    # Parameter: after = pasangan terakhir dari batch sebelumnya (paging urut image_path, code), limit = jumlah per batch
+    # Return: List of tuple (image_path, code)
+    query = "SELECT DISTINCT image_path, code FROM detected_codes WHERE thumbnail_id IS NULL AND image_path IS NOT NULL AND image_path != ''"
+    params = []
+    if after is not None:
+        query += " AND (image_path, code) > (?, ?)"
+        params.extend(after)
+    query += " ORDER BY image_path, code LIMIT ?"
+    params.append(limit)
+    with read_connection() as conn:
+        return conn.execute(query, params).fetchall()
+
+
+def save_thumbnails(thumbnail_rows):
+    # Fungsi simpan thumbnail dan hubungkan ke record yang memakai (file gambar, label) yang sama
+    # Parameter: thumbnail_rows = List of tuple (source_path, label, width, height, png, created_at)
+    # Return: Boolean True jika berhasil, False jika gagal
+    try:
+        with write_connection() as conn:
+            conn.executemany("INSERT OR IGNORE INTO thumbnails (source_path, label, width, height, png, created_at) VALUES (?, ?, ?, ?, ?, ?)", thumbnail_rows)
+            conn.executemany("UPDATE detected_codes SET thumbnail_id = (SELECT id FROM thumbnails WHERE source_path = ?1 AND label = ?2) "
+                             "WHERE image_path = ?1 AND code = ?2 AND thumbnail_id IS NULL",
+                             [(row[0], row[1]) for row in thumbnail_rows])
+        return True
+    except Exception as e:
+        print(f"Error saving thumbnails: {e}")
+        return False
+
+
+def find_image_by_hash(content_hash, phash=None):
+    # Fungsi cari file gambar yang isinya sama | Tujuan: Deteksi baru memakai file yang sudah ada (deduplikasi)
+    # Parameter: content_hash = SHA-256 file, phash = perceptual hash (opsional, dicek jika hash file tidak ketemu)
+    # Return: String path file gambar yang sudah ada, atau None
+    try:
+        with read_connection() as conn:
+            row = conn.execute("SELECT path FROM image_files WHERE content_hash = ? LIMIT 1", (content_hash,)).fetchone()
+            if row is None and phash:
+                row = conn.execute("SELECT path FROM image_files WHERE phash = ? LIMIT 1", (phash,)).fetchone()
+        return row[0] if row else None
+    except Exception as e:
+        print(f"Error finding image by hash: {e}")
         return None
 
 
@@ -249,27 +530,54 @@ def get_detection_count(db_file=None):
     # Parameter: db_file = String path ke database file (default: DB_FILE dari config)
     # Return: Integer total jumlah deteksi
     
-    # Jika db_file tidak diberikan, gunakan DB_FILE default dari config
-    if db_file is None:
-        db_file = DB_FILE
-        
     try:
-        # Buka koneksi ke database
-        conn = sqlite3.connect(db_file)
-        cursor = conn.cursor()
-        
-        # Execute COUNT query untuk hitung total records di table
-        # COUNT(*) menghitung semua rows termasuk yang punya NULL values
-        cursor.execute("SELECT COUNT(*) FROM detected_codes")
-        
-        # Ambil hasil query (COUNT selalu return 1 row dengan 1 column)
-        count = cursor.fetchone()[0]  # fetchone() return tuple, [0] untuk ambil value pertama
-        
-        conn.close() #Tutup koneksi database
+        # Database default: pinjam koneksi read-only dari pool
+        # Database lain (db_file diberikan): buka koneksi sendiri seperti biasa
+        if db_file is None or db_file == DB_FILE:
+            with read_connection() as conn:
+                # COUNT(*) menghitung semua rows termasuk yang punya NULL values
+                count = conn.execute("SELECT COUNT(*) FROM detected_codes").fetchone()[0]
+        else:
+            conn = sqlite3.connect(db_file)
+            count = conn.execute("SELECT COUNT(*) FROM detected_codes").fetchone()[0]
+            conn.close() #Tutup koneksi database
         
         return count #Return count sebagai integer
         
     except Exception as e:
         # Jika ada error (misalnya table tidak ada), print error dan return 0
         print(f"Error getting count: {e}")
-        return 0
\ No newline at end of file
+        return 0
+
+
+def load_stage_stats():
+    # Fungsi memuat statistik stage OCR dari database | Tujuan: Restore hasil self-tuning setelah restart
+    # Return: List of tuple (preset, label, stage, runs, wins, total_ms), list kosong jika gagal
+    
+    try:
+        with read_connection() as conn:
+            return conn.execute("SELECT preset, label, stage, runs, wins, total_ms FROM stage_stats").fetchall()
+        
+    except Exception as e:
+        # Table belum ada atau database error, mulai dari statistik kosong
+        print(f"Error loading stage stats: {e}")
+        return []
+
+
+def save_stage_stats(rows):
+    # Fungsi menyimpan statistik stage OCR ke database | Tujuan: Persist hasil self-tuning stage
+    # Parameter: rows = List of tuple (preset, label, stage, runs, wins, total_ms)
+    # Return: Boolean True jika berhasil, False jika gagal
+    
+    if not rows:
+        return True
+    
+    try:
+        with write_connection() as conn:
+            # INSERT OR REPLACE: update baris yang sudah ada berdasarkan PRIMARY KEY (preset, label, stage)
+            conn.executemany("INSERT OR REPLACE INTO stage_stats (preset, label, stage, runs, wins, total_ms) VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return True
+        
+    except Exception as e:
+        print(f"Error saving stage stats: {e}")
+        return False
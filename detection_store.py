@@ -0,0 +1,154 @@
+# Store in-memory untuk data deteksi hari ini (pengganti list of dictionary detected_codes)
+# File ini berisi DetectionRecord (record ringkas dengan __slots__) dan DetectionStore (store thread-safe)
+# Tujuan: Scan thread append, UI thread baca, delete/refresh dari UI, semuanya lewat 1 lock
+#         dengan index per target session dan counter OK/Not OK yang di-update incremental
+import threading  #Import threading untuk lock store yang dipakai scan thread dan UI thread
+
+
+class DetectionRecord:
+    # Record 1 deteksi dengan __slots__ (tanpa __dict__ per record, hemat memory untuk puluhan ribu record)
+    # Tetap bisa diakses seperti dictionary lama: record['Code'], record.get('Status', 'OK')
+
+    __slots__ = ('ID', 'Time', 'Code', 'Type', 'ImagePath', 'Status', 'TargetSession')
+
+    def __init__(self, ID, Time, Code, Type, ImagePath, Status='OK', TargetSession=None):
+        self.ID = ID
+        self.Time = Time
+        self.Code = Code
+        self.Type = Type
+        self.ImagePath = ImagePath
+        self.Status = Status if Status else 'OK'  #Default 'OK' jika kosong
+        self.TargetSession = TargetSession if TargetSession else Code  #Default code jika kosong
+
+    @classmethod
+    def from_dict(cls, data):
+        # Fungsi untuk convert dictionary record (format load_existing_data) ke DetectionRecord
+        if isinstance(data, cls):
+            return data
+        return cls(data.get('ID'), data.get('Time'), data.get('Code'), data.get('Type'),
+                   data.get('ImagePath', ''), data.get('Status', 'OK'), data.get('TargetSession'))
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except (AttributeError, TypeError):
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__}
+
+    def __repr__(self):
+        return f"DetectionRecord({self.to_dict()!r})"
+
+
+class DetectionStore:
+    # Store thread-safe untuk record deteksi hari ini (urut berdasarkan waktu simpan)
+    # Index: ID -> record, target session -> list record, counter OK/Not OK per session
+    # Snapshot yang dikembalikan adalah tuple (immutable), aman diiterasi tanpa lock
+
+    def __init__(self, records=None):
+        self._lock = threading.RLock()
+        self._records = []  #Semua record hari ini, urut berdasarkan waktu
+        self._by_id = {}  #ID -> record
+        self._by_session = {}  #Target session -> list record (urut berdasarkan waktu)
+        self._counts = {}  #Target session -> {'OK': n, 'Not OK': n}
+        self.generation = 0  #Naik setiap reset/hapus (tanda isi store berubah tidak hanya append)
+        if records:
+            self.reset(records)
+
+    def _index(self, record):
+        # Tambah record ke semua index (dipanggil dengan lock)
+        self._records.append(record)
+        if record.ID is not None:
+            self._by_id[record.ID] = record
+        self._by_session.setdefault(record.TargetSession, []).append(record)
+        counts = self._counts.setdefault(record.TargetSession, {'OK': 0, 'Not OK': 0})
+        if record.Status in counts:
+            counts[record.Status] += 1
+
+    def append(self, record):
+        # Fungsi untuk tambah 1 record (dictionary atau DetectionRecord)
+        # Return: DetectionRecord yang disimpan
+        record = DetectionRecord.from_dict(record)
+        with self._lock:
+            self._index(record)
+        return record
+
+    def reset(self, records=()):
+        # Fungsi untuk ganti seluruh isi store (startup, ganti hari, refresh dari database)
+        with self._lock:
+            self._records = []
+            self._by_id = {}
+            self._by_session = {}
+            self._counts = {}
+            for record in records:
+                self._index(DetectionRecord.from_dict(record))
+            self.generation += 1
+
+    def remove_ids(self, record_ids):
+        # Fungsi untuk hapus record berdasarkan ID
+        # Return: jumlah record yang dihapus
+        with self._lock:
+            removed = [self._by_id.pop(record_id) for record_id in set(record_ids) if record_id in self._by_id]
+            if not removed:
+                return 0
+            removed_ids = {id(record) for record in removed}
+            self._records = [rec for rec in self._records if id(rec) not in removed_ids]
+            # Rebuild hanya session yang terpengaruh
+            for session in {record.TargetSession for record in removed}:
+                remaining = [rec for rec in self._by_session.get(session, []) if id(rec) not in removed_ids]
+                if remaining:
+                    self._by_session[session] = remaining
+                else:
+                    self._by_session.pop(session, None)
+            for record in removed:
+                counts = self._counts.get(record.TargetSession)
+                if counts and record.Status in counts:
+                    counts[record.Status] -= 1
+            self.generation += 1
+            return len(removed)
+
+    def snapshot(self):
+        # Return: tuple semua record (urut berdasarkan waktu)
+        with self._lock:
+            return tuple(self._records)
+
+    def session_records(self, session, start=0):
+        # Return: tuple record untuk 1 target session mulai dari posisi start (untuk update incremental)
+        with self._lock:
+            return tuple(self._by_session.get(session, ())[start:])
+
+    def session_count(self, session):
+        with self._lock:
+            return len(self._by_session.get(session, ()))
+
+    def session_stats(self, session):
+        # Return: tuple (total, ok_count, not_ok_count) untuk 1 target session
+        with self._lock:
+            counts = self._counts.get(session, {'OK': 0, 'Not OK': 0})
+            return len(self._by_session.get(session, ())), counts['OK'], counts['Not OK']
+
+    def get(self, record_id):
+        with self._lock:
+            return self._by_id.get(record_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._records)
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __reversed__(self):
+        return reversed(self.snapshot())
@@ -1,381 +1,355 @@
+import csv  #Import csv untuk export log mentah ke CSV
 import os  #Import modul untuk operasi file dan direktori
-import sqlite3  #Import modul untuk koneksi dan query database SQLite
-import pandas as pd  #Import pandas untuk manipulasi data dalam bentuk DataFrame
 import xlsxwriter  #Import xlsxwriter untuk membuat dan memformat file Excel
-import tempfile  #Import tempfile untuk membuat file temporary saat processing image
+from collections import deque  #Import deque untuk antrian chunk yang thumbnail-nya sedang dirender
+from concurrent.futures import Future, ProcessPoolExecutor  #Import process pool untuk render thumbnail paralel
 from datetime import datetime  #Import datetime untuk tanggal dan waktu
-from PIL import Image, ImageDraw, ImageFont  #Import PIL (Pillow) untuk image processing (load, resize, draw text pada image)
-from config import DB_FILE, Resampling  #Import konfigurasi database file dan resampling method dari config.py
+from io import BytesIO  #Import BytesIO untuk menyisipkan thumbnail dari memory (image_data) tanpa file temporary
+from config import (
+    EXPORT_FETCH_SIZE, EXPORT_THUMBNAIL_WORKERS, EXPORT_TABULAR_FETCH_SIZE, EXPORT_PARQUET_COMPRESSION
+)  #Import pengaturan export dari config.py
+from database import read_connection  #Import koneksi read-only dari pool (export tidak memblokir insert live)
+from thumbnails import render_thumbnail, thumbnail_offsets  #Import render thumbnail (caption + resize) dan posisi di cell
+
+try:
+    # pyarrow opsional: hanya dibutuhkan untuk export Parquet
+    import pyarrow as pa  #Import pyarrow untuk tabel kolom (columnar)
+    import pyarrow.compute as pc  #Import compute untuk parse timestamp secara vectorized
+    import pyarrow.parquet as pq  #Import writer Parquet
+except ImportError:
+    pa = pc = pq = None
+
+# Header tabel di Excel (row 7)
+# Urutan: No, Image, Label, Date/Time, Standard, Status, Image Path (hidden), Target Session (hidden)
+EXPORT_COLUMNS = ['No', 'Image', 'Label', 'Date/Time', 'Standard', 'Status', 'Image Path', 'Target Session']
+
+# FIXED: Start data di row 7 (karena info header 1-6)
+# Row 1-6 digunakan untuk info header (Date, Type, Label, OK, Not OK, QTY)
+# Row 7 adalah header tabel (No, Image, Label, Date/Time, dll)
+# Row 8 dst adalah data
+START_ROW_DATA = 7
+
+# Kolom export CSV/Parquet (log mentah, 1 row = 1 record detected_codes)
+TABULAR_COLUMNS = ['id', 'timestamp', 'code', 'preset', 'status', 'target_session', 'image_path']
+
+
+def _parse_timestamp(value):
+    # Fungsi convert timestamp string dari database ke datetime | Return: datetime, atau None jika format tidak dikenal
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(value, "%Y-%m-%d %H:%M:%S")
+    except (TypeError, ValueError):
+        try:
+            return datetime.fromisoformat(value)
+        except (TypeError, ValueError):
+            return None
+
+
+def _create_thumbnail_pool():
+    # Fungsi buat process pool untuk render thumbnail | Return: ProcessPoolExecutor, atau None untuk render di thread export
+    workers = EXPORT_THUMBNAIL_WORKERS
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 2) - 1)  #Sisakan 1 core untuk thread export (tulis Excel) dan UI
+    if workers <= 0:
+        return None
+    try:
+        return ProcessPoolExecutor(max_workers=workers)
+    except Exception as e:
+        print(f"Warning: Process pool thumbnail tidak bisa dibuat, render tanpa pool: {e}")
+        return None
+
 
+def _submit_thumbnail(pool, image_path, label):
+    # Fungsi jadwalkan render 1 thumbnail untuk record yang belum punya thumbnail tersimpan
+    # Return: Future dengan hasil render_thumbnail (png_bytes, width, height), bytes dikirim balik dari worker lewat pipe
+    if pool is not None:
+        return pool.submit(render_thumbnail, image_path, label)
+    # Tanpa pool: render langsung, hasil dibungkus Future agar cara ambil hasilnya sama
+    future = Future()
+    try:
+        future.set_result(render_thumbnail(image_path, label))
+    except Exception as e:
+        future.set_exception(e)
+    return future
 
-def execute_export(sql_filter="", date_range_desc="", export_label="", current_preset="", progress_callback=None):
+
+def execute_export(sql_filter="", date_range_desc="", export_label="", current_preset="", progress_callback=None, sql_params=None):
     # Fungsi utama untuk mengeksekusi proses export ke Excel dengan filter | Tujuan: Create Excel file dari database dengan styling dan gambar
-    # Parameter: sql_filter (WHERE clause), date_range_desc (deskripsi range), export_label (label filter), current_preset (JIS/DIN), progress_callback (fungsi untuk update progress)
+    # Parameter: sql_filter (WHERE clause dengan placeholder ?), sql_params (nilai untuk placeholder), date_range_desc (deskripsi range), export_label (label filter), current_preset (JIS/DIN), progress_callback (fungsi untuk update progress)
     # Return: String path ke file Excel yang dibuat, atau error message jika gagal
-    
+    # Data dibaca dari cursor per chunk (EXPORT_FETCH_SIZE) dan setiap row ditulis 1 kali dalam mode constant_memory,
+    # sehingga memory tidak bertambah sesuai jumlah data yang di-export
+    # Thumbnail dirender di process pool (EXPORT_THUMBNAIL_WORKERS), row tetap ditulis berurutan
+
     # Helper function untuk update progress
     def update_progress(current, total, message=""):
         if progress_callback:
             progress_callback(current, total, message)
-    
+
     # Generate nama file Excel dengan timestamp agar unik
     # Format: Karton_Report_YYYYMMDD_HHMMSS.xlsx
     excel_filename = f"Karton_Report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-    
+
     from config import EXCEL_DIR #Import direktori output Excel dari config
-    
+
     output_path = os.path.join(EXCEL_DIR, excel_filename) #Gabungkan path direktori dengan nama file untuk mendapat full path
 
-    # List untuk menyimpan path file temporary yang perlu dibersihkan nanti
-    # File temporary dibuat saat resize image untuk Excel
-    temp_files_to_clean = []
+    params = list(sql_params or [])
+    workbook = None  #Workbook yang masih terbuka (ditutup + file dihapus jika export gagal)
 
     try:
         update_progress(0, 100, "Membuka database...")
-        
-        conn = sqlite3.connect(DB_FILE) #Buka koneksi ke database SQLite
-        cursor = conn.cursor() #Buat cursor untuk execute query
-        
-        update_progress(5, 100, "Memeriksa struktur database...")
-        
-        # Check kolom apa saja yang ada di table
-        # PRAGMA table_info mengembalikan informasi struktur tabel
-        cursor.execute("PRAGMA table_info(detected_codes)")
-        columns = [column[1] for column in cursor.fetchall()]  # Ambil nama kolom (index 1)
-        
-        # Cek apakah kolom 'status' dan 'target_session' ada di tabel
-        # Ini untuk backward compatibility dengan database lama yang mungkin belum punya kolom ini
-        has_status = 'status' in columns
-        has_target_session = 'target_session' in columns
-        
-        update_progress(10, 100, "Mengambil data dari database...")
-        
-        # Build query berdasarkan schema yang ada
-        # Jika kolom status dan target_session ada, gunakan kolom asli
-        if has_status and has_target_session:
-            query = f"SELECT timestamp, code, preset, image_path, status, target_session FROM detected_codes {sql_filter} ORDER BY timestamp ASC"
-        # Jika hanya status yang ada, gunakan 'code' sebagai fallback untuk target_session
-        elif has_status:
-            query = f"SELECT timestamp, code, preset, image_path, status, code as target_session FROM detected_codes {sql_filter} ORDER BY timestamp ASC"
-        # Jika tidak ada status dan target_session, gunakan default 'OK' dan 'code'
-        else:
-            query = f"SELECT timestamp, code, preset, image_path, 'OK' as status, code as target_session FROM detected_codes {sql_filter} ORDER BY timestamp ASC"
-        
-        df = pd.read_sql_query(query, conn) #Load data ke pandas DataFrame
-        
-        conn.close() #Tutup koneksi database setelah selesai query
-        
-        # Jika tidak ada data, return early dengan kode "NO_DATA"
-        # Parent function akan handle message ini untuk tampilkan ke user
-        if df.empty:
-            update_progress(100, 100, "Tidak ada data")
-            return "NO_DATA"
-
-        update_progress(15, 100, "Memproses data...")
-
-        # Gunakan current_preset dari parameter
-        # Preset menentukan standard battery (JIS/DIN)
-        export_preset = current_preset if current_preset else "Mixed"
-        
-        # Jika tidak ada preset yang diberikan, deteksi dari data
-        if not current_preset:
-            # Cek apakah kolom 'preset' ada di DataFrame
-            if 'preset' in df.columns and not df['preset'].empty:
-                unique_presets = df['preset'].unique() #Ambil semua unique preset dari data
-                # Jika hanya 1 preset, gunakan itu
-                if len(unique_presets) == 1:
-                    export_preset = unique_presets[0]
-                else:
-                    # Jika mixed preset, gunakan yang paling sering muncul (mode)
-                    export_preset = df['preset'].mode()[0] if not df['preset'].mode().empty else "Mixed"
-
-        # Tentukan label untuk display di Excel header
-        # Jika ada filter label spesifik, tampilkan nama label
-        # Jika "All Label", tampilkan "All Labels"
-        if export_label and export_label != "All Label":
-            label_display = export_label
-        else:
-            label_display = "All Labels"
-
-        update_progress(20, 100, "Menghitung statistik...")
-
-        # Hitung statistik untuk ditampilkan di header Excel
-        qty_actual = len(df)  # Total semua data
-        qty_ok = len(df[df['status'] == 'OK'])  # Jumlah data dengan status OK
-        qty_not_ok = len(df[df['status'] == 'Not OK'])  # Jumlah data dengan status Not OK
-        
-        # FIXED: Start data di row 7 (karena info header 1-6)
-        # Row 1-6 digunakan untuk info header (Date, Type, Label, OK, Not OK, QTY)
-        # Row 7 adalah header tabel (No, Image, Label, Date/Time, dll)
-        # Row 8 dst adalah data
-        START_ROW_DATA = 7
-
-        update_progress(25, 100, "Menyiapkan data untuk Excel...")
-
-        # Prepare data untuk Excel
-        # Konversi kolom timestamp ke datetime object untuk formatting yang benar
-        df['timestamp'] = pd.to_datetime(df['timestamp'])
-        
-        # Insert kolom 'No' di posisi pertama dengan nomor urut 1, 2, 3, ...
-        df.insert(0, 'No', range(1, 1 + len(df)))
-        
-        # Insert kolom 'Image' placeholder (akan diisi dengan gambar actual nanti)
-        df['Image'] = ""  # Placeholder untuk image column
-        
-        # Rename columns ke nama yang user-friendly
-        # Nama internal database -> Nama untuk display di Excel
-        df.rename(columns={
-            'timestamp': 'Date/Time',  # timestamp -> Date/Time
-            'code': 'Label',  # code -> Label
-            'preset': 'Standard',  # preset -> Standard
-            'image_path': 'Image Path',  # image_path -> Image Path
-            'status': 'Status',  # status -> Status
-            'target_session': 'Target Session'  # target_session -> Target Session
-        }, inplace=True)
-        
-        # Reorder columns agar sesuai urutan yang diinginkan di Excel
-        # Urutan: No, Image, Label, Date/Time, Standard, Status, Image Path (hidden), Target Session (hidden)
-        df = df[['No', 'Image', 'Label', 'Date/Time', 'Standard', 'Status', 'Image Path', 'Target Session']]
-
-        update_progress(30, 100, "Membuat file Excel...")
-
-        # Buat Excel file dengan xlsxwriter engine
-        # xlsxwriter memberikan kontrol penuh atas formatting, styling, dan insert image
-        writer = pd.ExcelWriter(output_path, engine='xlsxwriter')
-        
-        sheet_name = datetime.now().strftime("%Y-%m-%d") #Nama sheet menggunakan tanggal hari ini (YYYY-MM-DD)
-        
-        # Write DataFrame ke Excel tanpa header dan index
-        # header=False karena kita akan write header manual dengan format custom
-        # startrow=START_ROW_DATA (row 7) karena row 1-6 untuk info header
-        df.to_excel(writer, sheet_name=sheet_name, index=False, header=False, startrow=START_ROW_DATA)
-        
-        # Ambil workbook dan worksheet object untuk formatting
-        workbook = writer.book
-        worksheet = writer.sheets[sheet_name]
-        
-        update_progress(35, 100, "Mengatur format Excel...")
-        
-        # Define format untuk header tabel (row 7)
-        # Bold, centered, abu-abu background
-        header_format = workbook.add_format({'bold': True, 'align': 'center', 'valign': 'vcenter', 'bg_color': '#D3D3D3'})
-        
-        # Define format untuk info rows (1-6)
-        # Bold, aligned left, font size 11
-        info_merge_format = workbook.add_format({
-            'bold': True, 'align': 'left', 'valign': 'vleft', 'font_size': 11
-        })
-
-        # Define format untuk data cells
-        # Centered dengan border
-        center_format = workbook.add_format({'align': 'center', 'valign': 'vcenter', 'border': 1})
-        
-        # Format khusus untuk datetime cells
-        # Format: yyyy-mm-dd hh:mm:ss, centered, border
-        datetime_center_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss', 'align': 'center', 'valign': 'vcenter', 'border': 1})
-        
-        # Define format untuk "Not OK" rows (red background)
-        # Background merah, text putih untuk highlight error
-        not_ok_format = workbook.add_format({'align': 'center', 'valign': 'vcenter', 'border': 1, 'bg_color': '#FF0000', 'font_color': '#FFFFFF'})
-        
-        # Format datetime untuk Not OK rows
-        not_ok_datetime_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss', 'align': 'center', 'valign': 'vcenter', 'border': 1, 'bg_color': '#FF0000', 'font_color': '#FFFFFF'})
-        
-        # Row 1: Date Range
-        # Merge cell A1:B1 dan tulis info tanggal export
-        date_text = f"Date : {date_range_desc}"
-        worksheet.merge_range('A1:B1', date_text, info_merge_format)
-        
-        # Row 2: Type
-        # Merge cell A2:B2 dan tulis tipe battery (JIS/DIN/Mixed)
-        type_text = f"Type : {export_preset}"
-        worksheet.merge_range('A2:B2', type_text, info_merge_format)
-        
-        # Row 3: Label
-        # Merge cell A3:B3 dan tulis label/sesi yang diexport
-        label_text = f"Label : {label_display}"
-        worksheet.merge_range('A3:B3', label_text, info_merge_format)
-        
-        # Row 4: Status OK
-        # Merge cell A4:B4 dan tulis jumlah data OK
-        status_ok_text = f"OK : {qty_ok}"
-        worksheet.merge_range('A4:B4', status_ok_text, info_merge_format)
-        
-        # Row 5: Status Not OK
-        # Merge cell A5:B5 dan tulis jumlah data Not OK
-        status_not_ok_text = f"Not OK : {qty_not_ok}"
-        worksheet.merge_range('A5:B5', status_not_ok_text, info_merge_format)
-        
-        # Row 6: QTY Actual
-        # Merge cell A6:B6 dan tulis total quantity semua data
-        qty_text = f"QTY Actual : {qty_actual}"
-        worksheet.merge_range('A6:B6', qty_text, info_merge_format)
-        
-        # Row 7: Table Headers
-        # Write header tabel dengan format bold dan background abu-abu
-        for col_num, value in enumerate(df.columns.values):
-            worksheet.write(START_ROW_DATA - 1, col_num, value, header_format)
-        
-        # Set column widths untuk setiap kolom
-        # Lebar dalam satuan karakter (approx)
-        worksheet.set_column('A:A', 5)  # No - narrow column
-        worksheet.set_column('B:B', 30)  # Image - wide untuk accommodate gambar
-        worksheet.set_column('C:C', 20)  # Label - medium
-        worksheet.set_column('D:D', 25)  # Date/Time - cukup untuk format datetime
-        worksheet.set_column('E:E', 10)  # Standard - narrow
-        worksheet.set_column('F:F', 10)  # Status - narrow
-        worksheet.set_column('G:G', 0, options={'hidden': True})  # Hide path column - tidak perlu ditampilkan
-        worksheet.set_column('H:H', 0, options={'hidden': True})  # Hide target session column - tidak perlu ditampilkan
-
-        update_progress(40, 100, "Menulis data ke Excel...")
-
-        # Iterate setiap row data dan tulis ke Excel
-        # iterrows() mengembalikan (index, row_data) untuk setiap baris
-        total_rows = len(df)
-        for row_num, row_data in df.iterrows():
-            # Update progress setiap 10 rows atau di row terakhir
-            if row_num % 10 == 0 or row_num == total_rows - 1:
-                progress = 40 + int((row_num / total_rows) * 50)  # 40-90% untuk processing rows
-                update_progress(progress, 100, f"Memproses baris {row_num + 1} dari {total_rows}...")
-            
-            excel_row = row_num + START_ROW_DATA #Hitung posisi row di Excel (row_num dari DataFrame + START_ROW_DATA)
-            
-            # Ambil image path dan status dari data row
-            image_path = row_data['Image Path']
-            status = row_data['Status']
-            
-            # Gunakan format berbeda untuk Not OK rows
-            # Jika Not OK, gunakan format merah. Jika OK, gunakan format normal
-            cell_format = not_ok_format if status == 'Not OK' else center_format
-            datetime_format = not_ok_datetime_format if status == 'Not OK' else datetime_center_format
-
-            # Write kolom 'No' (nomor urut)
+
+        # Pinjam koneksi read-only dari pool (WAL: export panjang tidak memblokir insert deteksi live)
+        with read_connection() as conn:
+            cursor = conn.cursor() #Buat cursor untuk execute query
+
+            update_progress(5, 100, "Memeriksa struktur database...")
+
+            # Check kolom apa saja yang ada di table
+            # PRAGMA table_info mengembalikan informasi struktur tabel
+            cursor.execute("PRAGMA table_info(detected_codes)")
+            columns = [column[1] for column in cursor.fetchall()]  # Ambil nama kolom (index 1)
+
+            # Cek apakah kolom 'status' dan 'target_session' ada di tabel
+            # Ini untuk backward compatibility dengan database lama yang mungkin belum punya kolom ini
+            has_status = 'status' in columns
+            has_target_session = 'target_session' in columns
+            has_thumbnail = 'thumbnail_id' in columns  #Thumbnail tersimpan (dibuat saat deteksi / backfill)
+
+            # Expression kolom berdasarkan schema yang ada
+            # Jika kolom tidak ada: status default 'OK', target_session fallback ke 'code'
+            status_expr = "status" if has_status else "'OK'"
+            session_expr = "target_session" if has_target_session else "code"
+
+            # 1 transaksi baca (snapshot WAL): statistik header dan row data berasal dari data yang sama
+            # walaupun writer thread meng-insert deteksi baru selama export berjalan
+            cursor.execute("BEGIN")
             try:
-                worksheet.write(excel_row, 0, row_data['No'], cell_format)
-            except Exception:
-                # Fallback jika ada error, gunakan row_num + 1
-                worksheet.write(excel_row, 0, row_num + 1, cell_format)
-            
-            worksheet.write(excel_row, 1, '', cell_format) #Write kolom 'Image' (placeholder kosong, gambar akan di-insert terpisah)
-            
-            # Insert image jika ada
-            # Cek apakah file image benar-benar exist di path yang tersimpan
-            if os.path.exists(image_path):
-                temp_dir = tempfile.gettempdir() #Gunakan temp directory untuk simpan thumbnail hasil resize
-
-                # Generate nama file thumbnail yang unik (include PID dan row_num)
-                thumbnail_filename = f"app_temp_thumb_{os.getpid()}_{row_num}.png"
-                thumbnail_path = os.path.join(temp_dir, thumbnail_filename)
-                
-                temp_files_to_clean.append(thumbnail_path) #Tambahkan ke list cleanup (akan dihapus setelah selesai)
-                
+                update_progress(10, 100, "Menghitung statistik...")
+
+                # Hitung statistik untuk ditampilkan di header Excel langsung di SQL (tanpa load semua row)
+                cursor.execute(f"SELECT COUNT(*), COALESCE(SUM({status_expr} = 'OK'), 0), COALESCE(SUM({status_expr} = 'Not OK'), 0) FROM detected_codes {sql_filter}", params)
+                qty_actual, qty_ok, qty_not_ok = cursor.fetchone()
+
+                # Jika tidak ada data, return early dengan kode "NO_DATA"
+                # Parent function akan handle message ini untuk tampilkan ke user
+                if qty_actual == 0:
+                    update_progress(100, 100, "Tidak ada data")
+                    return "NO_DATA"
+
+                # Gunakan current_preset dari parameter
+                # Preset menentukan standard battery (JIS/DIN)
+                export_preset = current_preset if current_preset else "Mixed"
+
+                # Jika tidak ada preset yang diberikan, deteksi dari data
+                # 1 preset -> pakai itu, mixed preset -> pakai yang paling sering muncul (mode)
+                if not current_preset:
+                    cursor.execute(f"SELECT preset FROM detected_codes {sql_filter} GROUP BY preset ORDER BY COUNT(*) DESC, preset ASC LIMIT 1", params)
+                    preset_row = cursor.fetchone()
+                    if preset_row and preset_row[0] is not None:
+                        export_preset = preset_row[0]
+
+                # Tentukan label untuk display di Excel header
+                # Jika ada filter label spesifik, tampilkan nama label
+                # Jika "All Label", tampilkan "All Labels"
+                if export_label and export_label != "All Label":
+                    label_display = export_label
+                else:
+                    label_display = "All Labels"
+
+                update_progress(20, 100, "Membuat file Excel...")
+
+                # Buat Excel file dengan xlsxwriter mode constant_memory
+                # Setiap row di-flush ke file begitu row berikutnya ditulis, jadi row harus ditulis berurutan
+                workbook = xlsxwriter.Workbook(output_path, {'constant_memory': True})
+
+                sheet_name = datetime.now().strftime("%Y-%m-%d") #Nama sheet menggunakan tanggal hari ini (YYYY-MM-DD)
+                worksheet = workbook.add_worksheet(sheet_name)
+
+                # Define format untuk header tabel (row 7)
+                # Bold, centered, abu-abu background
+                header_format = workbook.add_format({'bold': True, 'align': 'center', 'valign': 'vcenter', 'bg_color': '#D3D3D3'})
+
+                # Define format untuk info rows (1-6)
+                # Bold, aligned left, font size 11
+                info_merge_format = workbook.add_format({
+                    'bold': True, 'align': 'left', 'valign': 'vleft', 'font_size': 11
+                })
+
+                # Define format untuk data cells
+                # Centered dengan border
+                center_format = workbook.add_format({'align': 'center', 'valign': 'vcenter', 'border': 1})
+
+                # Format khusus untuk datetime cells
+                # Format: yyyy-mm-dd hh:mm:ss, centered, border
+                datetime_center_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss', 'align': 'center', 'valign': 'vcenter', 'border': 1})
+
+                # Define format untuk "Not OK" rows (red background)
+                # Background merah, text putih untuk highlight error
+                not_ok_format = workbook.add_format({'align': 'center', 'valign': 'vcenter', 'border': 1, 'bg_color': '#FF0000', 'font_color': '#FFFFFF'})
+
+                # Format datetime untuk Not OK rows
+                not_ok_datetime_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm:ss', 'align': 'center', 'valign': 'vcenter', 'border': 1, 'bg_color': '#FF0000', 'font_color': '#FFFFFF'})
+
+                # Set column widths untuk setiap kolom
+                # Lebar dalam satuan karakter (approx)
+                worksheet.set_column('A:A', 5)  # No - narrow column
+                worksheet.set_column('B:B', 30)  # Image - wide untuk accommodate gambar
+                worksheet.set_column('C:C', 20)  # Label - medium
+                worksheet.set_column('D:D', 25)  # Date/Time - cukup untuk format datetime
+                worksheet.set_column('E:E', 10)  # Standard - narrow
+                worksheet.set_column('F:F', 10)  # Status - narrow
+                worksheet.set_column('G:G', 0, options={'hidden': True})  # Hide path column - tidak perlu ditampilkan
+                worksheet.set_column('H:H', 0, options={'hidden': True})  # Hide target session column - tidak perlu ditampilkan
+
+                # Row 1-6: Info header (merge cell A:B)
+                # Date range, tipe battery (JIS/DIN/Mixed), label/sesi, jumlah OK, jumlah Not OK, total quantity
+                worksheet.merge_range('A1:B1', f"Date : {date_range_desc}", info_merge_format)
+                worksheet.merge_range('A2:B2', f"Type : {export_preset}", info_merge_format)
+                worksheet.merge_range('A3:B3', f"Label : {label_display}", info_merge_format)
+                worksheet.merge_range('A4:B4', f"OK : {qty_ok}", info_merge_format)
+                worksheet.merge_range('A5:B5', f"Not OK : {qty_not_ok}", info_merge_format)
+                worksheet.merge_range('A6:B6', f"QTY Actual : {qty_actual}", info_merge_format)
+
+                # Row 7: Table Headers
+                # Write header tabel dengan format bold dan background abu-abu
+                for col_num, value in enumerate(EXPORT_COLUMNS):
+                    worksheet.write(START_ROW_DATA - 1, col_num, value, header_format)
+
+                update_progress(25, 100, "Menulis data ke Excel...")
+
+                # Query data urut waktu, dibaca per chunk dari cursor
+                # Thumbnail tersimpan ikut diambil lewat LEFT JOIN (NULL jika record belum punya thumbnail)
+                if has_thumbnail:
+                    thumbnail_columns = "thumbnails.png, thumbnails.width, thumbnails.height"
+                    thumbnail_join = "LEFT JOIN thumbnails ON thumbnails.id = detected_codes.thumbnail_id"
+                else:
+                    thumbnail_columns = "NULL, NULL, NULL"
+                    thumbnail_join = ""
+                cursor.execute(f"SELECT timestamp, code, preset, image_path, {status_expr} AS status, {session_expr} AS target_session, {thumbnail_columns} FROM detected_codes {thumbnail_join} {sql_filter} ORDER BY timestamp ASC", params)
+
+                total_rows = qty_actual
+
+                # Semua thumbnail disisipkan dari memory (image_data), tidak ada file temporary yang ditulis/dibaca/dihapus
+                # Thumbnail tersimpan langsung dipakai dari bytes PNG (tanpa decode/render ulang)
+                # Record lama tanpa thumbnail dirender paralel di process pool, sementara thread ini menulis row secara berurutan
+                # thumbnail_jobs: (image path, label) -> Future (gambar yang dipakai bersama cukup dirender 1 kali)
+                # ready_thumbnails hanya menyimpan key dari chunk yang sedang ditulis dan chunk lookahead,
+                # entry lain dibuang setelah chunk-nya ditulis (memory tidak bertambah sesuai jumlah gambar)
+                thumbnail_jobs = {}
+                ready_thumbnails = {}  #(image path, label) -> (BytesIO PNG, tinggi, x_offset, y_offset)
+
+                def submit_chunk(chunk):
+                    # Jadwalkan render thumbnail untuk semua row di chunk (sebelum chunk sebelumnya selesai ditulis)
+                    for _, label, _, image_path, _, _, png, width, height in chunk:
+                        key = (image_path, label)
+                        if key in ready_thumbnails or key in thumbnail_jobs:
+                            continue
+                        if png is not None:
+                            ready_thumbnails[key] = (BytesIO(png), height) + thumbnail_offsets(width, height)
+                        # Cek apakah file image benar-benar exist di path yang tersimpan
+                        elif image_path and os.path.exists(image_path):
+                            thumbnail_jobs[key] = _submit_thumbnail(thumbnail_pool, image_path, label)
+
+                thumbnail_pool = _create_thumbnail_pool()
                 try:
-                    # Hitung max width untuk kolom B dalam pixel
-                    # 30 characters * 7 pixels per character (approx)
-                    max_col_b_px = int(30 * 7)
-                    
-                    target_row_max_height = 150 #Target max height untuk row (dalam pixel)
-
-                    # Load gambar dan konversi ke RGB
-                    # Convert RGB diperlukan untuk ensure 3 channels (tanpa alpha)
-                    img = Image.open(image_path).convert("RGB")
-
-                    # Draw detected label pada gambar
-                    # ImageDraw untuk menggambar text dan shape di image
-                    draw = ImageDraw.Draw(img)
-                    
-                    # Load font untuk text (arial 30pt)
-                    try:
-                        font = ImageFont.truetype("arial.ttf", 30)
-                    except IOError:
-                        # Fallback ke default font jika arial.ttf tidak ada
-                        font = ImageFont.load_default()
-
-                    text_display = f"Detected: {row_data['Label']}" #Text yang akan ditampilkan di gambar
-
-                    # Hitung bounding box untuk text (untuk background rectangle)
-                    # Position text di bottom-left image (x=10, y=height-50)
-                    bbox = draw.textbbox((10, img.height - 50), text_display, font=font)
-                    
-                    # Draw semi-transparent black rectangle sebagai background text
-                    # Padding 5px dari text bbox
-                    draw.rectangle([bbox[0]-5, bbox[1]-5, bbox[2]+5, bbox[3]+5], fill=(0, 0, 0, 100))
-                    
-                    # Draw text berwarna kuning di atas background hitam
-                    draw.text((15, img.height - 50), text_display, fill=(255, 255, 0), font=font)
-
-                    # Calculate scaling untuk fit dalam Excel cell
-                    # Prioritas: fit height terlebih dahulu
-                    width_percent = (target_row_max_height / float(img.size[1]))
-                    target_width = int(float(img.size[0]) * width_percent)
-                    target_height = target_row_max_height
-
-                    # Jika setelah scale height, width melebihi max column width
-                    # Scale ulang berdasarkan width
-                    if target_width > max_col_b_px:
-                        scale = max_col_b_px / float(img.size[0])
-                        target_width = max_col_b_px
-                        target_height = int(float(img.size[1]) * scale)
-
-                    # Set row height untuk accommodate image
-                    # Row height dalam points (1 point ≈ 1.33 pixels)
-                    worksheet.set_row(excel_row, target_height)
-                    
-                    # Resize dan save thumbnail
-                    # Resampling method dari config (biasanya LANCZOS untuk quality terbaik)
-                    img_resized = img.resize((target_width, target_height), Resampling)
-                    img_resized.save(thumbnail_path, format='PNG')
-
-                    # Calculate offset untuk center image di cell
-                    # Offset X: center horizontal dalam kolom B
-                    x_offset = max(0, (max_col_b_px - target_width) // 2 + 5)
-                    # Offset Y: center vertical dalam row
-                    y_offset = max(0, (target_row_max_height - target_height) // 2)
-
-                    # Insert image ke Excel di kolom B (index 1) pada row yang sesuai
-                    # x_scale dan y_scale = 1 berarti no additional scaling
-                    # x_offset dan y_offset untuk positioning dalam cell
-                    worksheet.insert_image(excel_row, 1, thumbnail_path, {'x_scale': 1, 'y_scale': 1, 'x_offset': x_offset, 'y_offset': y_offset})
-                
-                except Exception as img_e:
-                    # Jika ada error saat process/insert image, print warning
-                    # Tapi proses export tetap lanjut (tidak critical error)
-                    print(f"Warning: Gagal memproses atau menyisipkan gambar untuk baris {row_num}: {img_e}")
-                
-            # Write data columns lainnya
-            # Kolom C: Label (kode battery yang terdeteksi)
-            worksheet.write(excel_row, 2, row_data['Label'], cell_format)
-            
-            # Kolom D: Date/Time (timestamp dengan format datetime)
-            worksheet.write_datetime(excel_row, 3, row_data['Date/Time'], datetime_format)
-            
-            # Kolom E: Standard (JIS/DIN)
-            worksheet.write(excel_row, 4, row_data['Standard'], cell_format)
-            
-            # Kolom F: Status (OK/Not OK)
-            worksheet.write(excel_row, 5, row_data['Status'], cell_format)
-            
-            # Kolom G: Image Path (hidden column - untuk reference jika perlu)
-            worksheet.write(excel_row, 6, row_data['Image Path'], cell_format)
-            
-            # Kolom H: Target Session (hidden column - untuk reference jika perlu)
-            worksheet.write(excel_row, 7, row_data['Target Session'], cell_format)
+                    pending_chunks = deque()  #Chunk yang thumbnail-nya sudah dijadwalkan tapi row-nya belum ditulis
+                    row_num = 0
+                    while True:
+                        # Ambil + jadwalkan 1 chunk di depan, supaya worker tetap sibuk selama chunk sekarang ditulis
+                        chunk = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                        if chunk:
+                            submit_chunk(chunk)
+                            pending_chunks.append(chunk)
+                            if len(pending_chunks) < 2:
+                                continue
+                        if not pending_chunks:
+                            break
+
+                        written_chunk = pending_chunks.popleft()
+                        for timestamp, label, standard, image_path, status, target_session, _, _, _ in written_chunk:
+                            # Update progress setiap 10 rows atau di row terakhir
+                            if row_num % 10 == 0 or row_num == total_rows - 1:
+                                progress = 25 + int((row_num / total_rows) * 65)  # 25-90% untuk render thumbnail dan menulis rows
+                                update_progress(progress, 100, f"Memproses baris {row_num + 1} dari {total_rows}...")
+
+                            excel_row = row_num + START_ROW_DATA #Hitung posisi row di Excel (row_num + START_ROW_DATA)
+
+                            # Gunakan format berbeda untuk Not OK rows
+                            # Jika Not OK, gunakan format merah. Jika OK, gunakan format normal
+                            cell_format = not_ok_format if status == 'Not OK' else center_format
+                            datetime_format = not_ok_datetime_format if status == 'Not OK' else datetime_center_format
+
+                            # Insert image jika ada (tunggu thumbnail row ini, set_row dipanggil sebelum row ini di-flush)
+                            key = (image_path, label)
+                            thumbnail = ready_thumbnails.get(key)
+                            job = thumbnail_jobs.pop(key, None) if thumbnail is None else None
+                            if job is not None:
+                                try:
+                                    png, width, height = job.result()
+                                    thumbnail = (BytesIO(png), height) + thumbnail_offsets(width, height)
+                                    ready_thumbnails[key] = thumbnail  #Row lain dengan gambar + label sama memakai buffer yang sama
+                                except Exception as img_e:
+                                    # Jika ada error saat process image, print warning
+                                    # Tapi proses export tetap lanjut (tidak critical error)
+                                    print(f"Warning: Gagal memproses atau menyisipkan gambar untuk baris {row_num}: {img_e}")
+                                    ready_thumbnails[key] = None  #Jangan dicoba ulang untuk row lain
+
+                            if thumbnail is not None:
+                                image_data, target_height, x_offset, y_offset = thumbnail
+                                # Set row height untuk accommodate image
+                                worksheet.set_row(excel_row, target_height)
+                                # Insert image ke Excel di kolom B (index 1) pada row yang sesuai dari buffer PNG di memory
+                                # (nama file hanya dipakai sebagai nama gambar di Excel, tidak dibaca dari disk)
+                                # x_scale dan y_scale = 1 berarti no additional scaling
+                                worksheet.insert_image(excel_row, 1, "thumbnail.png", {'image_data': image_data, 'x_scale': 1, 'y_scale': 1, 'x_offset': x_offset, 'y_offset': y_offset})
+
+                            # Kolom A: No (nomor urut), kolom B: Image (placeholder kosong, gambar di-insert terpisah)
+                            worksheet.write(excel_row, 0, row_num + 1, cell_format)
+                            worksheet.write(excel_row, 1, '', cell_format)
+
+                            # Kolom C: Label (kode battery yang terdeteksi)
+                            worksheet.write(excel_row, 2, label, cell_format)
+
+                            # Kolom D: Date/Time (timestamp dengan format datetime, string asli jika format tidak dikenal)
+                            timestamp_value = _parse_timestamp(timestamp)
+                            if timestamp_value is not None:
+                                worksheet.write_datetime(excel_row, 3, timestamp_value, datetime_format)
+                            else:
+                                worksheet.write(excel_row, 3, timestamp, cell_format)
+
+                            # Kolom E: Standard (JIS/DIN)
+                            worksheet.write(excel_row, 4, standard, cell_format)
+
+                            # Kolom F: Status (OK/Not OK)
+                            worksheet.write(excel_row, 5, status, cell_format)
+
+                            # Kolom G: Image Path (hidden column - untuk reference jika perlu)
+                            worksheet.write(excel_row, 6, image_path, cell_format)
+
+                            # Kolom H: Target Session (hidden column - untuk reference jika perlu)
+                            worksheet.write(excel_row, 7, target_session, cell_format)
+
+                            row_num += 1
+
+                        # Buang thumbnail chunk yang sudah ditulis, kecuali masih dipakai row di chunk lookahead
+                        lookahead_keys = {(row[3], row[1]) for pending_chunk in pending_chunks for row in pending_chunk}
+                        for _, label, _, image_path, _, _, _, _, _ in written_chunk:
+                            key = (image_path, label)
+                            if key not in lookahead_keys:
+                                ready_thumbnails.pop(key, None)
+                finally:
+                    if thumbnail_pool is not None:
+                        thumbnail_pool.shutdown(wait=True, cancel_futures=True)
+            finally:
+                conn.rollback()  #Akhiri transaksi baca sebelum koneksi dikembalikan ke pool
 
         update_progress(90, 100, "Menyimpan file Excel...")
-        
-        writer.close() # Close Excel writer
 
-        update_progress(95, 100, "Membersihkan file temporary...")
-
-        # Cleanup temporary files
-        # Hapus semua file thumbnail yang dibuat selama proses
-        for t_path in temp_files_to_clean:
-            if os.path.exists(t_path):
-                try:
-                    os.remove(t_path)
-                except:
-                    # Jika gagal hapus (file locked), skip saja
-                    pass
+        workbook.close() # Close Excel workbook
+        workbook = None
 
         update_progress(100, 100, "Export selesai!")
         return output_path #Return path file Excel yang berhasil dibuat
@@ -383,16 +357,130 @@ def execute_export(sql_filter="", date_range_desc="", export_label="", current_p
     except Exception as e:
         # Jika terjadi error di proses manapun, print error message
         print(f"Export error: {e}")
-        
+
+        # Tutup workbook (file temporary constant_memory ikut dibersihkan) lalu hapus file Excel yang setengah jadi
+        if workbook is not None:
+            try:
+                workbook.close()
+            except Exception:
+                pass
+            try:
+                if os.path.exists(output_path):
+                    os.remove(output_path)
+            except OSError as remove_e:
+                print(f"Warning: Gagal menghapus file export yang gagal {output_path}: {remove_e}")
+
         update_progress(100, 100, f"Error: {e}")
-        
-        # Cleanup temp files jika terjadi error
-        # Penting untuk cleanup walau error untuk hindari file sampah
-        for t_path in temp_files_to_clean:
-            if os.path.exists(t_path):
-                try:
-                    os.remove(t_path)
-                except:
-                    pass
-        
-        return f"EXPORT_ERROR: {e}" #Return error message ke parent untuk ditampilkan ke user
\ No newline at end of file
+
+        return f"EXPORT_ERROR: {e}" #Return error message ke parent untuk ditampilkan ke user
+
+
+def execute_tabular_export(sql_filter="", export_format="CSV", progress_callback=None, sql_params=None):
+    # Fungsi export log deteksi mentah ke CSV atau Parquet (tanpa gambar, image_path sebagai referensi)
+    # Tujuan: Audit data berbulan-bulan (jutaan row) dengan cepat, data di-stream per chunk dari cursor
+    # Parameter: sql_filter (WHERE clause dengan placeholder ?), export_format ("CSV" atau "Parquet"),
+    #            progress_callback (fungsi untuk update progress), sql_params (nilai untuk placeholder)
+    # Return: String path file yang dibuat, "NO_DATA", atau "EXPORT_ERROR: ..." jika gagal
+
+    # Helper function untuk update progress
+    def update_progress(current, total, message=""):
+        if progress_callback:
+            progress_callback(current, total, message)
+
+    if export_format == "Parquet" and pq is None:
+        return "EXPORT_ERROR: Export Parquet membutuhkan library pyarrow (pip install pyarrow)"
+
+    from config import EXCEL_DIR #Import direktori output export dari config
+
+    extension = ".parquet" if export_format == "Parquet" else ".csv"
+    output_path = os.path.join(EXCEL_DIR, f"Karton_Log_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extension}")
+    params = list(sql_params or [])
+
+    try:
+        update_progress(0, 100, "Membuka database...")
+
+        # Pinjam koneksi read-only dari pool (WAL: export panjang tidak memblokir insert deteksi live)
+        with read_connection() as conn:
+            cursor = conn.cursor()
+
+            # Backward compatibility dengan database lama tanpa kolom status/target_session
+            cursor.execute("PRAGMA table_info(detected_codes)")
+            columns = [column[1] for column in cursor.fetchall()]
+            status_expr = "status" if 'status' in columns else "'OK'"
+            session_expr = "target_session" if 'target_session' in columns else "code"
+
+            # 1 transaksi baca (snapshot WAL): jumlah row untuk progress sama dengan row yang di-export
+            cursor.execute("BEGIN")
+            try:
+                cursor.execute(f"SELECT COUNT(*) FROM detected_codes {sql_filter}", params)
+                total_rows = cursor.fetchone()[0]
+                if total_rows == 0:
+                    update_progress(100, 100, "Tidak ada data")
+                    return "NO_DATA"
+
+                cursor.execute(f"SELECT id, timestamp, code, preset, {status_expr} AS status, {session_expr} AS target_session, image_path "
+                               f"FROM detected_codes {sql_filter} ORDER BY timestamp ASC", params)
+
+                def chunks():
+                    # Generator chunk row dari cursor + update progress per chunk
+                    rows_written = 0
+                    while True:
+                        chunk = cursor.fetchmany(EXPORT_TABULAR_FETCH_SIZE)
+                        if not chunk:
+                            return
+                        yield chunk
+                        rows_written += len(chunk)
+                        update_progress(int(rows_written / total_rows * 95), 100, f"Menulis {rows_written} dari {total_rows} baris...")
+
+                if export_format == "Parquet":
+                    _write_parquet(output_path, chunks())
+                else:
+                    _write_csv(output_path, chunks())
+            finally:
+                conn.rollback()  #Akhiri transaksi baca sebelum koneksi dikembalikan ke pool
+
+        update_progress(100, 100, "Export selesai!")
+        return output_path
+
+    except Exception as e:
+        print(f"Export error: {e}")
+        update_progress(100, 100, f"Error: {e}")
+        return f"EXPORT_ERROR: {e}"
+
+
+def _write_csv(output_path, chunks):
+    # Fungsi tulis chunk row ke file CSV (UTF-8, header TABULAR_COLUMNS)
+    with open(output_path, "w", newline="", encoding="utf-8") as f:
+        csv_writer = csv.writer(f)
+        csv_writer.writerow(TABULAR_COLUMNS)
+        for chunk in chunks:
+            csv_writer.writerows(chunk)
+
+
+def _write_parquet(output_path, chunks):
+    # Fungsi tulis chunk row ke file Parquet terkompresi (1 chunk = 1 row group)
+    writer = None
+    try:
+        for chunk in chunks:
+            table = _chunk_to_arrow(chunk)
+            if writer is None:
+                writer = pq.ParquetWriter(output_path, table.schema, compression=EXPORT_PARQUET_COMPRESSION)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def _chunk_to_arrow(chunk):
+    # Fungsi convert 1 chunk row database ke pyarrow Table | Return: pa.Table dengan kolom TABULAR_COLUMNS
+    ids, timestamps, codes, presets, statuses, sessions, image_paths = zip(*chunk)
+    return pa.table({
+        'id': pa.array(ids, type=pa.int64()),
+        # Parse timestamp "YYYY-MM-DD HH:MM:SS" secara vectorized ke kolom bertipe timestamp, format tidak dikenal menjadi null
+        'timestamp': pc.strptime(pa.array(timestamps, type=pa.string()), format="%Y-%m-%d %H:%M:%S", unit="s", error_is_null=True),
+        'code': pa.array(codes, type=pa.string()),
+        'preset': pa.array(presets, type=pa.string()),
+        'status': pa.array(statuses, type=pa.string()),
+        'target_session': pa.array(sessions, type=pa.string()),
+        'image_path': pa.array(image_paths, type=pa.string()),
+    })
@@ -0,0 +1,74 @@
+# Cache turunan frame kamera (crop, resize, edge, split canvas) per frame
+# File ini berisi FrameViews (cache lazy per frame) dan resize_frame (resize OpenCV sesuai arah scaling)
+# Tujuan: Preview dan OCR memakai frame kamera yang sama (CapturedFrame.views), jadi center crop, edge detection,
+#         dan split canvas dihitung maksimal 1 kali per frame, dan turunan yang tidak dipakai tidak dihitung sama sekali
+import threading  #Import threading untuk lock cache (preview dan thread scan OCR bisa mengakses frame yang sama)
+
+import cv2  #Import OpenCV untuk resize
+import numpy as np  #Import numpy untuk canvas split mode
+
+from utils import apply_edge_detection  #Import edge detection (turunan 'edge')
+
+
+def resize_frame(frame, width, height):
+    # Resize frame dengan OpenCV | INTER_AREA untuk perkecil (tanpa aliasing), INTER_LINEAR untuk perbesar
+    # Return: frame asli jika ukuran sudah sama (tanpa copy)
+    h, w = frame.shape[:2]
+    if (w, h) == (width, height):
+        return frame
+    interpolation = cv2.INTER_AREA if width < w or height < h else cv2.INTER_LINEAR
+    return cv2.resize(frame, (width, height), interpolation=interpolation)
+
+
+class FrameViews:
+    # Turunan 1 frame kamera, dihitung saat pertama kali diminta lalu disimpan (key = jenis turunan + parameter)
+    # Semua array hasil dipakai bersama: consumer tidak boleh mengubah isinya (copy dulu jika perlu)
+
+    def __init__(self, frame):
+        self.frame = frame  #Frame asli BGR dari kamera (juga dipakai writer untuk simpan gambar)
+        self._cache = {}
+        self._lock = threading.RLock()  #RLock: turunan memanggil turunan lain (split -> scaled -> edge -> crop)
+
+    def _get(self, key, compute):
+        # Ambil turunan dari cache, hitung 1 kali jika belum ada (thread lain menunggu, tidak menghitung ulang)
+        with self._lock:
+            view = self._cache.get(key)
+            if view is None:
+                view = compute()
+                self._cache[key] = view
+            return view
+
+    def crop(self):
+        # Center crop persegi (slice numpy, tanpa copy) | Sama untuk preview dan OCR
+        def compute():
+            h, w = self.frame.shape[:2]
+            min_dim = min(h, w)
+            start_x = (w - min_dim) // 2
+            start_y = (h - min_dim) // 2
+            return self.frame[start_y:start_y + min_dim, start_x:start_x + min_dim]
+        return self._get('crop', compute)
+
+    def edge(self):
+        # Edge detection dari crop ukuran penuh (edge mode)
+        return self._get('edge', lambda: apply_edge_detection(self.crop()))
+
+    def base(self, edge_mode=False):
+        # Crop yang dipakai preview dan OCR: edge jika edge mode aktif, crop asli jika tidak
+        return self.edge() if edge_mode else self.crop()
+
+    def scaled(self, width, height, edge_mode=False):
+        # base() yang di-resize ke (width, height) | Preview dan OCR berbagi hasil jika ukurannya sama
+        return self._get(('scaled', width, height, edge_mode),
+                         lambda: resize_frame(self.base(edge_mode), width, height))
+
+    def split_canvas(self, width, height, edge_mode=False):
+        # Canvas split mode ukuran (width, height): top = edge detection, bottom = base(), masing-masing setengah tinggi
+        def compute():
+            content_size = height // 2
+            frame_scaled = self.scaled(content_size, content_size, edge_mode)
+            canvas = np.zeros((height, width, 3), dtype=np.uint8)
+            x_offset = (width - content_size) // 2 #Center horizontal
+            canvas[:content_size, x_offset:x_offset + content_size] = apply_edge_detection(frame_scaled)
+            canvas[content_size:content_size * 2, x_offset:x_offset + content_size] = frame_scaled
+            return canvas
+        return self._get(('split', width, height, edge_mode), compute)
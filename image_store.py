@@ -0,0 +1,122 @@
+# Penyimpanan file gambar deteksi (bukti foto karton)
+# File ini berisi ImageStore: nama file unik, folder per hari, dan penulisan atomic (tulis file sementara lalu rename)
+# serta fungsi hash isi gambar (SHA-256) dan perceptual hash (dHash) untuk deduplikasi
+# Tujuan: 2 deteksi dalam detik yang sama tidak saling menimpa gambar, folder gambar tidak menjadi 1 folder raksasa,
+#         dan file yang terbaca (export/preview) tidak pernah setengah tertulis
+import hashlib  #Import hashlib untuk hash isi file gambar (deduplikasi)
+import os  #Import os untuk operasi file dan folder
+import threading  #Import threading untuk lock nomor urut nama file
+from datetime import datetime  #Import datetime untuk nama file dan folder per hari
+
+import cv2  #Import OpenCV untuk encode gambar ke JPEG
+
+from config import IMAGE_DIR  #Import folder root gambar dari config.py
+
+
+class ImageStore:
+    # Store gambar di bawah root/YYYY-MM-DD/karton_YYYYMMDD_HHMMSS_mmm_NNN.jpg (mmm = milidetik, NNN = nomor urut)
+    # Path yang dikembalikan adalah path yang disimpan di database (relatif terhadap working directory, seperti sebelumnya)
+
+    def __init__(self, root=IMAGE_DIR, extension=".jpg"):
+        self.root = root
+        self.extension = extension
+        self._lock = threading.Lock()
+        self._sequence = 0  #Nomor urut nama file (ditambahkan setelah milidetik)
+        self._known_dirs = set()  #Folder per hari yang sudah pasti ada (hindari makedirs berulang)
+
+    def new_path(self, when=None):
+        # Fungsi buat path gambar baru yang unik (tanpa menyentuh disk)
+        # Parameter: when (datetime, default sekarang)
+        # Return: string path file gambar
+        when = when or datetime.now()
+        with self._lock:
+            # Nomor urut berputar 000-999 (tidak di-reset per milidetik), jadi nama tetap unik
+            # walaupun banyak gambar dalam milidetik yang sama atau jam sistem mundur sedikit
+            self._sequence = (self._sequence + 1) % 1000
+            sequence = self._sequence
+
+        day_dir = os.path.join(self.root, when.strftime("%Y-%m-%d"))
+        filename = f"karton_{when.strftime('%Y%m%d_%H%M%S')}_{when.microsecond // 1000:03d}_{sequence:03d}{self.extension}"
+        return os.path.join(day_dir, filename)
+
+    def day_of(self, path):
+        # Return: string tanggal YYYY-MM-DD dari path (nama folder), atau None untuk gambar lama di folder root
+        folder = os.path.basename(os.path.dirname(path))
+        try:
+            datetime.strptime(folder, "%Y-%m-%d")
+            return folder
+        except ValueError:
+            return None
+
+    def encode(self, image):
+        # Fungsi encode gambar ke bytes sesuai extension store | Return: bytes, atau None jika gagal
+        try:
+            ok, encoded = cv2.imencode(self.extension, image)
+            if not ok:
+                print("Warning: Gagal encode gambar")
+                return None
+            return encoded.tobytes()
+        except Exception as e:
+            print(f"Error encoding image: {e}")
+            return None
+
+    def write_bytes(self, path, data):
+        # Fungsi tulis bytes gambar secara atomic | Return: ukuran file dalam byte, atau None jika gagal
+        directory = os.path.dirname(path)
+        temp_path = f"{path}.tmp"
+        try:
+            if directory and directory not in self._known_dirs:
+                os.makedirs(directory, exist_ok=True)
+                self._known_dirs.add(directory)
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)  #Rename atomic: file akhir selalu lengkap
+            return len(data)
+        except Exception as e:
+            print(f"Error saving image {path}: {e}")
+            try:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            except OSError:
+                pass
+            return None
+
+    def delete(self, path):
+        # Fungsi hapus 1 file gambar | Return: Boolean True jika file terhapus atau memang tidak ada
+        if not path:
+            return True
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return True
+        except Exception as e:
+            print(f"Warning: Gagal menghapus file gambar {path}: {e}")
+            return False
+
+
+def content_hash(data):
+    # Fungsi hash isi file gambar | Return: string hex SHA-256 (sama persis = byte-for-byte identik)
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(image, hash_size=8):
+    # Fungsi dHash gambar (difference hash) | Tujuan: Gambar yang hampir identik (noise kecil, kompresi) punya hash sama
+    # Parameter: image (numpy array, gambar edge dari convert_frame_to_binary), hash_size (grid hash_size x hash_size)
+    # Return: string hex hash (hash_size * hash_size bit), atau None jika gagal
+    try:
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        # Resize ke (hash_size + 1) x hash_size lalu bandingkan pixel kiri vs kanan
+        small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+        bits = (small[:, 1:] > small[:, :-1]).flatten()
+        value = 0
+        for bit in bits:
+            value = (value << 1) | int(bit)
+        return f"{value:0{(hash_size * hash_size + 3) // 4}x}"
+    except Exception as e:
+        print(f"Error computing perceptual hash: {e}")
+        return None
+
+
+# Image store global (dipakai thread OCR untuk buat path dan writer thread untuk simpan file)
+IMAGE_STORE = ImageStore()
@@ -4,7 +4,6 @@
 import sys  # Module untuk system operations | Modul untuk system-level operations
 from PySide6.QtWidgets import QApplication, QMessageBox  # GUI framework widgets | PySide6 UI components
 from PySide6.QtCore import QLocale  # Untuk set locale/bahasa | Untuk set language/locale settings
-from ui import MainWindow  # Import main window class | Import MainWindow dari ui module
 
 
 def main():
@@ -17,18 +16,21 @@ def main():
         import PIL.Image as Image #PIL (Pillow) digunakan untuk pengolahan gambar (image processing), seperti membuka gambar, resize, crop, rotate, convert format (RGB, grayscale), dll.
         import numpy as np #NumPy digunakan untuk operasi numerik dan array (matriks),untuk mengolah data gambar (pixel).
         import easyocr #EasyOCR adalah library Optical Character Recognition (OCR), fungsinya untuk membaca teks dari gambar secara otomatis.
-        import pandas #Pandas digunakan untuk pengolahan dan manajemen data berbentuk tabel (DataFrame), seperti  mengelola kolom/baris, filtering data.
-        import openpyxl #OpenPyXL digunakan untuk membaca dan menulis file Excel (.xlsx).
         import xlsxwriter #XlsxWriter digunakan untuk membuat file Excel (.xlsx) dari awal, fokus pada penulisan data dan formatting (warna cell, border, merge cell, dll).
+        # pyarrow tidak dicek di sini: opsional, hanya dibutuhkan untuk export Parquet
     except ImportError as e:
         # Tampilkan error dialog jika ada library yang missing - user harus install dependencies dulu
-        QMessageBox.critical(None, "Dependency Error", f"Library yang dibutuhkan tidak ditemukan. Harap instal:\nPySide6, opencv-python, easyocr, pandas, openpyxl, xlsxwriter, pillow, numpy.\nError: {e}")
+        QMessageBox.critical(None, "Dependency Error", f"Library yang dibutuhkan tidak ditemukan. Harap instal:\nPySide6, opencv-python, easyocr, xlsxwriter, pillow, numpy.\nError: {e}")
         sys.exit(1)
         
     # Set locale ke Indonesian untuk date/time formatting - tampilkan tanggal/waktu dalam bahasa Indonesia
     locale = QLocale(QLocale.Indonesian, QLocale.Indonesia)
     QLocale.setDefault(locale)
     
+    # Import MainWindow di dalam main(), bukan di level module: worker process export (spawn) meng-import ulang
+    # main.py, sehingga import UI/OCR di level module akan ikut di-load di setiap worker
+    from ui import MainWindow  # Import main window class | Import MainWindow dari ui module
+
     # Buat instance MainWindow dan tampilkan - inisialisasi UI utama dan tampilkan ke screen
     window = MainWindow()
     window.show()
@@ -0,0 +1,429 @@
+# Matcher closed-vocabulary untuk label JIS/DIN dengan index yang dibangun sekali dari config
+# File ini menggantikan loop SequenceMatcher terhadap seluruh JIS_TYPES/DIN_TYPES di setiap text OCR
+# Tujuan: Hasil label dan score SAMA PERSIS dengan fuzzy matching lama, tapi jauh lebih cepat
+#
+# Cara kerja:
+# - Exact match dicari lewat dictionary (O(1))
+# - Label dikelompokkan per panjang string, sehingga label yang panjangnya terlalu beda langsung dilewati
+#   (ratio SequenceMatcher <= 2*min(len)/(len_a+len_b))
+# - Sisa kandidat disaring dengan batas atas dari jumlah karakter yang sama (seperti quick_ratio)
+# - SequenceMatcher hanya dihitung untuk kandidat yang masih mungkin menang,
+#   dan objeknya dibuat sekali per label (index karakter label tidak dibangun ulang)
+#
+# Batch mode (match_batch): semua text OCR dari 1 scan di-encode menjadi array NumPy,
+# lalu panjang LCS untuk matrix kandidat x label dihitung sekaligus (bit-parallel LCS, vectorized).
+# Setiap label disimpan sebagai bitmask posisi per karakter (uint64), sehingga cukup 1 loop Python
+# per posisi karakter query; semua kandidat x label diproses dalam 1 operasi NumPy per posisi.
+# 2*LCS/(len_a+len_b) adalah batas atas ratio SequenceMatcher yang lebih ketat dari jumlah karakter,
+# sehingga SequenceMatcher hanya dihitung untuk pasangan yang benar-benar bisa menang
+
+import threading #Import threading untuk lock SequenceMatcher yang dipakai bersama
+from collections import Counter, OrderedDict #Import Counter untuk hitung jumlah karakter per label, OrderedDict untuk LRU cache
+from difflib import SequenceMatcher #Import SequenceMatcher untuk fuzzy string matching
+
+import numpy as np #Import numpy untuk batch LCS scoring kandidat x label
+
+from config import JIS_TYPES, DIN_TYPES, MATCH_CACHE_SIZE #Import daftar label dan ukuran cache dari config.py
+
+# Kode khusus di array NumPy (karakter label di-encode mulai dari 1)
+_NO_MATCH = 0 #Padding query dan karakter query yang tidak ada di label manapun (bitmask kosong)
+_MAX_LABEL_LENGTH = 64 #Panjang label maksimal untuk bitmask uint64
+
+
+class LabelIndex:
+    # Class index untuk 1 daftar target string (label yang sudah dibersihkan)
+    # Tujuan: Cari index label dengan ratio SequenceMatcher terbaik tanpa menghitung semua label
+
+    def __init__(self, targets):
+        # Parameter: targets (list string) - target yang sudah dibersihkan, urutan = urutan prioritas tie-break
+        self.targets = list(targets)
+        self.lengths = [len(t) for t in self.targets]
+        self.counts = [Counter(t) for t in self.targets]
+
+        # Exact match: simpan index pertama untuk setiap target
+        self.exact = {}
+        for i, target in enumerate(self.targets):
+            self.exact.setdefault(target, i)
+
+        # Kelompokkan index label berdasarkan panjang string
+        self.by_length = {}
+        for i, length in enumerate(self.lengths):
+            self.by_length.setdefault(length, []).append(i)
+
+        # SequenceMatcher per label dengan seq2 = label (b2j dihitung sekali di sini)
+        # seq1 (text OCR) diganti per query dengan set_seq1
+        self._matchers = [SequenceMatcher(None, '', t) for t in self.targets]
+        self._lock = threading.Lock() #Lock karena set_seq1 mengubah state matcher
+
+        # Encode label untuk batch scoring
+        # char_codes: karakter -> kode uint8 (1..255), karakter lain di query = _NO_MATCH
+        # char_masks: kode -> bitmask posisi karakter tersebut di setiap label, shape (jumlah kode, jumlah label)
+        self.min_length = min(self.lengths) if self.targets else 0
+        self.max_length = max(self.lengths) if self.targets else 0
+        if self.max_length > _MAX_LABEL_LENGTH:
+            raise ValueError(f"Label lebih panjang dari {_MAX_LABEL_LENGTH} karakter tidak didukung batch scoring")
+        alphabet = sorted(set(''.join(self.targets)))
+        if len(alphabet) > 255:
+            raise ValueError("Jumlah karakter unik label melebihi 255")
+        self.char_codes = {c: i + 1 for i, c in enumerate(alphabet)}
+        self.char_masks = np.zeros((len(alphabet) + 1, len(self.targets)), dtype=np.uint64)
+        for i, target in enumerate(self.targets):
+            for pos, c in enumerate(target):
+                self.char_masks[self.char_codes[c], i] |= np.uint64(1 << pos)
+        self.length_array = np.array(self.lengths, dtype=np.int32)
+        self.length_masks = np.array([(1 << length) - 1 for length in self.lengths], dtype=np.uint64)
+
+    def candidates(self, query, floor):
+        # Fungsi untuk ambil index label yang ratio-nya MUNGKIN > floor (berdasarkan panjang string)
+        # Parameter: query (string), floor (float) - ratio harus lebih besar dari nilai ini
+        # Return: list index label (urut sesuai urutan asli untuk tie-break yang sama)
+        la = len(query)
+        result = []
+        for length, indices in self.by_length.items():
+            total = la + length
+            # Batas atas ratio dari panjang saja: 2*min(len)/(len_a+len_b)
+            if total == 0 or 2.0 * min(la, length) / total <= floor:
+                continue
+            result.extend(indices)
+        result.sort()
+        return result
+
+    def upper_bound(self, query_counts, query_len, i):
+        # Fungsi batas atas ratio berdasarkan jumlah karakter yang sama (seperti SequenceMatcher.quick_ratio)
+        total = query_len + self.lengths[i]
+        if total == 0:
+            return 1.0
+        target_counts = self.counts[i]
+        matches = sum(min(n, target_counts[c]) for c, n in query_counts.items() if c in target_counts)
+        return 2.0 * matches / total
+
+    def can_pass(self, query, floor):
+        # Fungsi cek cepat apakah ada label yang panjangnya memungkinkan ratio > floor
+        la = len(query)
+        if la == 0:
+            return False
+        # Label terdekat panjangnya: paling pendek/panjang, atau yang sama dengan query
+        nearest = min(max(la, self.min_length), self.max_length)
+        return 2.0 * min(la, nearest) / (la + nearest) > floor
+
+    def encode(self, queries):
+        # Fungsi encode list string query ke array uint8 (n, width) dengan padding _NO_MATCH
+        width = max((len(q) for q in queries), default=0)
+        codes = np.full((len(queries), width), _NO_MATCH, dtype=np.uint8)
+        for row, query in enumerate(queries):
+            codes[row, :len(query)] = [self.char_codes.get(c, _NO_MATCH) for c in query]
+        return codes
+
+    def lcs_matrix(self, queries):
+        # Fungsi hitung panjang LCS untuk semua pasangan query x label sekaligus (bit-parallel LCS)
+        # Tujuan: Tidak ada loop Python per posisi label; 1 iterasi per posisi karakter query
+        #         memproses seluruh matrix query x label dengan operasi bitwise NumPy
+        # Parameter: queries (list string)
+        # Return: numpy array int (n_query, n_label)
+        query_codes = self.encode(queries)
+
+        # Bit k = 1 di state berarti posisi label k belum dipakai LCS
+        # Per karakter query: u = state & mask karakter, state = (state + u) | (state - u)
+        # Padding / karakter tidak dikenal punya mask 0 sehingga state tidak berubah
+        state = np.full((len(queries), len(self.targets)), np.iinfo(np.uint64).max, dtype=np.uint64)
+        for column in query_codes.T:
+            u = state & self.char_masks[column]
+            state = (state + u) | (state - u) #Overflow uint64 di bit atas label memang dibuang (wrap-around)
+
+        used = ~state & self.length_masks #Bit 0 di dalam panjang label = posisi yang dipakai LCS
+        return np.unpackbits(used.view(np.uint8).reshape(used.shape + (8,)), axis=-1).sum(axis=-1)
+
+    def bound_matrix(self, queries):
+        # Fungsi hitung batas atas ratio untuk semua pasangan query x label sekaligus
+        # Tujuan: ratio SequenceMatcher <= 2*LCS/(len_a+len_b) karena matching block SequenceMatcher
+        #         selalu membentuk common subsequence (tidak pernah lebih panjang dari LCS)
+        # Parameter: queries (list string)
+        # Return: numpy array float (n_query, n_label)
+        lcs = self.lcs_matrix(queries)
+
+        query_lengths = np.array([len(q) for q in queries], dtype=np.int32)[:, None]
+        total = query_lengths + self.length_array[None, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bounds = np.where(total > 0, 2.0 * lcs / np.maximum(total, 1), 1.0)
+        return bounds
+
+    def ratio(self, query, i):
+        # Fungsi hitung ratio SequenceMatcher yang sebenarnya (sama dengan SequenceMatcher(None, query, target))
+        with self._lock:
+            matcher = self._matchers[i]
+            matcher.set_seq1(query)
+            return matcher.ratio()
+
+    def best(self, query, threshold, start_score=0.0):
+        # Fungsi cari label terbaik dengan aturan yang sama seperti loop lama:
+        # update jika ratio > threshold DAN ratio > best_score (label pertama menang jika seri)
+        # Parameter: query (string), threshold (float), start_score (best_score awal)
+        # Return: tuple (index, score) atau (None, start_score) jika tidak ada yang lolos
+
+        best_index = None
+        best_score = start_score
+
+        # Exact match: ratio 1.0 hanya untuk string identik, tidak mungkin dikalahkan
+        exact_index = self.exact.get(query)
+        if exact_index is not None and 1.0 > threshold and 1.0 > start_score:
+            return exact_index, 1.0
+
+        query_counts = Counter(query)
+        query_len = len(query)
+        for i in self.candidates(query, threshold):
+            floor = max(threshold, best_score)
+            if self.upper_bound(query_counts, query_len, i) <= floor:
+                continue
+            ratio = self.ratio(query, i)
+            if ratio > threshold and ratio > best_score:
+                best_score = ratio
+                best_index = i
+
+        return best_index, best_score
+
+    def best_from_bounds(self, query, bounds_row, threshold, start_score=0.0, skip=None, first=False):
+        # Fungsi sama seperti best(), tapi kandidat diambil dari 1 baris bound_matrix
+        # Parameter: bounds_row (numpy array), skip (list boolean per label, True = dilewati),
+        #            first (True = berhenti di label pertama yang lolos threshold, untuk fallback (S))
+        # Return: tuple (index, score) atau (None, start_score)
+        best_index = None
+        best_score = start_score
+        for i in np.flatnonzero(bounds_row > threshold):
+            i = int(i)
+            if skip is not None and skip[i]:
+                continue
+            floor = threshold if first else max(threshold, best_score)
+            if bounds_row[i] <= floor:
+                continue
+            ratio = 1.0 if self.targets[i] == query else self.ratio(query, i)
+            if first:
+                if ratio > threshold:
+                    return i, ratio
+            elif ratio > threshold and ratio > best_score:
+                best_score = ratio
+                best_index = i
+        return best_index, best_score
+
+    def best_batch(self, queries, threshold, start_scores=None, skip=None, first=False):
+        # Fungsi cari label terbaik untuk banyak query sekaligus (1 bound_matrix untuk semua)
+        # Parameter: queries (list string), start_scores (list float, default 0.0 semua)
+        # Return: list tuple (index, score) dengan urutan sama seperti queries
+        if start_scores is None:
+            start_scores = [0.0] * len(queries)
+        results = [(None, score) for score in start_scores]
+
+        # Query yang panjangnya tidak mungkin lolos threshold tidak ikut dihitung LCS
+        active = [k for k, query in enumerate(queries) if self.can_pass(query, threshold)]
+        if not active:
+            return results
+
+        bounds = self.bound_matrix([queries[k] for k in active])
+        for row, k in enumerate(active):
+            results[k] = self.best_from_bounds(queries[k], bounds[row], threshold, start_scores[k], skip, first)
+        return results
+
+
+class DinMatcher:
+    # Matcher untuk label DIN (pengganti loop SequenceMatcher di _find_best_din_match)
+
+    def __init__(self, din_types):
+        self.labels = list(din_types[1:]) #Skip index 0 (placeholder)
+        self.index = LabelIndex([label.replace(' ', '').upper() for label in self.labels])
+
+    def match(self, detected_clean):
+        # Parameter: detected_clean (string) - text DIN yang sudah dinormalisasi dan tanpa spasi
+        # Return: tuple (best_match, best_score) atau (None, 0.0)
+        i, score = self.index.best(detected_clean, 0.8)
+        if i is None:
+            return None, 0.0
+        return self.labels[i], score
+
+    def match_batch(self, queries):
+        # Fungsi matching banyak text DIN sekaligus (hasil sama dengan match() per text)
+        # Parameter: queries (list string) - text DIN yang sudah dinormalisasi dan tanpa spasi
+        # Return: list tuple (best_match, best_score) dengan urutan sama seperti queries
+        unique = list(dict.fromkeys(queries)) #Text yang sama dari stage berbeda cukup dihitung sekali
+        results = {}
+        for query, (i, score) in zip(unique, self.index.best_batch(unique, 0.8)):
+            results[query] = (self.labels[i], score) if i is not None else (None, 0.0)
+        return [results[query] for query in queries]
+
+
+class JisMatcher:
+    # Matcher untuk label JIS (pengganti 2 loop SequenceMatcher di _find_best_jis_match)
+    # Loop 1: match biasa (> 0.85), Loop 2: match tanpa (S) jika hasil loop 1 < 0.90
+
+    def __init__(self, jis_types):
+        self.all_types = set(jis_types)
+        self.labels = list(jis_types[1:]) #Skip index 0 (placeholder)
+        self.index = LabelIndex([label.replace(' ', '').upper() for label in self.labels])
+        self.index_without_s = LabelIndex([label.replace(' ', '').replace('(S)', '').upper() for label in self.labels])
+
+        # Precompute untuk loop 2: versi (S) dari setiap label dan apakah versi itu ada di JIS_TYPES
+        self.with_s = []
+        for label in self.labels:
+            candidate_with_s = label.replace('(S)', '') + '(S)'
+            self.with_s.append(candidate_with_s if candidate_with_s in self.all_types else None)
+        self.has_s = ['(S)' in label for label in self.labels]
+
+    def match(self, detected_clean):
+        # Parameter: detected_clean (string) - text JIS yang sudah dikoreksi struktural dan tanpa spasi
+        # Return: tuple (best_match, best_score) atau (None, 0.0)
+
+        # Loop pertama: cari exact match atau high similarity (>0.85)
+        i, best_score = self.index.best(detected_clean, 0.85)
+        best_match = self.labels[i] if i is not None else None
+
+        if best_match and best_score >= 0.90:
+            return best_match, best_score
+
+        # Loop kedua: matching tanpa (S) untuk handle (S) detection yang tidak reliable
+        detected_without_s = detected_clean.replace('(S)', '')
+        index = self.index_without_s
+
+        if '(S)' in detected_clean:
+            # Detected punya (S): label PERTAMA dengan ratio > 0.90 yang punya versi (S) langsung dipakai
+            query_counts = Counter(detected_without_s)
+            query_len = len(detected_without_s)
+            for i in index.candidates(detected_without_s, 0.90):
+                if self.with_s[i] is None:
+                    continue
+                if index.upper_bound(query_counts, query_len, i) <= 0.90:
+                    continue
+                ratio = index.ratio(detected_without_s, i)
+                if ratio > 0.90:
+                    return self.with_s[i], ratio
+        else:
+            # Detected tidak punya (S): cari label tanpa (S) dengan ratio terbaik (> 0.90 dan > best_score)
+            best_without_s = self._best_without_s(detected_without_s, best_score)
+            if best_without_s is not None:
+                return best_without_s
+
+        return best_match, best_score
+
+    def _best_without_s(self, query, start_score):
+        # Sama seperti LabelIndex.best, tapi hanya untuk label yang tidak mengandung (S)
+        index = self.index_without_s
+        best_index = None
+        best_score = start_score
+
+        exact_index = index.exact.get(query)
+        query_counts = Counter(query)
+        query_len = len(query)
+        for i in index.candidates(query, 0.90):
+            if self.has_s[i]:
+                continue
+            floor = max(0.90, best_score)
+            # Exact match lebih dulu dicek tanpa hitung SequenceMatcher
+            if i == exact_index:
+                ratio = 1.0
+            elif index.upper_bound(query_counts, query_len, i) <= floor:
+                continue
+            else:
+                ratio = index.ratio(query, i)
+            if ratio > 0.90 and ratio > best_score:
+                best_score = ratio
+                best_index = i
+
+        if best_index is None:
+            return None
+        return self.labels[best_index], best_score
+
+    def match_batch(self, queries):
+        # Fungsi matching banyak text JIS sekaligus (hasil sama dengan match() per text)
+        # Parameter: queries (list string) - text JIS yang sudah dikoreksi struktural dan tanpa spasi
+        # Return: list tuple (best_match, best_score) dengan urutan sama seperti queries
+        unique = list(dict.fromkeys(queries)) #Text yang sama dari stage berbeda cukup dihitung sekali
+        results = {}
+
+        # Loop pertama untuk semua query sekaligus (>0.85)
+        fallback_with_s = [] #Query dengan (S) yang perlu loop kedua
+        fallback_without_s = [] #Query tanpa (S) yang perlu loop kedua
+        for query, (i, score) in zip(unique, self.index.best_batch(unique, 0.85)):
+            best_match = self.labels[i] if i is not None else None
+            results[query] = (best_match, score)
+            if best_match and score >= 0.90:
+                continue
+            if '(S)' in query:
+                fallback_with_s.append(query)
+            else:
+                fallback_without_s.append(query)
+
+        # Loop kedua tanpa (S): label pertama yang punya versi (S)
+        if fallback_with_s:
+            stripped = [query.replace('(S)', '') for query in fallback_with_s]
+            skip = [candidate is None for candidate in self.with_s]
+            for query, (i, score) in zip(fallback_with_s, self.index_without_s.best_batch(stripped, 0.90, skip=skip, first=True)):
+                if i is not None:
+                    results[query] = (self.with_s[i], score)
+
+        # Loop kedua tanpa (S): label tanpa (S) dengan ratio terbaik di atas score loop pertama
+        if fallback_without_s:
+            start_scores = [results[query][1] for query in fallback_without_s]
+            for query, (i, score) in zip(fallback_without_s, self.index_without_s.best_batch(fallback_without_s, 0.90, start_scores, skip=self.has_s)):
+                if i is not None:
+                    results[query] = (self.labels[i], score)
+
+        return [results[query] for query in queries]
+
+
+class MatchCache:
+    # LRU cache thread-safe untuk hasil pipeline text OCR -> (label, score)
+    # Key: (preset, raw text) | Value: tuple (label, score) termasuk (None, 0.0) untuk text yang tidak match
+    # Tujuan: Text yang muncul berulang di frame berikutnya tidak perlu dikoreksi dan di-match ulang
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, preset, text):
+        # Return: tuple (label, score) atau None jika belum ada di cache
+        key = (preset, text)
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key) #Tandai sebagai paling baru dipakai
+            self.hits += 1
+            return result
+
+    def put(self, preset, text, result):
+        if self.max_size <= 0:
+            return
+        key = (preset, text)
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            # Buang entry paling lama tidak dipakai jika melebihi ukuran maksimal
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self):
+        # Return: dictionary hits, misses, size, max_size, hit_rate
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+# Matcher global, dibangun sekali saat module di-import
+JIS_MATCHER = JisMatcher(JIS_TYPES)
+DIN_MATCHER = DinMatcher(DIN_TYPES)
+
+# Cache hasil matching global (dipakai bersama oleh semua session DetectionLogic)
+MATCH_CACHE = MatchCache(MATCH_CACHE_SIZE)
@@ -5,38 +5,115 @@
 # ADDED: Bounding box untuk menandai area kode yang terdeteksi
 
 import cv2 #Import OpenCV untuk camera capture dan image processing
-import easyocr #Import EasyOCR untuk optical character recognition
 import re #Import regex untuk pattern matching dan text manipulation
 import os #Import os untuk file/directory operations
 import time #Import time untuk timing dan delay operations
 import threading #Import threading untuk concurrent processing (camera + OCR)
 import atexit #Import atexit untuk cleanup saat aplikasi exit
+from collections import OrderedDict #Import OrderedDict untuk index duplicate (urut berdasarkan waktu terakhir disimpan)
 import numpy as np #Import numpy untuk array operations dan image manipulation
 from datetime import datetime #Import datetime untuk timestamp handling
-from difflib import SequenceMatcher #Import SequenceMatcher untuk fuzzy string matching
-from PIL import Image #Import PIL Image untuk image processing
 
 #Import konfigurasi dari config.py
 from config import (
-    IMAGE_DIR, EXCEL_DIR, DB_FILE, PATTERNS, ALLOWLIST_JIS, ALLOWLIST_DIN, DIN_TYPES,
+    EXCEL_DIR, DB_FILE, PATTERNS, ALLOWLIST_JIS, ALLOWLIST_DIN, DIN_TYPES,
     CAMERA_WIDTH, CAMERA_HEIGHT, TARGET_WIDTH, TARGET_HEIGHT, BUFFER_SIZE,
-    MAX_CAMERAS, SCAN_INTERVAL, JIS_TYPES
+    MAX_CAMERAS, SCAN_INTERVAL, OCR_STAGED_MODE, OCR_CASCADE_MODE,
+    CASCADE_MIN_MATCH_SCORE, CASCADE_MIN_CONFIDENCE, DUPLICATE_WINDOW,
+    CAPTURE_RING_SIZE, CAPTURE_READ_TIMEOUT, PREVIEW_MAX_FPS, PREVIEW_SCAN_FPS, PREVIEW_ACK_TIMEOUT,
+    PERSIST_FLUSH_TIMEOUT
 )
 #Import utility functions dari utils.py
 from utils import (
-    fix_common_ocr_errors, convert_frame_to_binary, find_external_camera,
+    fix_common_ocr_errors, find_external_camera,
     create_directories, apply_edge_detection
 )
 #Import database functions dari database.py
 from database import (
-    setup_database, load_existing_data, insert_detection
+    ensure_database, load_existing_data
 )
+#Import shared OCR reader dari ocr_engine.py
+from ocr_engine import get_ocr_reader, detect_text_boxes, recognize_stages, get_stage_scheduler
+#Import matcher label JIS/DIN dari matcher.py
+from matcher import JIS_MATCHER, DIN_MATCHER, MATCH_CACHE
+#Import store data deteksi hari ini dari detection_store.py
+from detection_store import DetectionStore
+#Import writer thread penyimpanan deteksi dari persistence.py
+from persistence import get_detection_writer
+#Import image store (path gambar unik per hari) dari image_store.py
+from image_store import IMAGE_STORE
+#Import thread capture kamera (ring buffer frame terbaru) dari capture.py
+from capture import FrameGrabber
+#Import pengatur kecepatan frame preview dari preview.py
+from preview import PreviewScheduler
+#Import cache turunan frame (crop, resize, edge, split canvas) dari frame_views.py
+from frame_views import FrameViews, resize_frame
+
+class RecentCodeIndex:
+    # Index duplicate: code -> waktu monotonic terakhir kali code tersebut disimpan
+    # Tujuan: Cek duplicate O(1) tanpa loop + strptime ke seluruh detected_codes
+    # Entry diurutkan dari yang paling lama, sehingga entry kadaluarsa dibuang dari depan
+
+    def __init__(self, window=DUPLICATE_WINDOW):
+        self.window = window #Window duplicate dalam detik
+        self._last_seen = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _evict(self, now):
+        # Buang entry yang sudah lewat window (paling lama ada di depan)
+        while self._last_seen:
+            code, seen = next(iter(self._last_seen.items()))
+            if now - seen < self.window:
+                break
+            self._last_seen.popitem(last=False)
+
+    def is_duplicate(self, code, now=None):
+        # Return: True jika code disimpan kurang dari window detik yang lalu
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._evict(now)
+            seen = self._last_seen.get(code)
+            return seen is not None and now - seen < self.window
+
+    def mark(self, code, now=None):
+        # Catat code baru saja disimpan
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._last_seen[code] = now
+            self._last_seen.move_to_end(code)
+            self._evict(now)
+
+    def rebuild(self, records):
+        # Bangun ulang index dari list record (startup, ganti hari, setelah delete)
+        # Waktu record (wall clock) dikonversi ke waktu monotonic relatif terhadap sekarang
+        # Parameter: records (list dictionary dengan key "Code" dan "Time")
+        now_wall = datetime.now()
+        now = time.monotonic()
+        with self._lock:
+            self._last_seen.clear()
+            # Record urut berdasarkan waktu, cukup cek dari belakang sampai keluar window
+            recent = []
+            for rec in reversed(records):
+                try:
+                    age = (now_wall - datetime.strptime(rec["Time"], "%Y-%m-%d %H:%M:%S")).total_seconds()
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if age >= self.window:
+                    break
+                recent.append((rec["Code"], now - age))
+            for code, seen in reversed(recent):
+                self._last_seen[code] = seen
+                self._last_seen.move_to_end(code)
+
+    def clear(self):
+        with self._lock:
+            self._last_seen.clear()
 
 class DetectionLogic(threading.Thread):
     # Class utama untuk detection logic yang inherit dari Thread
     # Tujuan: Menjalankan camera capture dan OCR detection secara concurrent dengan UI
     
-    def __init__(self, update_signal, code_detected_signal, camera_status_signal, data_reset_signal, all_text_signal=None):
+    def __init__(self, update_signal, code_detected_signal, camera_status_signal, data_reset_signal, all_text_signal=None, previous_logic=None, overlay_signal=None, persist_error_signal=None):
         # Constructor untuk inisialisasi DetectionLogic
         # Parameter: berbagai signal untuk komunikasi dengan UI (PySide6 signals)
         # update_signal: untuk update preview frame
@@ -44,6 +121,9 @@ class DetectionLogic(threading.Thread):
         # camera_status_signal: untuk update status camera
         # data_reset_signal: untuk notify saat daily reset
         # all_text_signal: untuk debug/menampilkan semua text yang terdeteksi OCR
+        # previous_logic: DetectionLogic sesi sebelumnya (data hari ini dipakai ulang tanpa query DB)
+        # overlay_signal: untuk kirim overlay deteksi (bounding box, label, status) sebagai data vektor ke video widget
+        # persist_error_signal: untuk notify saat deteksi gagal disimpan ke database (pesan "" = sudah pulih)
         
         super().__init__() #Call parent constructor (threading.Thread)
         
@@ -52,10 +132,13 @@ class DetectionLogic(threading.Thread):
         self.code_detected_signal = code_detected_signal
         self.camera_status_signal = camera_status_signal
         self.data_reset_signal = data_reset_signal
+        self.overlay_signal = overlay_signal
+        self.persist_error_signal = persist_error_signal
         self.all_text_signal = all_text_signal
         
         self.running = False #Flag untuk kontrol thread running state
         self.cap = None #VideoCapture object untuk camera (None saat init)
+        self.frame_grabber = None #Thread capture kamera (dibuat saat camera dibuka di run())
         self.preset = "JIS" #Preset default (JIS atau DIN)
         self.last_scan_time = 0 #Timestamp terakhir kali scan dilakukan (untuk throttling)
         self.scan_interval = SCAN_INTERVAL #Interval waktu antara scan (dalam detik)
@@ -75,22 +158,37 @@ class DetectionLogic(threading.Thread):
         # Target display size untuk preview window
         self.TARGET_WIDTH = TARGET_WIDTH
         self.TARGET_HEIGHT = TARGET_HEIGHT
+        self.preview_size = (TARGET_WIDTH, TARGET_HEIGHT) #Ukuran frame preview yang dikirim ke UI (diupdate dari ukuran widget)
+        # Batas fps preview, turun ke PREVIEW_SCAN_FPS selama scan OCR berjalan (scan_lock dipegang thread scan)
+        self.preview_scheduler = PreviewScheduler(PREVIEW_MAX_FPS, PREVIEW_SCAN_FPS, PREVIEW_ACK_TIMEOUT,
+                                                  is_busy=self.scan_lock.locked)
         self.patterns = PATTERNS #Regex patterns untuk detection (dari config)
-        setup_database() #Setup database dan buat table jika belum ada
-        self.detected_codes = load_existing_data(self.current_date) #Load data deteksi yang sudah ada untuk hari ini
+        ensure_database() #Setup database dan buat table jika belum ada (sekali per proses)
         
-        # Inisialisasi EasyOCR reader
-        # ['en'] = English language, gpu=False untuk CPU processing
-        # verbose=False untuk disable logging output
-        self.reader = easyocr.Reader(['en'], gpu=True, verbose=False)
+        # Pakai ulang data hari ini dari sesi sebelumnya jika masih di tanggal yang sama
+        # Jika tidak ada sesi sebelumnya (startup) atau sudah ganti hari, load dari database
+        if previous_logic is not None and previous_logic.current_date == self.current_date:
+            self.detected_codes = previous_logic.detected_codes
+            self.recent_codes = previous_logic.recent_codes #Index duplicate ikut dipakai ulang
+        else:
+            self.detected_codes = DetectionStore(load_existing_data(self.current_date)) #Load data deteksi yang sudah ada untuk hari ini
+            self.recent_codes = RecentCodeIndex() #Index duplicate (code -> waktu terakhir disimpan)
+            self.recent_codes.rebuild(self.detected_codes)
+        
+        # Ambil EasyOCR reader dari registry ocr_engine
+        # Reader hanya di-load sekali per proses dan dipakai ulang oleh setiap sesi START/STOP
+        self.reader = get_ocr_reader()
+        self.stage_scheduler = get_stage_scheduler() #Statistik + urutan stage OCR (dipakai bersama semua sesi)
+        self.detection_writer = get_detection_writer() #Writer thread untuk simpan gambar + record (write-behind)
+        self.detection_writer.error_callback = self._on_persist_error #Status gagal/pulih penyimpanan dikirim ke sesi ini
 
         atexit.register(self.cleanup_temp_files) #Register cleanup function untuk dipanggil saat aplikasi exit
         
-        # ADDED: Variable untuk menyimpan bounding box terakhir yang terdeteksi
-        self.last_detected_bbox = None
-        self.last_detected_code = None
-        self.bbox_timestamp = 0  # ADDED: Timestamp untuk auto-clear bbox setelah beberapa detik
+        # Overlay bounding box hasil deteksi digambar oleh video widget (UI), bukan ke setiap frame preview
         self.bbox_display_duration = 3.0  # ADDED: Durasi tampilan bbox dalam detik (3 detik)
+        
+        # Statistik scan OCR terakhir (jumlah stage yang dipakai cascade, durasi, dll)
+        self.last_scan_stats = {}
     
     def cleanup_temp_files(self):
         # Fungsi untuk cleanup temporary files saat aplikasi exit
@@ -138,221 +236,178 @@ class DetectionLogic(threading.Thread):
         # Emit signal bahwa camera sudah aktif
         self.camera_status_signal.emit("Camera Running", True)
 
-        # Main loop: capture frame selama running=True
+        # Capture frame di thread sendiri (grab/retrieve ke ring buffer)
+        # Loop ini hanya mengambil frame terbaru untuk preview, frame yang terlewat saat preview lambat dibuang
+        self.frame_grabber = FrameGrabber(self.cap, CAPTURE_RING_SIZE)
+        self.frame_grabber.start()
+
+        # Main loop: ambil frame terbaru selama running=True
+        # Loop menunggu PreviewScheduler dulu (batas fps + UI selesai menampilkan frame sebelumnya),
+        # frame yang datang selama menunggu dilewati dan yang diambil selalu frame terbaru
+        last_sequence = -1 #Nomor urut frame terakhir yang sudah dikirim ke preview
         while self.running:
-            ret, frame = self.cap.read() #Read frame dari camera
+            self.preview_scheduler.wait_ready(timeout=CAPTURE_READ_TIMEOUT)
+            captured = self.frame_grabber.latest(last_sequence, timeout=CAPTURE_READ_TIMEOUT, consumer="preview")
             
-            # Jika gagal read frame, break loop
-            if not ret:
-                break
+            # Jika tidak ada frame baru: break jika kamera gagal dibaca / grabber berhenti, tunggu lagi jika hanya lambat
+            if captured is None:
+                if self.frame_grabber.failed or not self.frame_grabber.running:
+                    break
+                continue
+            last_sequence = captured.sequence
 
-            self._process_and_send_frame(frame, is_static=False) #Process dan kirim frame ke UI untuk preview
+            self._process_and_send_frame(captured.frame, is_static=False, views=captured.views) #Process dan kirim frame ke UI untuk preview
             current_time = time.time() #Check apakah sudah waktunya untuk scan OCR
             
             # Jika sudah melewati scan_interval DAN tidak ada scan yang sedang berjalan
             if current_time - self.last_scan_time >= self.scan_interval and not self.scan_lock.locked():
                 self.last_scan_time = current_time #Update last scan time
                 # Jalankan OCR scan di thread terpisah (non-blocking)
+                # Thread scan mengambil frame terbaru sendiri saat mulai, bukan frame preview yang mungkin sudah basi
                 # daemon=True agar thread otomatis terminate saat main thread exit
-                threading.Thread(target=self.scan_frame, 
-                                args=(frame.copy(),),  # Copy frame untuk avoid race condition
-                                kwargs={'is_static': False, 'original_frame': frame.copy()}, 
-                                daemon=True).start()
+                threading.Thread(target=self._scan_latest_frame, daemon=True).start()
         
-        # Cleanup: release camera saat loop selesai
+        # Cleanup: hentikan thread capture dulu, baru release camera (tidak release saat grab() masih berjalan)
+        self.frame_grabber.stop()
         if self.cap:
              self.cap.release()
         
         self.camera_status_signal.emit("Camera Off", False) #Emit signal camera off
     
-    def _draw_bounding_box(self, frame, bbox, label_text):
-        """
-        ADDED: Fungsi untuk menggambar bounding box pada frame
-        Tujuan: Visual indicator untuk area kode yang terdeteksi
-        Parameter: frame (numpy array), bbox (list of points), label_text (string)
-        Return: frame dengan bounding box tergambar
-        """
-        if bbox is None or len(bbox) == 0:
-            return frame
-        
-        frame_with_box = frame.copy()
-        
-        # Convert bbox points to integer tuples
-        # bbox dari EasyOCR format: [[x1,y1], [x2,y2], [x3,y3], [x4,y4]]
-        points = np.array(bbox, dtype=np.int32)
-        
-        # Draw polygon (kotak) dengan warna hijau tebal
-        cv2.polylines(frame_with_box, [points], isClosed=True, color=(0, 255, 0), thickness=3)
-        
-        # Calculate position untuk label text (di atas kotak)
-        x_min = int(min([p[0] for p in bbox]))
-        y_min = int(min([p[1] for p in bbox]))
-        
-        # Draw background rectangle untuk text
-        text_size = cv2.getTextSize(label_text, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)[0]
-        cv2.rectangle(frame_with_box, 
-                     (x_min, y_min - text_size[1] - 10), 
-                     (x_min + text_size[0] + 10, y_min),
-                     (0, 255, 0), -1)
-        
-        # Draw text label
-        cv2.putText(frame_with_box, label_text, 
-                   (x_min + 5, y_min - 5),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
-        
-        return frame_with_box
-    
-    def _send_bbox_update(self, frame, bbox, code):
-        """
-        ADDED: Fungsi untuk send immediate preview update dengan bbox
-        Tujuan: Tampilkan bbox langsung setelah deteksi tanpa menunggu frame berikutnya
-        Parameter: frame (numpy array), bbox (list of points), code (string)
-        """
-        try:
-            # Draw bbox pada frame
-            frame_with_box = self._draw_bounding_box(frame, bbox, code)
-            
-            # Process frame sama seperti _process_and_send_frame untuk live camera
-            h, w, _ = frame_with_box.shape
-            
-            # Crop frame menjadi square (center crop)
-            min_dim = min(h, w)
-            start_x = (w - min_dim) // 2
-            start_y = (h - min_dim) // 2
-            frame_cropped = frame_with_box[start_y:start_y + min_dim, start_x:start_x + min_dim]
-            
-            # Convert BGR ke RGB
-            frame_rgb = cv2.cvtColor(frame_cropped, cv2.COLOR_BGR2RGB)
-            img = Image.fromarray(frame_rgb)
-            
-            from config import Resampling
-            img = img.resize((self.TARGET_WIDTH, self.TARGET_HEIGHT), Resampling)
-            
-            # Emit signal untuk update preview
-            self.update_signal.emit(img)
-        except Exception as e:
-            print(f"Error sending bbox update: {e}")
-    
-    def _process_and_send_frame(self, frame, is_static):
-        # Fungsi internal untuk process frame sebelum dikirim ke UI
-        # Tujuan: Apply transformasi (crop, resize, edge detection, split mode) dan convert ke PIL Image
-        # Parameter: frame (numpy array BGR), is_static (boolean untuk distinguish camera vs file)
-    
-        from PIL import Image #Import PIL Image untuk convert ke format yang bisa ditampilkan UI
+    def _scan_latest_frame(self):
+        # Fungsi internal thread scan live camera: ambil frame terbaru dari ring buffer lalu jalankan scan_frame
+        # Umur frame (ms sejak di-capture) dicatat di last_scan_stats['frame_age_ms']
+        grabber = self.frame_grabber
+        if grabber is None:
+            return
+        captured = grabber.latest(timeout=CAPTURE_READ_TIMEOUT, consumer="ocr")
+        if captured is None:
+            return
+        frame_age_ms = round(captured.age() * 1000, 1)
+        # Tanpa copy: frame kamera tidak pernah diubah (preview, OCR, dan writer hanya membaca / membuat array baru),
+        # turunan (crop, edge, resize) dipakai bersama preview lewat captured.views
+        self.scan_frame(captured.frame, is_static=False, views=captured.views)
+        if self.last_scan_stats:
+            self.last_scan_stats['frame_age_ms'] = frame_age_ms
 
-        frame_display = frame.copy() #Copy frame untuk avoid modifying original
-        
-        # ADDED: Check apakah bbox sudah expired (lebih dari bbox_display_duration detik)
-        current_time = time.time()
-        if self.last_detected_bbox is not None and self.last_detected_code is not None:
-            # Jika bbox sudah lebih dari duration, clear bbox
-            if current_time - self.bbox_timestamp > self.bbox_display_duration:
-                self.last_detected_bbox = None
-                self.last_detected_code = None
-            else:
-                # Jika masih dalam duration, tampilkan bbox
-                frame_display = self._draw_bounding_box(frame_display, self.last_detected_bbox, self.last_detected_code)
+    def _on_persist_error(self, message):
+        # Fungsi dipanggil writer thread saat penyimpanan deteksi gagal (message) atau sudah pulih ("")
+        if self.persist_error_signal is not None:
+            self.persist_error_signal.emit(message)
 
-        # Jika bukan static file (live camera)
-        if not is_static:
-            h, w, _ = frame_display.shape #Get dimensi frame
-            
-            # Crop frame menjadi square (center crop)
-            min_dim = min(h, w)
-            start_x = (w - min_dim) // 2
-            start_y = (h - min_dim) // 2
-            frame_cropped = frame_display[start_y:start_y + min_dim, start_x:start_x + min_dim]
-
-            # UPDATED: Edge Detection mode
-            # Jika edge mode aktif, apply edge detection ke frame
-            if self.edge_mode:
-                frame_cropped = apply_edge_detection(frame_cropped)
-
-            # Jika split mode aktif (preview top=edge, bottom=original)
-            if self.split_mode:
-                TARGET_CONTENT_SIZE = self.TARGET_HEIGHT // 2 #Hitung ukuran masing-masing bagian (setengah dari target height)
-                
-                # Resize frame ke ukuran konten
-                frame_scaled_320 = cv2.resize(frame_cropped, (TARGET_CONTENT_SIZE, TARGET_CONTENT_SIZE), interpolation=cv2.INTER_AREA)
+    def get_capture_stats(self):
+        # Fungsi ambil statistik thread capture (fps kamera, frame dilewati dan umur frame preview/OCR)
+        # Return: dictionary dari FrameGrabber.get_stats() + statistik preview ('preview'), atau dictionary kosong jika camera belum berjalan
+        if self.frame_grabber is None:
+            return {}
+        stats = self.frame_grabber.get_stats()
+        stats['preview'] = self.preview_scheduler.get_stats()
+        return stats
 
-                frame_top_edge = apply_edge_detection(frame_scaled_320.copy()) #Apply edge detection untuk top frame
-                frame_bottom_original = frame_scaled_320.copy() #Bottom frame tetap original (tidak di-edge)
+    def set_preview_size(self, width, height):
+        # Fungsi set ukuran widget preview dari UI (dipanggil saat ukuran video label berubah)
+        # Tujuan: Frame preview di-resize 1 kali dengan OpenCV langsung ke ukuran tampil, UI tidak perlu scale ulang
+        # Parameter: width, height (ukuran widget dalam pixel) | Rasio TARGET_WIDTH:TARGET_HEIGHT tetap dipertahankan
+        if width <= 0 or height <= 0:
+            return
+        scale = min(width / self.TARGET_WIDTH, height / self.TARGET_HEIGHT)
+        self.preview_size = (max(1, int(self.TARGET_WIDTH * scale)), max(1, int(self.TARGET_HEIGHT * scale)))
 
-                # Buat canvas kosong untuk top dan bottom
-                canvas_top = np.zeros((TARGET_CONTENT_SIZE, self.TARGET_WIDTH, 3), dtype=np.uint8)
-                canvas_bottom = np.zeros((TARGET_CONTENT_SIZE, self.TARGET_WIDTH, 3), dtype=np.uint8)
-                x_offset = (self.TARGET_WIDTH - TARGET_CONTENT_SIZE) // 2 #Hitung offset untuk center horizontal
+    def _render_live_preview(self, views):
+        # Fungsi render frame live camera untuk preview: center crop, edge/split mode, resize ke ukuran preview
+        # Parameter: views (FrameViews frame kamera) | Return: numpy array BGR contiguous ukuran preview_size
+        # Turunan diambil dari cache frame, jadi crop/edge/resize yang juga dipakai OCR tidak dihitung ulang
+        width, height = self.preview_size
 
-                # Paste frame ke canvas dengan offset (center)
-                canvas_top[:, x_offset:x_offset + TARGET_CONTENT_SIZE] = frame_top_edge
-                canvas_bottom[:, x_offset:x_offset + TARGET_CONTENT_SIZE] = frame_bottom_original
-                frame_combined = np.vstack([canvas_top, canvas_bottom]) #Stack vertical: top di atas, bottom di bawah
-                
-                # Convert BGR ke RGB untuk PIL Image
-                frame_rgb = cv2.cvtColor(frame_combined, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame_rgb)
+        # Jika split mode aktif (preview top=edge, bottom=original)
+        if self.split_mode:
+            return views.split_canvas(width, height, self.edge_mode)
 
-            else:
-                # Mode normal (tidak split): langsung convert dan resize
-                frame_rgb = cv2.cvtColor(frame_cropped, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame_rgb)
-                
-                from config import Resampling #Import resampling method dari config
-                
-                img = img.resize((self.TARGET_WIDTH, self.TARGET_HEIGHT), Resampling) #Resize ke target size
+        # Mode normal (tidak split): crop (atau edge jika edge mode aktif) di-resize langsung ke ukuran preview
+        return np.ascontiguousarray(views.scaled(width, height, self.edge_mode))
+
+    def _render_static_preview(self, frame):
+        # Fungsi render gambar file (static scan) untuk preview: fit dalam canvas hitam + text "STATIC FILE SCAN"
+        # Parameter: frame (numpy array BGR) | Return: numpy array BGR ukuran preview_size
+        width, height = self.preview_size
+
+        # UPDATED: Edge detection untuk static file
+        # Apply edge detection jika mode aktif
+        if self.edge_mode or self.split_mode:
+            frame = apply_edge_detection(frame)
+
+        # Hitung ratio untuk fit dalam preview size (maintain aspect ratio)
+        original_height, original_width = frame.shape[:2]
+        ratio = min(width / original_width, height / original_height)
+        new_width = max(1, int(original_width * ratio))
+        new_height = max(1, int(original_height * ratio))
 
+        # Paste resized image ke center canvas hitam
+        canvas = np.zeros((height, width, 3), dtype=np.uint8)
+        x_offset = (width - new_width) // 2
+        y_offset = (height - new_height) // 2
+        canvas[y_offset:y_offset + new_height, x_offset:x_offset + new_width] = resize_frame(frame, new_width, new_height)
+
+        # Tambahkan text overlay "STATIC FILE SCAN" (kuning, center horizontal)
+        text_to_display = "STATIC FILE SCAN"
+        (text_width, text_height), _ = cv2.getTextSize(text_to_display, cv2.FONT_HERSHEY_SIMPLEX, 0.4, 1)
+        cv2.putText(canvas, text_to_display, ((width - text_width) // 2, 12 + text_height),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 255, 255), 1, cv2.LINE_AA)
+        return canvas
+
+    def _process_and_send_frame(self, frame, is_static, views=None):
+        # Fungsi internal untuk process frame sebelum dikirim ke UI
+        # Tujuan: Apply transformasi (crop, edge detection, split mode) dan resize 1 kali dengan OpenCV ke ukuran preview
+        # Parameter: frame (numpy array BGR), is_static (boolean untuk distinguish camera vs file),
+        #            views (FrameViews frame ini, dipakai bersama thread scan OCR | None = buat baru)
+        # Emit: numpy array BGR (uint8, contiguous) | UI membungkusnya langsung sebagai QImage Format_BGR888 (tanpa PIL)
+        # Bounding box deteksi tidak digambar di sini, dikirim terpisah lewat overlay_signal (_emit_overlay)
+        if is_static:
+            preview = self._render_static_preview(frame)
         else:
-            # Jika static file (bukan live camera)
-            
-            # UPDATED: Edge detection untuk static file
-            # Apply edge detection jika mode aktif
-            if self.edge_mode or self.split_mode:
-                frame_display = apply_edge_detection(frame_display)
-
-
-            # Convert BGR ke RGB
-            frame_rgb = cv2.cvtColor(frame_display, cv2.COLOR_BGR2RGB)
-            original_img = Image.fromarray(frame_rgb)
-            original_width, original_height = original_img.size #Get dimensi original image
-            # Hitung ratio untuk fit dalam target size (maintain aspect ratio)
-            ratio = min(self.TARGET_WIDTH / original_width, self.TARGET_HEIGHT / original_height)
-
-            # Hitung new size setelah scaling
-            new_width = int(original_width * ratio)
-            new_height = int(original_height * ratio)
-            
-            from config import Resampling #Import resampling method dari config
-            
-            img_resized = original_img.resize((new_width, new_height), Resampling) #Resize image dengan maintain aspect ratio
-            img = Image.new('RGB', (self.TARGET_WIDTH, self.TARGET_HEIGHT), 'black') #Buat canvas hitam dengan target size
-            
-            # Hitung offset untuk center image di canvas
-            x_offset = (self.TARGET_WIDTH - new_width) // 2
-            y_offset = (self.TARGET_HEIGHT - new_height) // 2
-            
-            img.paste(img_resized, (x_offset, y_offset)) #Paste resized image ke center canvas
+            preview = self._render_live_preview(views if views is not None else FrameViews(frame))
 
-            # Tambahkan text overlay "STATIC FILE SCAN"
-            from PIL import ImageDraw, ImageFont
-            draw = ImageDraw.Draw(img)
-            
-            # Load font untuk text
-            try:
-                font = ImageFont.truetype("arial.ttf", 10)
-            except IOError:
-                font = ImageFont.load_default()
-            
-            text_to_display = "STATIC FILE SCAN" #Text yang akan ditampilkan
+        self._emit_preview(preview) #Emit signal untuk update preview UI dengan numpy array BGR
 
-            # Hitung bounding box untuk center text horizontal
-            bbox = draw.textbbox((0, 0), text_to_display, font=font)
-            text_width = bbox[2] - bbox[0]
-            x_center = (self.TARGET_WIDTH - text_width) // 2
-            y_top = 12
+    def _emit_preview(self, preview):
+        # Fungsi kirim frame preview ke UI | Dicatat ke PreviewScheduler sebelum emit (UI memanggil preview_frame_shown())
+        self.preview_scheduler.frame_sent()
+        self.update_signal.emit(preview)
 
-            draw.text((x_center, y_top), text_to_display, fill=(255, 255, 0), font=font) #Draw text dengan warna kuning
+    def preview_frame_shown(self):
+        # Fungsi dipanggil UI setelah frame preview ditampilkan | Frame preview berikutnya boleh dikirim
+        self.preview_scheduler.frame_shown()
 
-        self.update_signal.emit(img) #Emit signal untuk update preview UI dengan PIL Image
+    def _emit_overlay(self, bbox=None, label=None, status=None, source_size=None):
+        # Fungsi kirim overlay deteksi live camera ke video widget sebagai data vektor (bbox=None = hapus overlay)
+        # Parameter: bbox (titik dalam koordinat frame scan, yaitu frame kamera yang sudah di-center crop),
+        #            label (kode), status ("OK"/"Not OK"), source_size (width, height frame scan)
+        # Titik dikonversi ke koordinat preview ter-normalisasi (0..1) sesuai layout _render_live_preview,
+        # sehingga overlay tetap pas walaupun ukuran widget berubah
+        if self.overlay_signal is None:
+            return
+        if bbox is None or len(bbox) == 0 or not source_size:
+            self.overlay_signal.emit(None)
+            return
+
+        source_w, source_h = source_size
+        points = [(x / source_w, y / source_h) for x, y in bbox]
+        if self.split_mode:
+            # Split mode: frame tampil 2 kali (top=edge, bottom=original) dengan ukuran setengah tinggi preview
+            width, height = self.preview_size
+            content_size = height // 2
+            x_offset = (width - content_size) // 2
+            polygons = [[((x_offset + x * content_size) / width, (y_offset + y * content_size) / height) for x, y in points]
+                        for y_offset in (0, content_size)]
+        else:
+            polygons = [points]
+
+        self.overlay_signal.emit({
+            'polygons': polygons,
+            'label': label,
+            'status': status,
+            'duration': self.bbox_display_duration,
+        })
     
     def _normalize_din_code(self, code):
         # Fungsi untuk normalisasi format DIN code
@@ -388,24 +443,8 @@ class DetectionLogic(threading.Thread):
         detected_normalized = self._normalize_din_code(detected_text) #Normalize detected text
         detected_clean = detected_normalized.replace(' ', '').upper() #Hapus spasi untuk comparison
         
-        # Variabel untuk menyimpan match terbaik
-        best_match = None
-        best_score = 0.0
-        
-        # Loop setiap DIN type di config (skip index 0 yang biasanya placeholder)
-        for din_type in DIN_TYPES[1:]:
-            target_clean = din_type.replace(' ', '').upper() #Hapus spasi dari target untuk comparison
-            
-            # Hitung similarity ratio menggunakan SequenceMatcher
-            # ratio() return nilai 0.0-1.0 (0=completely different, 1=identical)
-            ratio = SequenceMatcher(None, detected_clean, target_clean).ratio()
-            
-            # Update best match jika ratio > 0.8 dan lebih baik dari score sebelumnya
-            if ratio > 0.8 and ratio > best_score:
-                best_score = ratio
-                best_match = din_type
-        
-        return best_match, best_score #Return best match dan score
+        # Matching lewat index DIN_TYPES (hasil sama dengan loop SequenceMatcher, ratio > 0.8)
+        return DIN_MATCHER.match(detected_clean)
     
     def _correct_jis_structure(self, text):
         """
@@ -467,55 +506,73 @@ class DetectionLogic(threading.Thread):
         detected_corrected = self._correct_jis_structure(detected_text)
         detected_clean = detected_corrected.replace(' ', '').upper() #Hapus spasi untuk comparison
         
-        # Variabel untuk menyimpan match terbaik
-        best_match = None
-        best_score = 0.0
-        
-        # Loop pertama: cari exact match atau high similarity (>0.85)
-        for jis_type in JIS_TYPES[1:]:
-            target_clean = jis_type.replace(' ', '').upper() #Hapus spasi dari target
-            ratio = SequenceMatcher(None, detected_clean, target_clean).ratio() #Hitung similarity ratio
-            # Update best match jika ratio > 0.85
-            if ratio > 0.85 and ratio > best_score:
-                best_score = ratio
-                best_match = jis_type
-        
-        # Jika tidak ada match yang cukup baik ATAU score < 0.90
-        # Coba matching tanpa (S) untuk handle case dimana (S) detection tidak reliable
-        if not best_match or best_score < 0.90:
-            detected_without_s = detected_clean.replace('(S)', '') #Hapus (S) dari detected untuk comparison
+        # TAHAP 2: Matching lewat index JIS_TYPES
+        # Loop pertama (>0.85) dan fallback tanpa (S) (>0.90) dijalankan di JisMatcher dengan hasil yang sama
+        return JIS_MATCHER.match(detected_clean)
+    
+    def _prepare_candidate_text(self, text, preset):
+        # Fungsi untuk koreksi 1 text hasil OCR sebelum fuzzy matching sesuai preset
+        # Tujuan: Satu tempat untuk pipeline text -> query matcher yang dipakai oleh scan_frame
+        # Parameter: text (string) - raw text OCR, preset (JIS/DIN)
+        # Return: string query (tanpa spasi, uppercase) atau None jika text dilewati
+        
+        if preset == "DIN":
+            # Apply OCR error correction
+            text_fixed = fix_common_ocr_errors(text, preset)
             
-            # Loop untuk matching tanpa (S)
-            for jis_type in JIS_TYPES[1:]:
-                target_without_s = jis_type.replace(' ', '').replace('(S)', '').upper() #Hapus (S) dari target juga
-                ratio = SequenceMatcher(None, detected_without_s, target_without_s).ratio() #Hitung similarity ratio tanpa (S)
-                
-                # Jika ratio > 0.90, punya match yang bagus
-                if ratio > 0.90:
-                    # Jika detected punya (S), tambahkan (S) ke hasil match
-                    if '(S)' in detected_clean:
-                        base_code = jis_type.replace('(S)', '')
-                        candidate_with_s = base_code + '(S)'
-                        
-                        # Check apakah versi dengan (S) ada di JIS_TYPES
-                        if candidate_with_s in JIS_TYPES:
-                            best_match = candidate_with_s
-                            best_score = ratio
-                            break
-                    else:
-                        # Jika detected tidak punya (S), gunakan versi tanpa (S)
-                        if '(S)' not in jis_type and ratio > best_score:
-                            best_match = jis_type
-                            best_score = ratio
-        
-        return best_match, best_score #Return best match dan score
+            # Skip jika text terlalu pendek (< 4 char tanpa spasi)
+            if len(text_fixed.replace(' ', '')) < 4:
+                return None
+            
+            # Normalize DIN code lalu hapus spasi untuk comparison
+            return self._normalize_din_code(text_fixed).replace(' ', '').upper()
+        
+        # JIS: Skip jika text terlalu pendek (< 5 char tanpa spasi dan (S))
+        if len(text.replace(' ', '').replace('(S)', '')) < 5:
+            return None
+        
+        # Structural correction lalu hapus spasi untuk comparison
+        return self._correct_jis_structure(text).replace(' ', '').upper()
     
-    def scan_frame(self, frame, is_static=False, original_frame=None):
+    def _match_candidate_texts(self, texts, preset):
+        # Fungsi untuk koreksi + fuzzy matching semua text hasil OCR dari 1 batch stage sekaligus
+        # Tujuan: Semua kandidat di-score terhadap semua label dalam 1 panggilan matcher (vectorized)
+        # Parameter: texts (list string) - raw text OCR, preset (JIS/DIN)
+        # Return: list tuple (matched_type, score) dengan urutan sama seperti texts
+        results = {} #Dictionary raw text -> (matched_type, score)
+        misses = [] #Text yang belum ada di MATCH_CACHE
+        for text in texts:
+            if text in results:
+                continue
+            cached = MATCH_CACHE.get(preset, text)
+            if cached is not None:
+                results[text] = cached
+            else:
+                results[text] = (None, 0.0)
+                misses.append(text)
+        
+        if misses:
+            # Koreksi + matching hanya untuk text yang belum pernah dilihat
+            queries = [self._prepare_candidate_text(text, preset) for text in misses]
+            valid = [query for query in queries if query is not None]
+            
+            matcher = DIN_MATCHER if preset == "DIN" else JIS_MATCHER
+            matched = iter(matcher.match_batch(valid)) if valid else iter(())
+            
+            for text, query in zip(misses, queries):
+                result = next(matched) if query is not None else (None, 0.0)
+                results[text] = result
+                MATCH_CACHE.put(preset, text, result) #Text yang dilewati/tidak match juga di-cache
+        
+        return [results[text] for text in texts]
+    
+    def scan_frame(self, frame, is_static=False, original_frame=None, views=None):
         """
         TAHAP 1: OCR mentah dengan bounding box detection
         TAHAP 2: Structural correction + Fuzzy matching
         Tujuan: Main function untuk scan frame dan detect battery code
-        Parameter: frame (numpy array), is_static (boolean), original_frame (untuk save)
+        Parameter: frame (numpy array), is_static (boolean), original_frame (untuk save),
+                   views (FrameViews frame live camera, turunan dipakai bersama preview | None = buat baru)
         """
         # Variabel untuk menyimpan hasil match terbaik
         best_match = None
@@ -530,52 +587,28 @@ class DetectionLogic(threading.Thread):
             if not self.scan_lock.acquire(blocking=False):
                 return
             
-            # Crop frame menjadi square (same logic as _process_and_send_frame)
-            h_orig, w_orig, _ = frame.shape
-            min_dim_orig = min(h_orig, w_orig)
-            start_x_orig = (w_orig - min_dim_orig) // 2
-            start_y_orig = (h_orig - min_dim_orig) // 2
-            frame = frame[start_y_orig:start_y_orig + min_dim_orig, start_x_orig:start_x_orig + min_dim_orig]
-            
-            # UPDATED: Edge detection mode
-            # Apply edge detection jika mode aktif
-            if self.edge_mode:
-                frame = apply_edge_detection(frame)
-            
-            # Jika split mode aktif
-            if self.split_mode:
-                TARGET_CONTENT_SIZE = self.TARGET_HEIGHT // 2
-                frame_scaled_320 = cv2.resize(frame, (TARGET_CONTENT_SIZE, TARGET_CONTENT_SIZE), interpolation=cv2.INTER_AREA)
-
-                # UPDATED: Apply edge detection untuk top frame
-                frame_top_edge = apply_edge_detection(frame_scaled_320.copy())
-                frame_bottom_original = frame_scaled_320.copy()
-                
-                # Buat canvas untuk top dan bottom
-                canvas_top = np.zeros((TARGET_CONTENT_SIZE, self.TARGET_WIDTH, 3), dtype=np.uint8)
-                canvas_bottom = np.zeros((TARGET_CONTENT_SIZE, self.TARGET_WIDTH, 3), dtype=np.uint8)
-                
-                x_offset = (self.TARGET_WIDTH - TARGET_CONTENT_SIZE) // 2
-                
-                # Paste frame ke canvas
-                canvas_top[:, x_offset:x_offset + TARGET_CONTENT_SIZE] = frame_top_edge
-                canvas_bottom[:, x_offset:x_offset + TARGET_CONTENT_SIZE] = frame_bottom_original
-                
-                # Stack vertical
-                frame_combined = np.vstack([canvas_top, canvas_bottom])
-                frame_rgb = cv2.cvtColor(frame_combined, cv2.COLOR_BGR2RGB)
-                img = Image.fromarray(frame_rgb)
+            # Crop frame menjadi square + edge detection jika mode aktif (same logic as preview)
+            # Diambil dari cache turunan frame: jika preview sudah menghitungnya untuk frame ini, tidak dihitung ulang
+            # Split mode hanya tampilan preview, OCR tetap memakai crop (canvas split tidak dibuat di sini)
+            if views is None:
+                views = FrameViews(frame)
+            frame = views.base(self.edge_mode)
 
         try:
             # Get dimensi frame
             h, w = frame.shape[:2]
+            scan_size = (w, h) #Ukuran frame scan (koordinat bbox) untuk overlay preview
             
             # Resize frame jika terlalu besar (max width 640 untuk speed up OCR)
             scale_factor = 1.0  # ADDED: Track scale factor untuk bbox
             if w > 640:
                 scale_factor = 640 / w
                 new_w, new_h = 640, int(h * scale_factor)
-                frame_small = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_AREA)
+                if views is not None:
+                    # Live camera: resize dari cache (sama dengan preview jika ukuran preview 640x640)
+                    frame_small = views.scaled(new_w, new_h, self.edge_mode)
+                else:
+                    frame_small = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_AREA)
             else:
                 frame_small = frame
             
@@ -630,111 +663,154 @@ class DetectionLogic(threading.Thread):
             else:
                 allowlist_chars = ALLOWLIST_DIN  # Hanya karakter valid untuk DIN
 
-            # Loop setiap preprocessing stage dan jalankan OCR
-            for stage_name, processed_frame in processing_stages.items():
+            # Parameter OCR sesuai preset
+            # paragraph: group text dalam paragraf (untuk DIN)
+            # min_size: minimum text size untuk detection
+            # width_ths: threshold untuk text width
+            # allowlist: karakter yang diperbolehkan
+            ocr_options = {
+                'paragraph': False if self.preset == "JIS" else True,
+                'min_size': 10 if self.preset == "JIS" else 15,
+                'width_ths': 0.7 if self.preset == "JIS" else 0.5,
+                'allowlist': allowlist_chars
+            }
+            
+            current_preset = self.preset #Simpan current preset untuk konsistensi
+            # Urutan stage untuk cascade dari StageScheduler (self-tuning per preset dan label)
+            # Stage yang jarang menghasilkan match bisa dilewati, kecuali saat giliran eksplorasi
+            stage_names = self.stage_scheduler.order_stages(current_preset, self.target_label, list(processing_stages.keys()))
+            
+            # Variabel untuk menyimpan match terbaik lintas stage
+            best_match_text = None
+            best_match_score = 0.0
+            best_match_stage = None #Nama stage yang menghasilkan match terbaik
+            stage_timings = {} #Durasi OCR per stage yang dijalankan (untuk StageScheduler)
+            stages_used = 0 #Jumlah stage yang benar-benar dijalankan OCR
+            early_exit = False #True jika cascade berhenti sebelum semua stage dijalankan
+            scan_start = time.perf_counter()
+            
+            text_boxes = None
+            if OCR_STAGED_MODE:
+                # STAGED MODE: text box dideteksi sekali (Grayscale untuk JIS, Enhanced untuk DIN)
+                # lalu recognizer saja dijalankan untuk crop yang sama dari setiap stage
+                detect_image = processing_stages['Enhanced'] if current_preset == "DIN" else gray
                 try:
-                    # Jalankan EasyOCR readtext dengan detail=1 untuk dapatkan bounding box
-                    # detail=1: return [bbox, text, confidence]
-                    # paragraph: group text dalam paragraf (untuk DIN)
-                    # min_size: minimum text size untuk detection
-                    # width_ths: threshold untuk text width
-                    # allowlist: karakter yang diperbolehkan
-                    results = self.reader.readtext(
-                        processed_frame, 
-                        detail=1,  # CHANGED: dari detail=0 ke detail=1 untuk dapat bbox
-                        paragraph=False if self.preset == "JIS" else True,
-                        min_size=10 if self.preset == "JIS" else 15,
-                        width_ths=0.7 if self.preset == "JIS" else 0.5,
-                        allowlist=allowlist_chars
-                    )
-                    
-                    # ADDED: Parse results dan simpan dengan bbox
-                    for result in results:
-                        bbox, text, confidence = result
+                    text_boxes = detect_text_boxes(self.reader, detect_image,
+                                                   min_size=ocr_options['min_size'], width_ths=ocr_options['width_ths'])
+                except Exception as e:
+                    print(f"OCR error on text detection: {e}")
+                    text_boxes = ([], [])
+            
+            # CASCADE MODE: stage pertama (paling sering menang) dijalankan sendiri, berhenti jika ada kandidat yang lolos threshold
+            # Staged mode: sisa stage dijalankan sekaligus dalam 1 batch recognizer (bukan 1 panggilan per stage)
+            # Tanpa staged mode (readtext per stage) sisa stage tetap satu per satu agar early-exit masih menghemat deteksi
+            # Tanpa cascade: semua stage dijalankan sekaligus (staged mode = 1 batch recognizer)
+            if OCR_CASCADE_MODE and text_boxes is not None:
+                stage_batches = [stage_names[:1], stage_names[1:]] if len(stage_names) > 1 else [stage_names]
+            elif OCR_CASCADE_MODE:
+                stage_batches = [[name] for name in stage_names]
+            else:
+                stage_batches = [stage_names]
+            
+            for batch in stage_batches:
+                stage_results = {} #Dictionary nama_stage -> list hasil OCR [bbox, text, (confidence)]
+                batch_start = time.perf_counter()
+                
+                if text_boxes is not None:
+                    try:
+                        stage_results = recognize_stages(
+                            self.reader, text_boxes, {name: processing_stages[name] for name in batch},
+                            allowlist=ocr_options['allowlist'], paragraph=ocr_options['paragraph']
+                        )
+                    except Exception as e:
+                        print(f"OCR error on {', '.join(batch)}: {e}")
+                else:
+                    # Jalankan OCR lengkap (deteksi + recognizer) per stage
+                    for stage_name in batch:
+                        try:
+                            # Jalankan EasyOCR readtext dengan detail=1 untuk dapatkan bounding box
+                            stage_results[stage_name] = self.reader.readtext(processing_stages[stage_name], detail=1, **ocr_options)
+                        except Exception as e:
+                            # Print error tapi lanjut ke stage berikutnya
+                            print(f"OCR error on {stage_name}: {e}")
+                            continue
+                
+                stages_used += len(batch)
+                
+                # Durasi batch dibagi rata ke stage di dalamnya
+                batch_seconds = time.perf_counter() - batch_start
+                for stage_name in batch:
+                    stage_timings[stage_name] = batch_seconds / len(batch)
+                stage_confident = False #True jika ada kandidat di batch ini yang lolos threshold cascade
+                
+                # ADDED: Parse results dan simpan dengan bbox
+                batch_candidates = [] #Kandidat dari batch ini, di-match sekaligus setelah parsing
+                for stage_name in batch:
+                    for result in stage_results.get(stage_name, []):
+                        # detail=1: return [bbox, text, confidence]
+                        # Mode paragraph (DIN) hanya return [bbox, text] tanpa confidence
+                        bbox, text = result[0], result[1]
+                        confidence = result[2] if len(result) > 2 else None
                         # Scale bbox back ke original frame size
                         scaled_bbox = [[int(x / scale_factor), int(y / scale_factor)] for x, y in bbox]
                         all_results.append(text)
-                        all_results_with_bbox.append({'text': text, 'bbox': scaled_bbox, 'confidence': confidence})
-                        
-                except Exception as e:
-                    # Print error tapi lanjut ke stage berikutnya
-                    print(f"OCR error on {stage_name}: {e}")
-                    continue
+                        candidate = {'text': text, 'bbox': scaled_bbox, 'confidence': confidence, 'stage': stage_name}
+                        all_results_with_bbox.append(candidate)
+                        batch_candidates.append(candidate)
+                
+                # MATCHING LOGIC: koreksi + fuzzy matching semua kandidat batch dalam 1 panggilan
+                batch_matches = self._match_candidate_texts([c['text'] for c in batch_candidates], current_preset)
+                
+                for candidate, (matched_type, score) in zip(batch_candidates, batch_matches):
+                    # Update best match jika score lebih baik (urutan kandidat sama seperti sebelumnya)
+                    if matched_type and score > best_match_score:
+                        best_match_score = score
+                        best_match_text = matched_type
+                        best_match_bbox = candidate['bbox']  # ADDED: Simpan bbox
+                        best_match_stage = candidate['stage']
+                    
+                    # Cek threshold early-exit cascade (match score DAN confidence OCR)
+                    if matched_type and score >= CASCADE_MIN_MATCH_SCORE and \
+                            (candidate['confidence'] is None or candidate['confidence'] >= CASCADE_MIN_CONFIDENCE):
+                        stage_confident = True
+                
+                # Early-exit: stage berikutnya tidak perlu dijalankan
+                if OCR_CASCADE_MODE and stage_confident and stages_used < len(stage_names):
+                    early_exit = True
+                    break
+            
+            # Simpan statistik per-scan (berapa stage yang dipakai)
+            self.last_scan_stats = {
+                'preset': current_preset,
+                'stage_order': stage_names,
+                'stages_total': len(stage_names),
+                'stages_used': stages_used,
+                'early_exit': early_exit,
+                'duration': time.perf_counter() - scan_start,
+                'match_cache': MATCH_CACHE.get_stats()
+            }
 
             # Emit semua text yang terdeteksi untuk debugging (jika signal ada)
             if self.all_text_signal:
                 # Ambil unique results (hapus duplikat)
                 unique_results = list(set(all_results))
                 self.all_text_signal.emit(unique_results)
-            current_preset = self.preset #Simpan current preset untuk konsistensi
             
-            # MATCHING LOGIC: berbeda untuk DIN vs JIS
-            if current_preset == "DIN":
-                # DIN: Cari match terbaik dari semua OCR results
-                best_match_text = None
-                best_match_score = 0.0
-                
-                # Loop setiap text hasil OCR
-                for result_data in all_results_with_bbox:
-                    text = result_data['text']
-                    bbox = result_data['bbox']
-                    
-                    # Apply OCR error correction
-                    text_fixed = fix_common_ocr_errors(text, self.preset)
-                    
-                    # Skip jika text terlalu pendek (< 4 char tanpa spasi)
-                    if len(text_fixed.replace(' ', '')) < 4:
-                        continue
-                    
-                    # Cari best DIN match dengan fuzzy matching
-                    matched_type, score = self._find_best_din_match(text_fixed)
-                    
-                    # Update best match jika score lebih baik
-                    if matched_type and score > best_match_score:
-                        best_match_score = score
-                        best_match_text = matched_type
-                        best_match_bbox = bbox  # ADDED: Simpan bbox
-                
-                # Jika ada match dengan score > 0.8, gunakan itu
-                if best_match_text and best_match_score > 0.8:
-                    best_match = best_match_text
-                    
-            else:
-                # JIS: Cari match terbaik dari semua OCR results
-                best_match_text = None
-                best_match_score = 0.0
-                
-                # Loop setiap text hasil OCR
-                for result_data in all_results_with_bbox:
-                    text = result_data['text']
-                    bbox = result_data['bbox']
-                    
-                    # Skip jika text terlalu pendek (< 5 char tanpa spasi dan (S))
-                    if len(text.replace(' ', '').replace('(S)', '')) < 5:
-                        continue
-                    
-                    # Cari best JIS match dengan structural correction + fuzzy matching
-                    matched_type, score = self._find_best_jis_match(text)
-                    
-                    # Update best match jika score lebih baik
-                    if matched_type and score > best_match_score:
-                        best_match_score = score
-                        best_match_text = matched_type
-                        best_match_bbox = bbox  # ADDED: Simpan bbox
-                
-                # Jika ada match dengan score > 0.85, gunakan itu
-                if best_match_text and best_match_score > 0.85:
-                    best_match = best_match_text
+            # Threshold akhir: DIN > 0.8, JIS > 0.85
+            min_score = 0.8 if current_preset == "DIN" else 0.85
+            if best_match_text and best_match_score > min_score:
+                best_match = best_match_text
+            
+            # Catat statistik stage hanya untuk scan dengan match yang diterima
+            # Scan idle (tidak ada baterai di depan kamera, tiap SCAN_INTERVAL) tidak dicatat: jika ikut dihitung,
+            # win rate semua stage turun di bawah STAGE_DROP_WIN_RATE hanya karena waktu idle dan stage dilewati tanpa alasan
+            if best_match:
+                self.stage_scheduler.record(current_preset, self.target_label, stage_timings, best_match_stage)
             
             # Jika ada match yang ditemukan
             if best_match:
                 detected_code = best_match.strip() # Clean detected code
                 
-                # ADDED: Simpan bbox dan code untuk preview dengan timestamp
-                self.last_detected_bbox = best_match_bbox
-                self.last_detected_code = detected_code
-                self.bbox_timestamp = time.time()  # ADDED: Set timestamp untuk auto-clear
-                
                 # Normalize DIN code (add proper spacing)
                 if self.preset == "DIN":
                     detected_code = self._normalize_din_code(detected_code)
@@ -751,8 +827,8 @@ class DetectionLogic(threading.Thread):
                 if not is_valid_type:
                     self.code_detected_signal.emit(error_message)
                     if not is_static:
-                        self.scan_lock.release()
-                    return
+                        self._emit_overlay(None) #Hapus overlay deteksi sebelumnya
+                    return #scan_lock dilepas di blok finally
                 
                 # Tentukan status OK/Not OK berdasarkan match dengan target_label
                 if self.preset == "DIN":
@@ -764,61 +840,51 @@ class DetectionLogic(threading.Thread):
                     # JIS: exact string match
                     status = "OK" if detected_code == self.target_label else "Not OK"
                 
+                # ADDED: Tampilkan bbox + label + status di preview (digambar video widget selama bbox_display_duration)
+                if not is_static:
+                    self._emit_overlay(best_match_bbox, detected_code, status, scan_size)
+                
                 # Set target_session: gunakan target_label jika ada, fallback ke detected_code
                 target_session = self.target_label if self.target_label else detected_code
 
-                # Prevent duplicate detection (dalam 5 detik terakhir)
+                # Prevent duplicate detection (dalam DUPLICATE_WINDOW detik terakhir)
                 if not is_static:
-                    # Check apakah code ini sudah terdeteksi dalam 5 detik terakhir
-                    if any(rec["Code"] == detected_code and 
-                           (datetime.now() - datetime.strptime(rec["Time"], "%Y-%m-%d %H:%M:%S")).total_seconds() < 5
-                           for rec in self.detected_codes):
+                    # Check apakah code ini sudah disimpan dalam window terakhir (lookup O(1) di index)
+                    if self.recent_codes.is_duplicate(detected_code):
                         return
                 
-                # Generate filename untuk save image
-                img_filename = f"karton_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-                img_path = os.path.join(IMAGE_DIR, img_filename)
+                # Path gambar unik di folder per hari (milidetik + nomor urut, tidak pernah menimpa gambar lain)
+                img_path = IMAGE_STORE.new_path()
                 
-                # MODIFIED: Draw bounding box pada frame sebelum save
-                if best_match_bbox is not None:
-                    frame_with_box = self._draw_bounding_box(frame_to_save, best_match_bbox, detected_code)
-                    frame_binary = convert_frame_to_binary(frame_with_box)
-                else:
-                    frame_binary = convert_frame_to_binary(frame_to_save)
+                # WRITE-BEHIND: ID dialokasikan sekarang, gambar (dengan bounding box) dan record database
+                # disimpan oleh writer thread, sehingga hasil deteksi langsung dikirim ke UI
+                new_id = self.detection_writer.allocate_id()
                 
-                cv2.imwrite(img_path, frame_binary) #Save image ke disk
+                # Buat record dictionary untuk store
+                record = {
+                    "ID": new_id,
+                    "Time": timestamp,
+                    "Code": detected_code,
+                    "Type": current_preset,
+                    "ImagePath": img_path,
+                    "Status": status,
+                    "TargetSession": target_session
+                }
                 
-                #Insert detection ke database
-                new_id = insert_detection(timestamp, detected_code, current_preset, img_path, status, target_session)
-
-                # Jika insert berhasil (dapat ID baru)
-                if new_id:
-                    # Buat record dictionary untuk local list
-                    record = {
-                        "ID": new_id,
-                        "Time": timestamp,
-                        "Code": detected_code,
-                        "Type": current_preset,
-                        "ImagePath": img_path,
-                        "Status": status,
-                        "TargetSession": target_session
-                    }
-                    
-                    self.detected_codes.append(record) #Append ke local detected_codes list
+                # Record yang disimpan di store yang dikirim ke writer: jika gambar sama dengan file yang sudah ada,
+                # writer mengganti ImagePath record ini ke file tersebut (deduplikasi)
+                record = self.detected_codes.append(record) #Append ke store detected_codes (thread-safe)
+                self.recent_codes.mark(detected_code) #Catat waktu simpan untuk cek duplicate
+                
+                # Masukkan ke antrian penyimpanan (frame_to_save milik scan ini, tidak diubah oleh writer)
+                self.detection_writer.submit(record, frame_to_save, best_match_bbox)
 
                 self.code_detected_signal.emit(detected_code) #Emit signal code detected ke UI
                 
-                # ADDED: Force update preview dengan bbox segera setelah deteksi
-                if not is_static:
-                    # Trigger immediate frame update dengan bbox
-                    threading.Thread(target=self._send_bbox_update, 
-                                   args=(frame_to_save.copy(), best_match_bbox, detected_code),
-                                   daemon=True).start()
-                
             else:
                 # ADDED: Clear bbox jika tidak ada deteksi
-                self.last_detected_bbox = None
-                self.last_detected_code = None
+                if not is_static:
+                    self._emit_overlay(None)
                 
                 # Jika tidak ada match dan ini static file scan
                 if is_static:
@@ -850,10 +916,14 @@ class DetectionLogic(threading.Thread):
         self.running = False # Set flag running False (akan stop loop di run())
         
         # ADDED: Clear bounding box saat stop
-        self.last_detected_bbox = None
-        self.last_detected_code = None
+        self._emit_overlay(None)
         
-        # Release camera jika ada
+        self.stage_scheduler.flush() #Simpan statistik stage OCR ke database
+        self.detection_writer.flush(timeout=5.0) #Simpan deteksi yang masih di antrian writer
+        
+        # Hentikan thread capture lalu release camera jika ada
+        if self.frame_grabber:
+            self.frame_grabber.stop()
         if self.cap:
              self.cap.release()
              
@@ -887,8 +957,8 @@ class DetectionLogic(threading.Thread):
         # Compare dengan current_date yang tersimpan
         if new_date > self.current_date:
             self.current_date = new_date # Ganti hari terdeteksi
-            self.detected_codes = [] # Clear local detected_codes list
-            self.detected_codes = load_existing_data(self.current_date) # Load data untuk tanggal baru
+            self.detected_codes.reset(load_existing_data(self.current_date)) # Ganti isi store dengan data tanggal baru
+            self.recent_codes.rebuild(self.detected_codes) # Index duplicate ikut direset
             self.data_reset_signal.emit() # Emit signal daily reset ke UI
             
             return True
@@ -985,11 +1055,18 @@ class DetectionLogic(threading.Thread):
         # Return: Boolean success/failure 
         from database import delete_codes # Import delete_codes function dari database module
         
+        # Pastikan deteksi yang masih di antrian writer sudah tersimpan sebelum dihapus
+        # Jika belum tersimpan (database gagal / antrian penuh), hapus dibatalkan:
+        # record yang dihapus sekarang akan di-insert lagi oleh retry writer dan muncul kembali
+        if not self.detection_writer.flush(timeout=PERSIST_FLUSH_TIMEOUT):
+            print("Warning: Deteksi masih menunggu disimpan, hapus data dibatalkan")
+            return False
+        
         # Call database delete function
         if delete_codes(record_ids):
-            # Jika berhasil, hapus juga dari local detected_codes list
-            # List comprehension: keep hanya record yang ID-nya TIDAK di record_ids
-            self.detected_codes = [rec for rec in self.detected_codes if rec['ID'] not in record_ids]
+            # Jika berhasil, hapus juga dari store detected_codes (index session dan counter ikut di-update)
+            self.detected_codes.remove_ids(record_ids)
+            self.recent_codes.rebuild(self.detected_codes) #Code yang dihapus tidak lagi dianggap duplicate
             return True
         
         return False
\ No newline at end of file
@@ -0,0 +1,289 @@
+# Registry OCR engine yang dipakai bersama oleh semua sesi DetectionLogic
+# File ini menyimpan instance EasyOCR reader per proses agar START/STOP tidak memuat ulang model
+# Tujuan: Restart deteksi (ganti label/preset) hampir instan tanpa load detector + recognizer lagi
+
+import atexit #Import atexit untuk simpan statistik stage saat aplikasi exit
+import threading #Import threading untuk lock registry (akses dari UI thread dan scan thread)
+import cv2 #Import OpenCV untuk konversi stage image ke grayscale
+import numpy as np #Import numpy untuk canvas gabungan semua stage
+import easyocr #Import EasyOCR untuk optical character recognition
+
+#Import konfigurasi OCR engine dari config.py
+from config import (
+    OCR_LANGUAGES, OCR_USE_GPU, OCR_RECOGNIZER_BATCH_SIZE,
+    STAGE_TUNING_ENABLED, STAGE_TUNING_MIN_SCANS, STAGE_DROP_MIN_RUNS,
+    STAGE_DROP_WIN_RATE, STAGE_EXPLORE_EVERY, STAGE_STATS_FLUSH_EVERY
+)
+#Import fungsi persistence statistik stage dari database.py
+from database import load_stage_stats, save_stage_stats
+
+_reader_lock = threading.Lock() #Lock agar reader tidak di-load dua kali secara bersamaan
+_readers = {} #Cache reader per (bahasa, gpu) | Bertahan selama proses aplikasi berjalan
+
+
+def get_ocr_reader(languages=None, gpu=None):
+    # Fungsi untuk mengambil EasyOCR reader yang sudah di-load (atau load jika belum ada)
+    # Tujuan: Satu reader per proses, dibagikan ke setiap DetectionLogic baru
+    # Parameter: languages (list bahasa, default OCR_LANGUAGES), gpu (boolean, default OCR_USE_GPU)
+    # Return: instance easyocr.Reader
+
+    if languages is None:
+        languages = OCR_LANGUAGES
+    if gpu is None:
+        gpu = OCR_USE_GPU
+
+    key = (tuple(languages), bool(gpu)) #Key registry | Reader berbeda hanya jika bahasa/gpu berbeda
+
+    # Fast path: reader sudah ada, tidak perlu lock
+    reader = _readers.get(key)
+    if reader is not None:
+        return reader
+
+    with _reader_lock:
+        # Cek ulang di dalam lock (thread lain mungkin sudah selesai load)
+        reader = _readers.get(key)
+        if reader is None:
+            # Inisialisasi EasyOCR reader (load model detector CRAFT + recognizer)
+            # verbose=False untuk disable logging output
+            reader = easyocr.Reader(list(languages), gpu=gpu, verbose=False)
+            _readers[key] = reader
+
+    return reader
+
+
+def detect_text_boxes(reader, detect_image, min_size=10, width_ths=0.5):
+    # Fungsi deteksi text box (CRAFT) sekali pada 1 image
+    # Tujuan: Box hasil deteksi dipakai ulang oleh recognizer untuk setiap preprocessing stage
+    # Parameter: reader (easyocr.Reader), detect_image (grayscale), min_size/width_ths sama seperti readtext
+    # Return: tuple (horizontal_list, free_list) format EasyOCR
+    #         horizontal_list: [[x_min, x_max, y_min, y_max], ...], free_list: [[[x, y] x 4], ...]
+
+    # detect() return list per image (batch), ambil index 0 karena hanya 1 image
+    horizontal_list, free_list = reader.detect(detect_image, min_size=min_size, width_ths=width_ths)
+    return horizontal_list[0], free_list[0]
+
+
+def recognize_stages(reader, boxes, stage_images, allowlist=None, paragraph=False):
+    # Fungsi recognizer saja untuk box yang sama pada beberapa preprocessing stage sekaligus
+    # Tujuan: Semua crop dari semua stage diproses dalam 1 panggilan recognizer (1 batch)
+    # Parameter: reader (easyocr.Reader), boxes (tuple hasil detect_text_boxes),
+    #            stage_images (dict nama_stage -> grayscale image dengan ukuran sama seperti image deteksi),
+    #            allowlist/paragraph sama seperti parameter readtext
+    # Return: dict nama_stage -> list hasil [bbox, text, confidence] (atau [bbox, text] jika paragraph=True)
+    #         bbox dalam koordinat image stage
+
+    horizontal_list, free_list = boxes
+    stage_names = list(stage_images.keys())
+    stage_results = {name: [] for name in stage_names}
+
+    # Jika tidak ada text box atau stage, recognizer tidak perlu dijalankan sama sekali
+    if not stage_names or (not horizontal_list and not free_list):
+        return stage_results
+
+    h, w = stage_images[stage_names[0]].shape[:2]
+
+    # Susun semua stage secara vertikal dalam 1 canvas agar recognizer cukup dipanggil 1 kali
+    # Gap antar stage = 2x tinggi box terbesar supaya mode paragraph tidak menggabungkan box dari stage berbeda
+    box_heights = [box[3] - box[2] for box in horizontal_list]
+    box_heights += [max(p[1] for p in box) - min(p[1] for p in box) for box in free_list]
+    gap = max(8, 2 * int(max(box_heights)))
+    pitch = h + gap #Jarak vertikal antar awal stage di canvas
+
+    canvas = np.zeros((pitch * len(stage_names) - gap, w), dtype=np.uint8)
+    stacked_horizontal = []
+    stacked_free = []
+
+    for k, name in enumerate(stage_names):
+        stage_img = stage_images[name]
+        # Recognizer bekerja pada grayscale, convert jika stage masih BGR
+        if stage_img.ndim == 3:
+            stage_img = cv2.cvtColor(stage_img, cv2.COLOR_BGR2GRAY)
+
+        y0 = k * pitch
+        canvas[y0:y0 + h, :] = stage_img
+
+        # Box yang sama dipakai di setiap stage, hanya digeser sebesar offset stage
+        # Clip ke tinggi stage agar crop tidak masuk ke area gap/stage lain
+        for x_min, x_max, y_min, y_max in horizontal_list:
+            stacked_horizontal.append([x_min, x_max, max(0, y_min) + y0, min(h, y_max) + y0])
+        for box in free_list:
+            stacked_free.append([[x, min(max(0, y), h) + y0] for x, y in box])
+
+    total_boxes = len(stacked_horizontal) + len(stacked_free)
+    results = reader.recognize(
+        canvas,
+        horizontal_list=stacked_horizontal,
+        free_list=stacked_free,
+        allowlist=allowlist,
+        detail=1,
+        paragraph=paragraph,
+        batch_size=max(1, min(total_boxes, OCR_RECOGNIZER_BATCH_SIZE))
+    )
+
+    # Kembalikan setiap hasil ke stage asalnya berdasarkan posisi vertikal bbox di canvas
+    for result in results:
+        bbox = result[0]
+        center_y = sum(p[1] for p in bbox) / len(bbox)
+        k = min(int(center_y // pitch), len(stage_names) - 1)
+        y0 = k * pitch
+        local_bbox = [[x, y - y0] for x, y in bbox]
+        stage_results[stage_names[k]].append([local_bbox] + list(result[1:]))
+
+    return stage_results
+
+
+class StageScheduler:
+    # Class untuk self-tuning urutan preprocessing stage OCR
+    # Tujuan: Simpan statistik win dan latency per (preset, label, stage), lalu urutkan ulang stage
+    #         agar stage yang paling sering menang dijalankan lebih dulu dan stage yang jarang membantu dilewati
+    # Statistik di-load dari database saat pertama dipakai dan disimpan berkala (bertahan setelah restart)
+
+    def __init__(self):
+        self._lock = threading.Lock() #Lock karena record() dipanggil dari scan thread, flush() dari UI thread
+        self._stats = {} #Key (preset, label, stage) -> [runs, wins, total_ms]
+        self._scans = {} #Key (preset, label) -> jumlah scan yang sudah dicatat
+        self._tuned_scans = {} #Key (preset, label) -> jumlah scan sejak urutan di-tuning (match atau tidak) | untuk giliran eksplorasi
+        self._dirty = set() #Key stage yang berubah sejak flush terakhir
+        self._pending_scans = 0 #Jumlah scan sejak flush terakhir
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        # Load statistik dari database sekali (lazy, dipanggil di dalam lock)
+        if self._loaded:
+            return
+        for preset, label, stage, runs, wins, total_ms in load_stage_stats():
+            self._stats[(preset, label, stage)] = [runs or 0, wins or 0, total_ms or 0.0]
+        # Jumlah scan per preset+label = runs terbanyak dari stage-nya
+        for (preset, label, stage), (runs, wins, total_ms) in self._stats.items():
+            key = (preset, label)
+            self._scans[key] = max(self._scans.get(key, 0), runs)
+        self._loaded = True
+
+    def order_stages(self, preset, label, stage_names):
+        # Fungsi untuk menentukan urutan stage yang akan dijalankan
+        # Parameter: preset (JIS/DIN), label (target label), stage_names (urutan default dari processing_stages)
+        # Return: list nama stage (urutan baru, stage yang jarang menang bisa tidak disertakan)
+
+        if not STAGE_TUNING_ENABLED:
+            return list(stage_names)
+
+        with self._lock:
+            self._ensure_loaded()
+            key = (preset, label)
+
+            # Belum cukup data: pakai urutan default lengkap
+            if self._scans.get(key, 0) < STAGE_TUNING_MIN_SCANS:
+                return list(stage_names)
+
+            # Giliran eksplorasi dihitung dari SEMUA scan (bukan hanya scan dengan match yang dicatat record())
+            # Jika stage yang dibutuhkan label sudah dilewati, scan tanpa match tetap memajukan counter ini
+            # sehingga stage yang dilewati pasti dijalankan lagi dan label bisa terbaca kembali
+            tuned_scans = self._tuned_scans.get(key, 0) + 1
+            self._tuned_scans[key] = tuned_scans
+            explore = tuned_scans % STAGE_EXPLORE_EVERY == 0
+
+            ranked = []
+            dropped = []
+            for default_pos, stage in enumerate(stage_names):
+                runs, wins, total_ms = self._stats.get((preset, label, stage), (0, 0, 0.0))
+
+                # Lewati stage yang sudah cukup sering dijalankan tapi hampir tidak pernah menang
+                if runs >= STAGE_DROP_MIN_RUNS and wins / runs < STAGE_DROP_WIN_RATE:
+                    dropped.append(stage)
+                    continue
+
+                # Prioritas = estimasi peluang menang / rata-rata latency
+                # Laplace smoothing agar stage yang jarang dijalankan tidak langsung dianggap 0
+                win_rate = (wins + 1) / (runs + 2)
+                avg_ms = total_ms / runs if runs else 1.0
+                ranked.append((-(win_rate / max(avg_ms, 1.0)), default_pos, stage))
+
+            # Minimal 1 stage harus tetap dijalankan
+            if not ranked:
+                return list(stage_names)
+
+            ranked.sort()
+            order = [stage for _, _, stage in ranked]
+
+            # Giliran eksplorasi: stage yang dilewati dijalankan PALING DULU (urutan default)
+            # Jika ditaruh di belakang, early-exit cascade berhenti sebelum stage itu sempat dijalankan dan dicatat
+            if explore:
+                return dropped + order
+            return order
+
+    def record(self, preset, label, stage_timings, winning_stage):
+        # Fungsi untuk mencatat hasil 1 scan
+        # Parameter: preset, label, stage_timings (dict nama_stage -> durasi detik untuk stage yang dijalankan),
+        #            winning_stage (nama stage yang menghasilkan match terbaik, atau None)
+        # Hanya dipanggil untuk scan dengan match yang diterima, jadi win rate = porsi match yang dimenangkan stage
+        if not STAGE_TUNING_ENABLED or not stage_timings:
+            return
+
+        with self._lock:
+            self._ensure_loaded()
+            for stage, seconds in stage_timings.items():
+                key = (preset, label, stage)
+                entry = self._stats.setdefault(key, [0, 0, 0.0])
+                entry[0] += 1
+                entry[2] += seconds * 1000.0
+                if stage == winning_stage:
+                    entry[1] += 1
+                self._dirty.add(key)
+
+            scan_key = (preset, label)
+            self._scans[scan_key] = self._scans.get(scan_key, 0) + 1
+            self._pending_scans += 1
+            should_flush = self._pending_scans >= STAGE_STATS_FLUSH_EVERY
+
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        # Fungsi untuk menyimpan statistik yang berubah ke database
+        with self._lock:
+            if not self._dirty:
+                return
+            rows = [(p, l, s, *self._stats[(p, l, s)]) for (p, l, s) in self._dirty]
+            self._dirty = set()
+            self._pending_scans = 0
+
+        # Simpan di luar lock agar scan thread tidak menunggu disk
+        save_stage_stats(rows)
+
+    def get_stats(self, preset, label):
+        # Fungsi untuk mengambil snapshot statistik stage (untuk debugging/monitoring)
+        # Return: dict nama_stage -> {'runs', 'wins', 'avg_ms'}
+        with self._lock:
+            self._ensure_loaded()
+            return {
+                stage: {'runs': runs, 'wins': wins, 'avg_ms': total_ms / runs if runs else 0.0}
+                for (p, l, stage), (runs, wins, total_ms) in self._stats.items()
+                if p == preset and l == label
+            }
+
+
+_stage_scheduler = None #Instance StageScheduler per proses
+
+
+def get_stage_scheduler():
+    # Fungsi untuk mengambil StageScheduler yang dipakai bersama semua sesi DetectionLogic
+    # Return: instance StageScheduler (dibuat saat pertama kali dipanggil)
+    global _stage_scheduler
+    with _reader_lock:
+        if _stage_scheduler is None:
+            _stage_scheduler = StageScheduler()
+    return _stage_scheduler
+
+
+def flush_stage_scheduler():
+    # Fungsi simpan statistik stage yang belum tersimpan | Tujuan: Statistik tidak hilang saat aplikasi exit tanpa stop()
+    with _reader_lock:
+        scheduler = _stage_scheduler
+    if scheduler is not None:
+        try:
+            scheduler.flush()
+        except Exception as e:
+            print(f"Error saving stage stats: {e}")
+
+
+atexit.register(flush_stage_scheduler)  #Dijalankan sebelum koneksi database ditutup (atexit urutan terbalik)
@@ -0,0 +1,306 @@
+# Penyimpanan deteksi secara write-behind (gambar + record database) di thread terpisah
+# File ini berisi DetectionWriter: antrian terbatas yang dikosongkan oleh 1 writer thread
+# Tujuan: Thread OCR cukup mengalokasikan ID dan memasukkan deteksi ke antrian,
+#         cv2.imwrite dan commit database tidak lagi berada di jalur keputusan OK/Not OK
+import atexit  #Import atexit untuk flush antrian saat aplikasi exit
+import queue  #Import queue untuk antrian terbatas antara thread OCR dan writer thread
+import threading  #Import threading untuk writer thread dan lock alokasi ID
+import time  #Import time untuk commit interval
+
+from config import (
+    PERSIST_QUEUE_SIZE, PERSIST_BATCH_SIZE, PERSIST_COMMIT_INTERVAL, PERSIST_RETRY_INTERVAL, PERSIST_RETRY_MAX_INTERVAL,
+    IMAGE_DEDUP_ENABLED, IMAGE_DEDUP_PERCEPTUAL, IMAGE_DEDUP_HASH_SIZE, THUMBNAIL_AT_DETECTION
+)
+from database import get_next_detection_id, insert_detections, find_image_by_hash, has_thumbnail
+from image_store import IMAGE_STORE, content_hash, perceptual_hash
+from thumbnails import render_thumbnail
+from utils import convert_frame_to_binary, draw_bounding_box
+
+_FLUSH = object()  #Penanda di antrian: commit semua record yang tertunda
+_STOP = object()  #Penanda di antrian: commit lalu hentikan writer thread
+
+
+class DetectionWriter(threading.Thread):
+    # Writer thread untuk menyimpan deteksi (gambar + record) secara batch
+    # Record di-insert dengan ID yang sudah dialokasikan, sehingga UI bisa langsung memakai ID tersebut
+    # Batch yang gagal di-commit tidak dibuang: di-insert ulang per record (1 record rusak tidak menggagalkan yang lain),
+    # record yang tetap gagal (database terkunci, disk penuh) disimpan dan dicoba lagi dengan jeda yang makin lama
+
+    def __init__(self):
+        super().__init__(name="DetectionWriter", daemon=True)
+        self._queue = queue.Queue(maxsize=PERSIST_QUEUE_SIZE)
+        self._id_lock = threading.Lock()
+        self._next_id = None  #ID berikutnya (diambil dari database saat pertama kali dibutuhkan)
+        self.saved_count = 0  #Jumlah record yang sudah di-commit
+        self.failed_count = 0  #Jumlah record yang hilang (tidak bisa dibuat / masih gagal saat writer dihentikan)
+        self.retry_count = 0  #Jumlah record yang gagal di-commit dan menunggu dicoba lagi
+        self.error_callback = None  #Fungsi (pesan) dipanggil saat penyimpanan mulai gagal / hilang, dan ("") saat pulih
+        self._retry_delay = 0.0  #Jeda retry sekarang (0 = tidak ada record yang gagal)
+        self.deduplicated_count = 0  #Jumlah deteksi yang memakai file gambar yang sudah ada
+        self._batch_images = {}  #Hash -> path untuk file baru di batch yang belum di-commit (belum bisa dicari di database)
+        self._batch_thumbnails = set()  #(path, label) thumbnail yang sudah dibuat di batch yang belum di-commit
+
+    def allocate_id(self):
+        # Fungsi alokasi ID record baru | Return: Integer ID unik untuk detected_codes
+        with self._id_lock:
+            if self._next_id is None:
+                self._next_id = get_next_detection_id()
+            new_id = self._next_id
+            self._next_id += 1
+            return new_id
+
+    def submit(self, record, frame, bbox):
+        # Fungsi masukkan 1 deteksi ke antrian
+        # Parameter: record (dictionary/DetectionRecord dengan ID dari allocate_id), frame (numpy array milik writer),
+        #            bbox (list of points atau None)
+        # Jika antrian penuh, pemanggil menunggu sampai ada tempat (deteksi tidak pernah dibuang)
+        self._queue.put((record, frame, bbox))
+
+    def flush(self, timeout=None):
+        # Fungsi tunggu sampai semua deteksi yang sudah di-submit tersimpan dan di-commit
+        # Return: Boolean True jika selesai sebelum timeout dan tidak ada record yang masih menunggu retry
+        # Timeout juga berlaku saat memasukkan penanda flush (antrian bisa penuh selama database gagal)
+        if not self.is_alive():
+            return self._queue.empty() and not self.retry_count
+        deadline = None if timeout is None else time.monotonic() + timeout
+        done = threading.Event()
+        try:
+            self._queue.put((_FLUSH, done, None), timeout=timeout)
+        except queue.Full:
+            return False
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        return done.wait(remaining) and not self.retry_count
+
+    def stop(self, timeout=None):
+        # Fungsi flush lalu hentikan writer thread (dipanggil saat aplikasi exit)
+        if not self.is_alive():
+            return True
+        done = threading.Event()
+        self._queue.put((_STOP, done, None))
+        return done.wait(timeout)
+
+    def pending_count(self):
+        # Return: jumlah deteksi yang masih di antrian
+        return self._queue.qsize()
+
+    def run(self):
+        pending = []  #Row yang sudah siap di-insert tapi belum di-commit (termasuk row gagal yang menunggu retry)
+        deadline = None  #Batas waktu commit untuk row pertama di pending (atau waktu retry berikutnya)
+
+        while True:
+            try:
+                if self._retry_delay and len(pending) >= PERSIST_QUEUE_SIZE:
+                    # Database masih gagal dan row tertunda sudah sebanyak ukuran antrian:
+                    # berhenti mengambil dari antrian sampai retry berikutnya (submit() menunggu, data tidak dibuang)
+                    time.sleep(max(0.0, deadline - time.monotonic()))
+                    job = None
+                elif pending:
+                    job = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                else:
+                    job = self._queue.get()
+            except queue.Empty:
+                job = None  #Commit interval / waktu retry tercapai
+
+            if job is None:
+                pending, deadline = self._commit_guarded(pending)
+                continue
+
+            record, frame, bbox = job
+            if record is _FLUSH or record is _STOP:
+                try:
+                    pending, deadline = self._commit_guarded(pending)
+                    if record is _STOP and pending:
+                        # Aplikasi ditutup dan database masih gagal: record tidak bisa disimpan lagi
+                        self.failed_count += len(pending)
+                        self._report(f"{len(pending)} deteksi tidak tersimpan ke database saat aplikasi ditutup")
+                finally:
+                    frame.set()  #frame berisi Event untuk penanda flush/stop (selalu di-set agar pemanggil tidak menunggu selamanya)
+                if record is _STOP:
+                    return
+                continue
+
+            try:
+                pending.append(self._save(record, frame, bbox))
+            except Exception as e:
+                # Error tak terduga tidak boleh menghentikan writer thread (antrian akan penuh dan submit() menunggu selamanya)
+                self.failed_count += 1
+                print(f"Error saving detection: {e}")
+                self._report(f"Deteksi gagal disimpan: {e}")
+                continue
+            if deadline is None:
+                deadline = time.monotonic() + PERSIST_COMMIT_INTERVAL
+            # Saat database gagal, tunggu jadwal retry (tidak commit ulang setiap batch penuh)
+            if len(pending) >= PERSIST_BATCH_SIZE and not self._retry_delay:
+                pending, deadline = self._commit_guarded(pending)
+
+    def _save(self, record, frame, bbox):
+        # Fungsi gambar bounding box, convert ke edge/binary, dan simpan gambar ke disk (atomic lewat IMAGE_STORE)
+        # Jika isi gambar sama dengan file yang sudah ada, file tidak ditulis lagi dan record memakai path file tersebut
+        # Thumbnail export (dengan caption) dibuat dari bytes JPEG yang sama, 1 kali per (file gambar, label)
+        # Return: tuple (row detected_codes, row image_files baru atau None, path file yang dipakai ulang atau None,
+        #                row thumbnails baru atau None)
+        image_row = None
+        reused_path = None
+        thumbnail_row = None
+        try:
+            if bbox is not None:
+                frame = draw_bounding_box(frame, bbox, record['Code'])
+            image = convert_frame_to_binary(frame)
+            data = IMAGE_STORE.encode(image)
+            if data is not None:
+                file_hash = phash = None
+                if IMAGE_DEDUP_ENABLED:
+                    file_hash = content_hash(data)
+                    if IMAGE_DEDUP_PERCEPTUAL:
+                        phash = perceptual_hash(image, IMAGE_DEDUP_HASH_SIZE)
+                    reused_path = self._find_duplicate(file_hash, phash)
+
+                if reused_path is not None:
+                    # Record di store ikut diupdate, jadi UI/export langsung membuka file yang dipakai bersama
+                    record['ImagePath'] = reused_path
+                    self.deduplicated_count += 1
+                else:
+                    size = IMAGE_STORE.write_bytes(record['ImagePath'], data)
+                    if size is not None:
+                        image_row = (record['ImagePath'], IMAGE_STORE.day_of(record['ImagePath']), size, record['Time'],
+                                     file_hash, phash)
+                        self._remember(file_hash, phash, record['ImagePath'])
+
+                if THUMBNAIL_AT_DETECTION and (reused_path is not None or image_row is not None):
+                    thumbnail_row = self._make_thumbnail(record, data, reused_path is not None)
+        except Exception as e:
+            print(f"Error saving detection image: {e}")
+
+        row = (record['ID'], record['Time'], record['Code'], record['Type'],
+               record['ImagePath'], record['Status'], record['TargetSession'])
+        return row, image_row, reused_path, thumbnail_row
+
+    def _make_thumbnail(self, record, data, reused):
+        # Fungsi render thumbnail export untuk (file gambar, label) yang belum punya thumbnail
+        # Return: row thumbnails (source_path, label, width, height, png, created_at) atau None
+        key = (record['ImagePath'], record['Code'])
+        if key in self._batch_thumbnails or (reused and has_thumbnail(*key)):
+            return None  #Thumbnail sudah ada, record ini cukup mereferensikannya
+        try:
+            png, width, height = render_thumbnail(data, record['Code'])
+        except Exception as e:
+            print(f"Error rendering thumbnail: {e}")
+            return None
+        self._batch_thumbnails.add(key)
+        return key + (width, height, png, record['Time'])
+
+    def _find_duplicate(self, file_hash, phash):
+        # Fungsi cari file yang isinya sama: file baru di batch ini dulu, lalu index image_files di database
+        # Return: path file yang sudah ada, atau None
+        path = self._batch_images.get(('sha', file_hash))
+        if path is None and phash:
+            path = self._batch_images.get(('phash', phash))
+        if path is None:
+            path = find_image_by_hash(file_hash, phash)
+        return path
+
+    def _remember(self, file_hash, phash, path):
+        # Catat file baru di batch yang belum di-commit (deteksi berikutnya di batch yang sama bisa memakainya)
+        if file_hash:
+            self._batch_images[('sha', file_hash)] = path
+        if phash:
+            self._batch_images.setdefault(('phash', phash), path)
+
+    def _report(self, message):
+        # Fungsi kirim status penyimpanan ke UI lewat error_callback | message "" = penyimpanan sudah pulih
+        callback = self.error_callback
+        if callback is None:
+            return
+        try:
+            callback(message)
+        except Exception as e:
+            print(f"Error reporting persistence status: {e}")
+
+    def _commit_guarded(self, pending):
+        # Fungsi _commit yang tidak pernah melempar exception (writer thread harus tetap hidup)
+        # Return: tuple (row yang masih harus di-commit, deadline berikutnya)
+        try:
+            return self._commit(pending)
+        except Exception as e:
+            print(f"Error committing detections: {e}")
+            self._report(f"Deteksi gagal disimpan ke database: {e}")
+            self._retry_delay = min(max(self._retry_delay * 2, PERSIST_RETRY_INTERVAL), PERSIST_RETRY_MAX_INTERVAL)
+            self.retry_count = len(pending)
+            return pending, time.monotonic() + self._retry_delay
+
+    @staticmethod
+    def _insert(entries):
+        # Fungsi insert + commit entry (row, image_row, reused_path, thumbnail_row) dalam 1 transaksi | Return: Boolean
+        rows = [row for row, _, _, _ in entries]
+        image_rows = [image_row for _, image_row, _, _ in entries if image_row is not None]
+        image_refs = [reused_path for _, _, reused_path, _ in entries if reused_path is not None]
+        thumbnail_rows = [thumbnail_row for _, _, _, thumbnail_row in entries if thumbnail_row is not None]
+        return insert_detections(rows, image_rows, image_refs, thumbnail_rows)
+
+    def _commit(self, pending):
+        # Fungsi insert + commit 1 batch (record deteksi + index gambar + ref_count gambar yang dipakai ulang + thumbnail)
+        # Jika batch gagal, entry di-insert ulang satu per satu: entry yang berhasil tersimpan, yang gagal disimpan untuk retry
+        # Return: tuple (entry yang masih gagal, waktu retry berikutnya) | ([], None) jika semua tersimpan
+        if not pending:
+            return [], None
+
+        if self._insert(pending):
+            retained = []
+        elif len(pending) == 1:
+            retained = pending
+        else:
+            retained = []
+            failed_paths = set()  #File baru milik entry yang gagal (belum ada di image_files)
+            for entry in pending:
+                _, image_row, reused_path, _ = entry
+                # Entry yang memakai ulang file baru milik entry gagal harus menunggu entry tersebut (ref_count tetap benar)
+                if reused_path in failed_paths or not self._insert([entry]):
+                    retained.append(entry)
+                    if image_row is not None:
+                        failed_paths.add(image_row[0])
+        self.saved_count += len(pending) - len(retained)
+
+        # File dan thumbnail batch ini sekarang bisa dicari lewat database, kecuali milik entry yang masih gagal
+        self._batch_images.clear()
+        self._batch_thumbnails.clear()
+        for _, image_row, _, thumbnail_row in retained:
+            if image_row is not None:
+                self._remember(image_row[4], image_row[5], image_row[0])
+            if thumbnail_row is not None:
+                self._batch_thumbnails.add(thumbnail_row[:2])
+
+        self.retry_count = len(retained)
+        if retained:
+            if not self._retry_delay:
+                self._report(f"{len(retained)} deteksi gagal disimpan ke database, akan dicoba lagi otomatis")
+            self._retry_delay = min(max(self._retry_delay * 2, PERSIST_RETRY_INTERVAL), PERSIST_RETRY_MAX_INTERVAL)
+            return retained, time.monotonic() + self._retry_delay
+
+        if self._retry_delay:
+            self._retry_delay = 0.0
+            self._report("")  #Semua deteksi yang tertunda sudah tersimpan
+        return [], None
+
+
+_writer = None  #Writer global (1 per proses)
+_writer_lock = threading.Lock()
+
+
+def get_detection_writer():
+    # Fungsi ambil DetectionWriter global, start thread saat pertama kali dipanggil
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = DetectionWriter()
+            _writer.start()
+        return _writer
+
+
+def shutdown_detection_writer():
+    # Fungsi flush antrian dan hentikan writer thread | Tujuan: Tidak ada deteksi hilang saat aplikasi ditutup
+    with _writer_lock:
+        if _writer is not None:
+            _writer.stop()
+
+
+atexit.register(shutdown_detection_writer)  #Dijalankan sebelum koneksi database ditutup (atexit urutan terbalik)
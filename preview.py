@@ -0,0 +1,91 @@
+# Pengaturan kecepatan kirim frame preview ke UI
+# File ini berisi PreviewScheduler (batas fps preview + tunggu UI selesai menampilkan frame sebelumnya)
+# Tujuan: Frame preview tidak menumpuk di antrian signal Qt saat UI sibuk, dan CPU diberikan ke OCR saat scan berjalan
+#         Frame yang tidak sempat ditampilkan tidak di-antri: loop preview langsung mengambil frame terbaru dari FrameGrabber
+import threading  #Import threading untuk condition (UI memberi tahu frame sudah ditampilkan)
+import time  #Import time untuk interval antar frame (monotonic)
+
+
+class PreviewScheduler:
+    # Menentukan kapan frame preview berikutnya boleh dikirim:
+    # 1. Sudah lewat interval 1/fps sejak frame terakhir dikirim (fps lebih rendah saat is_busy() True, misal scan OCR berjalan)
+    # 2. Frame terakhir sudah ditampilkan UI (frame_shown), atau sudah lewat ack_timeout (UI tidak merespon / signal terputus)
+
+    def __init__(self, max_fps, busy_fps, ack_timeout=0.5, is_busy=None):
+        # Parameter: max_fps (fps preview normal), busy_fps (fps preview saat is_busy() True),
+        #            ack_timeout (detik maksimal menunggu UI), is_busy (fungsi tanpa parameter, return True jika sedang sibuk)
+        self.max_fps = max_fps
+        self.busy_fps = busy_fps
+        self.ack_timeout = ack_timeout
+        self.is_busy = is_busy
+        self._condition = threading.Condition()
+        self._last_sent = None  #Waktu frame terakhir dikirim (time.monotonic)
+        self._in_flight = False  #True jika frame terakhir belum ditampilkan UI
+        self._sent = 0  #Jumlah frame dikirim ke UI
+        self._shown = 0  #Jumlah frame yang sudah ditampilkan UI
+        self._ack_timeouts = 0  #Jumlah frame yang tidak pernah dikonfirmasi UI
+
+    def _interval(self):
+        # Return: jarak minimal antar frame (detik) sesuai kondisi sekarang | 0 = tanpa batas fps
+        fps = self.busy_fps if self.is_busy is not None and self.is_busy() else self.max_fps
+        return 1.0 / fps if fps and fps > 0 else 0.0
+
+    def wait_ready(self, timeout=None):
+        # Fungsi tunggu sampai frame preview berikutnya boleh dikirim
+        # Parameter: timeout (detik maksimal menunggu, None = tunggu sampai siap)
+        # Return: True jika boleh kirim frame, False jika timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if self._last_sent is None:
+                    return True
+                waits = []
+
+                # UI belum selesai menampilkan frame sebelumnya: tunggu frame_shown() (maksimal ack_timeout)
+                if self._in_flight:
+                    ack_deadline = self._last_sent + self.ack_timeout
+                    if now < ack_deadline:
+                        waits.append(ack_deadline - now)
+                    else:
+                        self._in_flight = False
+                        self._ack_timeouts += 1
+
+                # Batas fps: tunggu sampai interval sejak frame terakhir terpenuhi
+                due = self._last_sent + self._interval()
+                if now < due:
+                    waits.append(due - now)
+
+                if not waits:
+                    return True
+                wait = min(waits)  #Cek ulang setelah salah satu kondisi mungkin terpenuhi
+                if deadline is not None:
+                    if now >= deadline:
+                        return False
+                    wait = min(wait, deadline - now)
+                self._condition.wait(wait)
+
+    def frame_sent(self):
+        # Fungsi catat frame preview akan dikirim ke UI (dipanggil thread Logic SEBELUM emit, agar frame_shown() tidak mendahului)
+        with self._condition:
+            self._last_sent = time.monotonic()
+            self._in_flight = True
+            self._sent += 1
+
+    def frame_shown(self):
+        # Fungsi catat frame preview sudah ditampilkan (dipanggil UI thread setelah setPixmap)
+        with self._condition:
+            self._in_flight = False
+            self._shown += 1
+            self._condition.notify_all()
+
+    def get_stats(self):
+        # Return: dictionary statistik preview (frame dikirim, ditampilkan, timeout konfirmasi UI, fps sekarang)
+        with self._condition:
+            interval = self._interval()
+            return {
+                'sent': self._sent,
+                'shown': self._shown,
+                'ack_timeouts': self._ack_timeouts,
+                'target_fps': round(1.0 / interval, 1) if interval else None,
+            }
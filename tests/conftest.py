@@ -0,0 +1,5 @@
+# Konfigurasi pytest: modul aplikasi ada di folder root (flat), tambahkan ke sys.path agar bisa di-import dari tests/
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,165 @@
+# Test ekuivalensi matcher.py terhadap fuzzy matching lama (loop SequenceMatcher di ocr.py sebelum matcher.py)
+# Tujuan: JIS_MATCHER / DIN_MATCHER harus mengembalikan (label, score) yang SAMA PERSIS dengan loop lama,
+#         termasuk tie-break (label pertama menang) dan pass kedua tanpa "(S)"
+# Data: label dari nama file dataset_try/DINCODE + seluruh label JIS/DIN, ditambah variasi OCR (substitusi,
+#       hapus, sisip karakter, tambah/hapus "(S)") dengan seed tetap
+import os
+import random
+from functools import lru_cache
+from difflib import SequenceMatcher
+
+import pytest
+
+from config import JIS_TYPES, DIN_TYPES
+from matcher import JIS_MATCHER, DIN_MATCHER
+
+DATASET_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "dataset_try")
+OCR_CONFUSIONS = {'0': 'OD', 'O': '0D', '1': 'IL', 'I': '1L', 'L': '1I', '5': 'S', 'S': '5', '8': 'B', 'B': '8',
+                  '2': 'Z', 'Z': '2', '6': 'G', 'G': '6', 'A': '4', '4': 'A', 'N': 'M', 'M': 'N'}
+
+
+# === SALINAN BEKU LOOP LAMA (ocr.py baseline, setelah normalisasi / koreksi struktural dan hapus spasi) ===
+
+@lru_cache(maxsize=None)  #Hasil loop lama dipakai ulang oleh test match dan match_batch
+def old_din_match(detected_clean):
+    best_match = None
+    best_score = 0.0
+    for din_type in DIN_TYPES[1:]:
+        target_clean = din_type.replace(' ', '').upper()
+        ratio = SequenceMatcher(None, detected_clean, target_clean).ratio()
+        if ratio > 0.8 and ratio > best_score:
+            best_score = ratio
+            best_match = din_type
+    return best_match, best_score
+
+
+@lru_cache(maxsize=None)
+def old_jis_match(detected_clean):
+    best_match = None
+    best_score = 0.0
+    for jis_type in JIS_TYPES[1:]:
+        target_clean = jis_type.replace(' ', '').upper()
+        ratio = SequenceMatcher(None, detected_clean, target_clean).ratio()
+        if ratio > 0.85 and ratio > best_score:
+            best_score = ratio
+            best_match = jis_type
+
+    if not best_match or best_score < 0.90:
+        detected_without_s = detected_clean.replace('(S)', '')
+        for jis_type in JIS_TYPES[1:]:
+            target_without_s = jis_type.replace(' ', '').replace('(S)', '').upper()
+            ratio = SequenceMatcher(None, detected_without_s, target_without_s).ratio()
+            if ratio > 0.90:
+                if '(S)' in detected_clean:
+                    base_code = jis_type.replace('(S)', '')
+                    candidate_with_s = base_code + '(S)'
+                    if candidate_with_s in JIS_TYPES:
+                        best_match = candidate_with_s
+                        best_score = ratio
+                        break
+                else:
+                    if '(S)' not in jis_type and ratio > best_score:
+                        best_match = jis_type
+                        best_score = ratio
+
+    return best_match, best_score
+
+
+# === DATA TEST ===
+
+def _ocr_variants(text, rng, count):
+    # Variasi text seperti hasil OCR: substitusi karakter mirip, hapus, sisip, dan tambah/hapus "(S)"
+    variants = [text]
+    for _ in range(count):
+        chars = list(text)
+        for _ in range(rng.randint(1, 2)):
+            op = rng.random()
+            pos = rng.randrange(len(chars)) if chars else 0
+            if op < 0.5 and chars:
+                chars[pos] = rng.choice(OCR_CONFUSIONS.get(chars[pos], chars[pos]))
+            elif op < 0.75 and len(chars) > 1:
+                del chars[pos]
+            else:
+                chars.insert(pos, rng.choice("0123456789ABDLRS"))
+        variant = ''.join(chars)
+        variants.append(variant)
+        variants.append(variant.replace('(S)', '') if '(S)' in variant else variant + '(S)')
+    return variants
+
+
+def _dataset_din_labels():
+    # Label DIN dari nama file gambar di dataset_try/DINCODE (mis. "LN1 295A.png" -> "LN1295A")
+    folder = os.path.join(DATASET_DIR, "DINCODE")
+    if not os.path.isdir(folder):
+        return []
+    return [os.path.splitext(name)[0].replace(' ', '').upper() for name in sorted(os.listdir(folder))]
+
+
+def _din_queries():
+    rng = random.Random(5)
+    queries = []
+    for text in _dataset_din_labels() + [label.replace(' ', '').upper() for label in DIN_TYPES[1:]]:
+        queries.extend(_ocr_variants(text, rng, 20))
+    return queries
+
+
+def _jis_queries():
+    rng = random.Random(5)
+    queries = []
+    for text in [label.replace(' ', '').upper() for label in JIS_TYPES[1:]]:
+        queries.extend(_ocr_variants(text, rng, 3))
+    return queries
+
+
+DIN_QUERIES = _din_queries()
+JIS_QUERIES = _jis_queries()
+
+
+# === TEST ===
+
+@pytest.mark.parametrize("matcher, old_match, queries", [
+    (DIN_MATCHER, old_din_match, DIN_QUERIES),
+    (JIS_MATCHER, old_jis_match, JIS_QUERIES),
+], ids=["DIN", "JIS"])
+def test_match_equals_old_loops(matcher, old_match, queries):
+    mismatches = [(q, result, old_match(q)) for q, result in ((q, matcher.match(q)) for q in queries) if result != old_match(q)]
+    assert not mismatches, mismatches[:10]
+
+
+@pytest.mark.parametrize("matcher, old_match, queries", [
+    (DIN_MATCHER, old_din_match, DIN_QUERIES),
+    (JIS_MATCHER, old_jis_match, JIS_QUERIES),
+], ids=["DIN", "JIS"])
+def test_match_batch_equals_old_loops(matcher, old_match, queries):
+    # Batch per 5 text (kira-kira jumlah kandidat 1 batch stage dalam 1 scan)
+    for start in range(0, len(queries), 5):
+        chunk = queries[start:start + 5]
+        assert matcher.match_batch(chunk) == [old_match(q) for q in chunk], chunk
+
+
+def _lcs_length(a, b):
+    # DP LCS biasa (referensi untuk LabelIndex.lcs_matrix)
+    prev = [0] * (len(b) + 1)
+    for ca in a:
+        cur = [0]
+        for j, cb in enumerate(b):
+            cur.append(prev[j] + 1 if ca == cb else max(prev[j + 1], cur[j]))
+        prev = cur
+    return prev[-1]
+
+
+@pytest.mark.parametrize("matcher, queries", [
+    (DIN_MATCHER, DIN_QUERIES),
+    (JIS_MATCHER, JIS_QUERIES),
+], ids=["DIN", "JIS"])
+def test_lcs_matrix_equals_dp(matcher, queries):
+    index = matcher.index
+    chunk = queries[:40] + ["", "?!#"]
+    lcs = index.lcs_matrix(chunk)
+    for row, query in enumerate(chunk):
+        assert list(lcs[row]) == [_lcs_length(query, target) for target in index.targets], query
+
+
+def test_dataset_labels_present():
+    # Label dari dataset harus ikut diuji (nama file dataset_try/DINCODE)
+    assert _dataset_din_labels()
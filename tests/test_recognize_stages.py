@@ -0,0 +1,53 @@
+# Test recognize_stages (ocr_engine.py): semua stage disusun dalam 1 canvas dan recognizer dipanggil 1 kali
+# Tujuan: Setiap hasil recognizer harus kembali ke stage asalnya (gap antar stage + pemetaan center_y // pitch)
+#         dengan bbox dalam koordinat image stage
+import numpy as np
+
+from ocr_engine import recognize_stages
+
+H, W = 60, 120
+HORIZONTAL = [[10, 50, 5, 25], [60, 110, 30, 55]]  #[x_min, x_max, y_min, y_max]
+FREE = [[[5, 40], [45, 38], [47, 58], [7, 60]]]  #4 titik, y terbawah = tinggi stage
+STAGE_VALUES = {"Grayscale": 10, "Enhanced": 20, "Binary": 30}
+
+
+class FakeReader:
+    # Reader palsu: 1 hasil per box, text = nilai pixel canvas di tengah box (nilai isi stage asal)
+    def __init__(self):
+        self.calls = 0
+
+    def recognize(self, canvas, horizontal_list, free_list, allowlist=None, detail=1, paragraph=False, batch_size=1):
+        self.calls += 1
+        results = []
+        for x_min, x_max, y_min, y_max in horizontal_list:
+            bbox = [[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]]
+            results.append([bbox, str(canvas[(y_min + y_max) // 2, (x_min + x_max) // 2]), 0.9])
+        for box in free_list:
+            ys = [y for _, y in box]
+            xs = [x for x, _ in box]
+            results.append([box, str(canvas[(min(ys) + max(ys)) // 2, (min(xs) + max(xs)) // 2]), 0.9])
+        return results
+
+
+def _stage_images():
+    return {name: np.full((H, W), value, dtype=np.uint8) for name, value in STAGE_VALUES.items()}
+
+
+def test_results_map_back_to_stage():
+    reader = FakeReader()
+    stage_results = recognize_stages(reader, (HORIZONTAL, FREE), _stage_images())
+
+    assert reader.calls == 1
+    expected_bboxes = [[[x0, y0], [x1, y0], [x1, y1], [x0, y1]] for x0, x1, y0, y1 in HORIZONTAL] + FREE
+    for name, value in STAGE_VALUES.items():
+        results = stage_results[name]
+        assert [text for _, text, _ in results] == [str(value)] * len(expected_bboxes), name
+        assert [bbox for bbox, _, _ in results] == expected_bboxes, name
+
+
+def test_no_boxes_skips_recognizer():
+    reader = FakeReader()
+    stage_results = recognize_stages(reader, ([], []), _stage_images())
+
+    assert reader.calls == 0
+    assert stage_results == {name: [] for name in STAGE_VALUES}
@@ -0,0 +1,47 @@
+# Test StageScheduler (ocr_engine.py): giliran eksplorasi harus tetap jalan walaupun tidak ada scan yang match
+# Tujuan: Stage yang sudah dilewati oleh urutan hasil tuning harus dijalankan lagi paling lambat setiap
+#         STAGE_EXPLORE_EVERY scan, supaya label yang hanya terbaca oleh stage itu bisa pulih
+import pytest
+
+import ocr_engine
+from config import STAGE_EXPLORE_EVERY, STAGE_DROP_MIN_RUNS
+
+STAGES = ["Grayscale", "Edge"]
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    # Statistik awal dari "database": Grayscale selalu menang, Edge tidak pernah (Edge dilewati urutan tuning)
+    runs = STAGE_DROP_MIN_RUNS + 1
+    rows = [("JIS", "LABEL", "Grayscale", runs, runs, runs * 10.0),
+            ("JIS", "LABEL", "Edge", runs, 0, runs * 10.0)]
+    monkeypatch.setattr(ocr_engine, "load_stage_stats", lambda: rows)
+    monkeypatch.setattr(ocr_engine, "save_stage_stats", lambda rows: None)
+    return ocr_engine.StageScheduler()
+
+
+def test_tuned_order_drops_losing_stage(scheduler):
+    assert scheduler.order_stages("JIS", "LABEL", STAGES) == ["Grayscale"]
+
+
+def test_exploration_runs_without_matches(scheduler):
+    # Tidak ada record() (tidak ada match yang diterima): giliran eksplorasi tetap harus muncul
+    # Stage yang dilewati dijalankan paling dulu, supaya early-exit cascade tidak berhenti sebelum stage itu
+    orders = [scheduler.order_stages("JIS", "LABEL", STAGES) for _ in range(STAGE_EXPLORE_EVERY)]
+    assert orders[:-1] == [["Grayscale"]] * (STAGE_EXPLORE_EVERY - 1)
+    assert orders[-1] == ["Edge", "Grayscale"]
+
+
+def test_exploration_records_dropped_stage(scheduler):
+    # Simulasi cascade saat eksplorasi: stage pertama (stage yang dilewati) selalu dijalankan dan dicatat
+    runs_before = scheduler.get_stats("JIS", "LABEL")["Edge"]["runs"]
+    for _ in range(STAGE_EXPLORE_EVERY - 1):
+        scheduler.order_stages("JIS", "LABEL", STAGES)
+    order = scheduler.order_stages("JIS", "LABEL", STAGES)
+    executed = order[:1]  #Early-exit setelah stage pertama
+    assert executed == ["Edge"]
+
+    scheduler.record("JIS", "LABEL", {stage: 0.01 for stage in executed}, "Edge")
+    stats = scheduler.get_stats("JIS", "LABEL")["Edge"]
+    assert stats["runs"] == runs_before + 1
+    assert stats["wins"] == 1
@@ -0,0 +1,127 @@
+# Thumbnail gambar deteksi untuk export Excel (gambar + caption "Detected: <label>")
+# File ini berisi fungsi render thumbnail dan perintah backfill thumbnail untuk record lama
+# Tujuan: Thumbnail dibuat 1 kali saat deteksi disimpan (writer thread) dan disimpan sebagai BLOB di tabel thumbnails,
+#         sehingga export cukup menyisipkan bytes PNG yang sudah jadi
+# Backfill record lama (sebelum ada tabel thumbnails): python thumbnails.py
+import io  #Import io untuk baca JPEG dari bytes dan tulis PNG ke memory
+import os  #Import os untuk cek file gambar
+from datetime import datetime  #Import datetime untuk waktu pembuatan thumbnail
+
+from PIL import Image, ImageDraw, ImageFont  #Import PIL (Pillow) untuk load, draw text, dan resize gambar
+from config import Resampling, THUMBNAIL_MAX_WIDTH, THUMBNAIL_MAX_HEIGHT, THUMBNAIL_BACKFILL_BATCH
+from database import ensure_database, get_images_without_thumbnail, save_thumbnails
+
+_font = None  #Font caption thumbnail (di-load 1 kali per process, bukan per gambar)
+
+
+def _load_font():
+    # Fungsi load font untuk text caption (arial 30pt) | Return: font PIL (di-cache per process)
+    global _font
+    if _font is None:
+        try:
+            _font = ImageFont.truetype("arial.ttf", 30)
+        except IOError:
+            # Fallback ke default font jika arial.ttf tidak ada
+            _font = ImageFont.load_default()
+    return _font
+
+
+def render_thumbnail(source, label):
+    # Fungsi buat thumbnail gambar deteksi dengan text label untuk Excel
+    # Parameter: source (path file gambar atau bytes JPEG hasil encode), label (kode yang terdeteksi)
+    # Return: tuple (png_bytes, width, height)
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    # Load gambar dan konversi ke RGB
+    # Convert RGB diperlukan untuk ensure 3 channels (tanpa alpha)
+    img = Image.open(source).convert("RGB")
+
+    # Draw detected label pada gambar
+    # ImageDraw untuk menggambar text dan shape di image
+    draw = ImageDraw.Draw(img)
+
+    font = _load_font() #Font untuk text (arial 30pt)
+
+    text_display = f"Detected: {label}" #Text yang akan ditampilkan di gambar
+
+    # Hitung bounding box untuk text (untuk background rectangle)
+    # Position text di bottom-left image (x=10, y=height-50)
+    bbox = draw.textbbox((10, img.height - 50), text_display, font=font)
+
+    # Draw semi-transparent black rectangle sebagai background text
+    # Padding 5px dari text bbox
+    draw.rectangle([bbox[0]-5, bbox[1]-5, bbox[2]+5, bbox[3]+5], fill=(0, 0, 0, 100))
+
+    # Draw text berwarna kuning di atas background hitam
+    draw.text((15, img.height - 50), text_display, fill=(255, 255, 0), font=font)
+
+    # Calculate scaling untuk fit dalam Excel cell
+    # Prioritas: fit height terlebih dahulu
+    width_percent = (THUMBNAIL_MAX_HEIGHT / float(img.size[1]))
+    target_width = int(float(img.size[0]) * width_percent)
+    target_height = THUMBNAIL_MAX_HEIGHT
+
+    # Jika setelah scale height, width melebihi max column width
+    # Scale ulang berdasarkan width
+    if target_width > THUMBNAIL_MAX_WIDTH:
+        scale = THUMBNAIL_MAX_WIDTH / float(img.size[0])
+        target_width = THUMBNAIL_MAX_WIDTH
+        target_height = int(float(img.size[1]) * scale)
+
+    # Resize dan save thumbnail ke memory
+    # Resampling method dari config (biasanya LANCZOS untuk quality terbaik)
+    img_resized = img.resize((target_width, target_height), Resampling)
+    output = io.BytesIO()
+    img_resized.save(output, format='PNG')
+    return output.getvalue(), target_width, target_height
+
+
+def thumbnail_offsets(width, height):
+    # Fungsi hitung offset untuk center thumbnail di cell kolom Image | Return: tuple (x_offset, y_offset)
+    # Offset X: center horizontal dalam kolom B
+    x_offset = max(0, (THUMBNAIL_MAX_WIDTH - width) // 2 + 5)
+    # Offset Y: center vertical dalam row
+    y_offset = max(0, (THUMBNAIL_MAX_HEIGHT - height) // 2)
+    return x_offset, y_offset
+
+
+def backfill_thumbnails(progress_callback=None):
+    # Fungsi buat thumbnail untuk record lama yang belum punya thumbnail
+    # Parameter: progress_callback (fungsi (jumlah dibuat, jumlah dilewati), opsional)
+    # Return: tuple (jumlah thumbnail dibuat, jumlah gambar dilewati karena file tidak ada / gagal dibaca)
+    ensure_database()
+    created = skipped = 0
+    after = None  #Pasangan (image_path, code) terakhir yang sudah diproses (paging tanpa OFFSET)
+
+    while True:
+        pairs = get_images_without_thumbnail(after, THUMBNAIL_BACKFILL_BATCH)
+        if not pairs:
+            break
+
+        thumbnail_rows = []
+        for image_path, label in pairs:
+            if not os.path.exists(image_path):
+                skipped += 1
+                continue
+            try:
+                png, width, height = render_thumbnail(image_path, label)
+                thumbnail_rows.append((image_path, label, width, height, png, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+            except Exception as e:
+                print(f"Warning: Gagal membuat thumbnail {image_path}: {e}")
+                skipped += 1
+
+        if thumbnail_rows and not save_thumbnails(thumbnail_rows):
+            break
+        created += len(thumbnail_rows)
+        after = pairs[-1]
+        if progress_callback:
+            progress_callback(created, skipped)
+
+    return created, skipped
+
+
+if __name__ == "__main__":
+    # Perintah backfill: python thumbnails.py (dijalankan dari folder aplikasi, sama seperti main.py)
+    created, skipped = backfill_thumbnails(lambda done, missing: print(f"Thumbnail dibuat: {done}, dilewati: {missing}"))
+    print(f"Backfill selesai: {created} thumbnail dibuat, {skipped} gambar dilewati")
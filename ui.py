@@ -1,22 +1,24 @@
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
     QPushButton, QLabel, QRadioButton, QCheckBox, QGroupBox, QSpinBox,
-    QMessageBox, QFileDialog, QTreeWidget, QTreeWidgetItem, QHeaderView, QDialog,
+    QMessageBox, QFileDialog, QTreeWidget, QTreeWidgetItem, QTreeView, QHeaderView, QDialog,
     QComboBox, QDateEdit, QAbstractItemView, QCompleter, QFrame, QProgressDialog
 )  # PySide6 GUI components | UI widgets dan layouts
 from PySide6.QtCore import (
     Qt, QTimer, Signal, QThread, QDateTime, QDate, QLocale, QMetaObject
 )  # PySide6 core | Core signal/slot dan threading
 from PySide6.QtGui import (
-    QPixmap, QImage, QFont, QColor, QKeyEvent, QIcon
+    QPixmap, QImage, QFont, QKeyEvent, QIcon
 )  # PySide6 GUI utilities | Untuk image handling dan styling
 from config import (
     APP_NAME, WINDOW_WIDTH, WINDOW_HEIGHT, CONTROL_PANEL_WIDTH, RIGHT_PANEL_WIDTH,
-    JIS_TYPES, DIN_TYPES, MONTHS, MONTH_MAP
+    JIS_TYPES, DIN_TYPES, MONTHS, MONTH_MAP, PERSIST_FLUSH_TIMEOUT
 )  # Import konfigurasi dari config.py
 from datetime import datetime  # Date/time operations | Modul untuk date/time
 from ui_setting import create_setting_dialog  # Import fungsi setting dialog | Fungsi untuk membuat setting dialog
 from ui_export import create_export_dialog  # Import fungsi export dialog | Fungsi untuk membuat export dialog
+from ui_history import DetectionHistoryModel, COLUMN_IMAGE_PATH, COLUMN_ID  # Model tabel riwayat deteksi | Insert baris incremental
+from ui_video import VideoWidget  # Widget video kamera | Overlay bounding box digambar dengan QPainter
 import os  # File operations | Modul untuk file operations
 import subprocess  # Untuk membuka folder
 import platform  # Untuk deteksi OS
@@ -32,21 +34,28 @@ class LogicSignals(QThread):
     camera_status_signal = Signal(str, bool)  # Signal untuk camera status | Emit status kamera (on/off) dengan info
     data_reset_signal = Signal()  # Signal untuk reset data | Emit untuk reset display saat ganti hari
     all_text_signal = Signal(list)  # Signal untuk OCR text output | Emit list semua teks yang terdeteksi OCR
+    overlay_signal = Signal(object)  # Signal untuk overlay deteksi | Emit bounding box + label + status (data vektor) atau None
+    persist_error_signal = Signal(str)  # Signal untuk error penyimpanan | Emit pesan saat deteksi gagal disimpan, "" saat pulih
 
-    def __init__(self):
+    def __init__(self, previous_logic=None):
         #Fungsi inisialisasi QThread
         #Tujuan: Setup thread dan buat DetectionLogic instance
         #Fungsi: Membuat instance DetectionLogic dan menghubungkan semua signals
+        #Parameter: previous_logic - DetectionLogic sesi sebelumnya (data hari ini dipakai ulang)
 
         super().__init__()
         from ocr import DetectionLogic
         # Buat instance DetectionLogic dengan semua signals yang diperlukan
+        # OCR reader diambil dari registry ocr_engine, jadi tidak di-load ulang setiap sesi
         self.logic = DetectionLogic(
             self.update_signal,
             self.code_detected_signal,
             self.camera_status_signal,
             self.data_reset_signal,
-            self.all_text_signal
+            self.all_text_signal,
+            previous_logic=previous_logic,
+            overlay_signal=self.overlay_signal,
+            persist_error_signal=self.persist_error_signal
         )
         
     def run(self):
@@ -198,6 +207,8 @@ class MainWindow(QMainWindow):
         #Fungsi: Membersihkan thread lama, membuat instance baru, dan connect semua signals
         #Parameter: initial_setup (bool) - True jika setup pertama kali
         
+        previous_logic = self.logic  # Simpan sesi lama untuk pakai ulang data hari ini
+        
         # Cleanup thread lama jika ada
         if self.logic_thread:
             if self.logic:
@@ -213,6 +224,8 @@ class MainWindow(QMainWindow):
                      self.logic_thread.camera_status_signal.disconnect(self.update_camera_status)
                      self.logic_thread.data_reset_signal.disconnect(self.update_code_display)
                      self.logic_thread.all_text_signal.disconnect(self.update_all_text_display)
+                     self.logic_thread.overlay_signal.disconnect(self.update_video_overlay)
+                     self.logic_thread.persist_error_signal.disconnect(self.show_persist_error)
                  except TypeError:
                      pass  # Ignore jika signal sudah disconnected
                      
@@ -220,7 +233,7 @@ class MainWindow(QMainWindow):
             self.logic = None  # Clear reference
         
         # Buat instance baru
-        self.logic_thread = LogicSignals()  # Buat thread wrapper baru
+        self.logic_thread = LogicSignals(previous_logic)  # Buat thread wrapper baru
         self.logic = self.logic_thread.logic  # Ambil reference ke DetectionLogic instance
         
         # Set camera index yang dipilih user (atau default)
@@ -236,6 +249,8 @@ class MainWindow(QMainWindow):
         self.logic_thread.camera_status_signal.connect(self.update_camera_status)  # Update status kamera
         self.logic_thread.data_reset_signal.connect(self.update_code_display)  # Reset display data
         self.logic_thread.all_text_signal.connect(self.update_all_text_display)  # Update OCR output
+        self.logic_thread.overlay_signal.connect(self.update_video_overlay)  # Overlay bounding box di video
+        self.logic_thread.persist_error_signal.connect(self.show_persist_error)  # Peringatan gagal simpan deteksi
     
     def keyPressEvent(self, event: QKeyEvent):
         """
@@ -355,7 +370,7 @@ class MainWindow(QMainWindow):
         main_layout.addWidget(control_frame)
         
         # Panel tengah - Video display dari kamera
-        self.video_label = QLabel("CAMERA OFF")  # Label untuk tampilkan video
+        self.video_label = VideoWidget("CAMERA OFF")  # Label untuk tampilkan video + overlay deteksi
         self.video_label.setAlignment(Qt.AlignCenter)  # Center alignment
         self.video_label.setStyleSheet("background-color: black; color: white; font-size: 14pt;")
         main_layout.addWidget(self.video_label, 1)  # Stretch factor 1 untuk expand
@@ -820,10 +835,13 @@ class MainWindow(QMainWindow):
         label_barang.setFont(QFont("Arial", 11, QFont.Bold))
         layout.addWidget(label_barang)
         
-        # === Tree Widget untuk tampilkan data deteksi ===
-        self.code_tree = QTreeWidget()
-        self.code_tree.setHeaderLabels(["Waktu", "Label", "Status", "Path Gambar", "ID"])  # Set headers
-        self.code_tree.setColumnCount(5)  # 5 kolom
+        # === Tree View untuk tampilkan data deteksi (model/view) ===
+        # Model menyimpan record session aktif, deteksi baru di-insert sebagai baris baru tanpa rebuild
+        self.history_model = DetectionHistoryModel(self)
+        self.code_tree = QTreeView()
+        self.code_tree.setModel(self.history_model)  # Header diambil dari model (Waktu, Label, Status, Path Gambar, ID)
+        self.code_tree.setRootIsDecorated(False)  # Tabel datar tanpa indentasi tree
+        self.code_tree.setUniformRowHeights(True)  # Tinggi baris seragam | View cukup render baris yang terlihat
         self.code_tree.header().setDefaultAlignment(Qt.AlignCenter)  # Center alignment header
         
         # PERBAIKAN: Disable horizontal scroll dan pertipis vertical scrollbar
@@ -832,7 +850,7 @@ class MainWindow(QMainWindow):
         
         # Set stylesheet untuk pertipis scrollbar
         self.code_tree.setStyleSheet("""
-            QTreeWidget {
+            QTreeView {
                 border: 1px solid #ddd;
             }
             QScrollBar:vertical {
@@ -868,11 +886,11 @@ class MainWindow(QMainWindow):
         self.code_tree.setSelectionMode(QAbstractItemView.MultiSelection)  # Allow multiple selection
 
         # Hide kolom Path dan ID (untuk internal use saja)
-        self.code_tree.setColumnHidden(3, True)
-        self.code_tree.setColumnHidden(4, True)
+        self.code_tree.setColumnHidden(COLUMN_IMAGE_PATH, True)
+        self.code_tree.setColumnHidden(COLUMN_ID, True)
         
         # Connect double click ke view image
-        self.code_tree.itemDoubleClicked.connect(self.view_selected_image)
+        self.code_tree.doubleClicked.connect(self.view_selected_image)
 
         layout.addWidget(self.code_tree)
         
@@ -942,13 +960,19 @@ class MainWindow(QMainWindow):
             # Import fungsi load_existing_data dari database
             from database import load_existing_data
             
-            # PERBAIKAN: Hanya hapus items, JANGAN clear() agar header tidak hilang
-            # Hapus semua top level items (data) tanpa menghapus header
-            while self.code_tree.topLevelItemCount() > 0:
-                self.code_tree.takeTopLevelItem(0)
+            # Pastikan deteksi yang masih di antrian writer sudah tersimpan sebelum reload
+            # (tanpa flush, deteksi tersebut hilang dari tabel, counter, dan index duplikat)
+            if not self.logic.detection_writer.flush(timeout=PERSIST_FLUSH_TIMEOUT):
+                QMessageBox.warning(self, "Warning",
+                    "Deteksi terbaru masih menunggu disimpan ke database.\nRefresh dibatalkan, silakan coba lagi.")
+                return
+            
+            # Kosongkan baris tabel (header tetap dari model)
+            self.history_model.clear()
             
             # Reload data dari database untuk tanggal hari ini
-            self.logic.detected_codes = load_existing_data(self.logic.current_date)
+            self.logic.detected_codes.reset(load_existing_data(self.logic.current_date))
+            self.logic.recent_codes.rebuild(self.logic.detected_codes)
             
             # Delay 100ms sebelum menampilkan data baru (efek blink)
             QTimer.singleShot(100, lambda: self.update_code_display())
@@ -1060,21 +1084,53 @@ class MainWindow(QMainWindow):
         self.camera_combo.setEnabled(not is_running)
         
         if not is_running:
+            self.video_label.clear_overlay()
             self.video_label.setText("CAMERA STOP")
 
-    def update_video_frame(self, pil_image):
+    def update_video_frame(self, frame):
         #Update frame video dari kamera.
-        if not self.video_label.size().isValid():
+        #frame: numpy array BGR (uint8) yang sudah di-resize oleh Logic ke ukuran video label
+        try:
+            label_size = self.video_label.size()
+            if not label_size.isValid():
+                return
+
+            # Beritahu Logic ukuran label terbaru, frame berikutnya di-resize langsung ke ukuran ini (tanpa scale di UI thread)
+            if self.logic:
+                self.logic.set_preview_size(label_size.width(), label_size.height())
+
+            # QImage langsung di atas buffer numpy (zero-copy) | Format_BGR888 sehingga tidak perlu convert BGR ke RGB
+            # Buffer frame tetap hidup selama QPixmap.fromImage (copy ke pixmap) karena frame masih direferensikan di sini
+            height, width = frame.shape[:2]
+            qimage = QImage(frame.data, width, height, frame.strides[0], QImage.Format_BGR888)
+
+            self.video_label.setPixmap(QPixmap.fromImage(qimage))
+            self.video_label.setText("")
+        finally:
+            # Beritahu Logic frame sudah diproses (juga saat frame dilewati karena ukuran label belum valid),
+            # agar frame preview berikutnya tidak menunggu ack_timeout
+            if self.logic:
+                self.logic.preview_frame_shown()
+
+    def show_persist_error(self, message):
+        #Tampilkan peringatan saat deteksi gagal disimpan ke database (dikirim 1 kali saat mulai gagal, bukan setiap retry)
+        #message "" berarti penyimpanan sudah pulih (deteksi yang tertunda sudah tersimpan)
+        if not message:
+            print("Penyimpanan deteksi pulih, semua deteksi tertunda sudah tersimpan")
             return
-            
-        qimage = QImage(pil_image.tobytes(), pil_image.width, pil_image.height,
-                        pil_image.width * 3, QImage.Format_RGB888)
-        
-        pixmap = QPixmap.fromImage(qimage)
-        scaled_pixmap = pixmap.scaled(self.video_label.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        
-        self.video_label.setPixmap(scaled_pixmap)
-        self.video_label.setText("")
+        if getattr(self, '_persist_warning_open', False):
+            print(f"Penyimpanan gagal: {message}")  #Peringatan sebelumnya masih terbuka, jangan tumpuk dialog
+            return
+        self._persist_warning_open = True
+        try:
+            QMessageBox.warning(self, "Penyimpanan Gagal",
+                                f"{message}\n\nPeriksa ruang disk dan pastikan database tidak sedang dibuka aplikasi lain.")
+        finally:
+            self._persist_warning_open = False
+
+    def update_video_overlay(self, overlay):
+        #Update overlay deteksi (bounding box, label, status) di video widget | None = hapus overlay
+        self.video_label.set_overlay(overlay)
 
     def handle_code_detection(self, detected_code):
         #Menangani sinyal kode terdeteksi dari Logic.
@@ -1096,8 +1152,6 @@ class MainWindow(QMainWindow):
         if not self.logic:
             return
         
-        self.code_tree.clear()
-        
         selected_session = self.jis_type_combo.currentText()
         show_nothing = (selected_session == "Select Label..." or not selected_session.strip())
         
@@ -1105,48 +1159,27 @@ class MainWindow(QMainWindow):
             self.selected_type_label.setText("Pilih Label Terlebih Dahulu")
             self.selected_type_label.setStyleSheet("color: #FF6600; font-weight: normal; border: none;")
             # NEW: Reset statistics
+            self.history_model.clear()
             self.update_statistics_display(". . .", 0, 0, 0)
             return
         
-        displayed_count = 0
-        ok_count = 0
-        not_ok_count = 0
+        # Sinkron tabel dengan store: hanya record baru yang di-insert (reset jika session/data berubah)
+        self.history_model.show_session(self.logic.detected_codes, selected_session)
         
-        for i, record in enumerate(reversed(self.logic.detected_codes)):
-            target_session = record.get('TargetSession', record['Code'])
-            
-            if target_session != selected_session:
-                continue
-            
-            displayed_count += 1
-            
-            time_str = record['Time'][11:19]
-            code_str = f"{record['Code']} ({record['Type']})"
-            status_str = record.get('Status', 'OK')
-            image_path = record.get('ImagePath', '')
-            record_id = record.get('ID', '')
-            
-            item = QTreeWidgetItem([time_str, code_str, status_str, image_path, str(record_id)])
-            self.code_tree.addTopLevelItem(item)
-            
-            if status_str == "OK":
-                ok_count += 1
-            elif status_str == "Not OK":
-                not_ok_count += 1
-                for col in range(item.columnCount()):
-                    item.setBackground(col, QColor(255, 0, 0))
-                    item.setForeground(col, QColor(255, 255, 255))
+        # Counter OK/Not OK dari store (tanpa loop semua record)
+        displayed_count, ok_count, not_ok_count = self.logic.detected_codes.session_stats(selected_session)
         
         # MODIFIED: Update statistics boxes
         self.update_statistics_display(selected_session, displayed_count, ok_count, not_ok_count)
 
-    def view_selected_image(self, item, column):
+    def view_selected_image(self, index):
         #Handler untuk membuka gambar double-click.
         import sys
         import subprocess
         
         try:
-            image_path = item.text(3)
+            record = self.history_model.record_at(index.row())
+            image_path = record.get('ImagePath', '') if record else ''
             
             if not image_path or image_path == 'N/A' or not os.path.exists(image_path):
                 QMessageBox.warning(self, "Gambar Tidak Ditemukan",
@@ -1205,7 +1238,7 @@ class MainWindow(QMainWindow):
 
     def delete_selected_codes(self):
         #Handler untuk tombol CLEAR.
-        selected_items = self.code_tree.selectedItems()
+        selected_items = self.code_tree.selectionModel().selectedRows()
         if not selected_items:
             QMessageBox.warning(self, "Warning", "Harap pilih data terlebih dahulu!")
             return
@@ -1219,22 +1252,26 @@ class MainWindow(QMainWindow):
         if reply == QMessageBox.Yes and self.logic:
             # FIXED: Kumpulkan semua ID yang akan dihapus
             record_ids = []
-            for item in selected_items:
+            for index in selected_items:
+                record = self.history_model.record_at(index.row())
                 try:
-                    record_id = int(item.text(4))  # Kolom ke-4 adalah ID
+                    record_id = int(record['ID'])  # ID record dari model
                     record_ids.append(record_id)
-                except (ValueError, IndexError):
-                    print(f"Warning: Invalid ID untuk item: {item.text(1)}")
+                except (ValueError, TypeError, KeyError):
+                    print(f"Warning: Invalid ID untuk item: {record['Code'] if record else index.row()}")
                     continue
             
             # FIXED: Panggil delete_codes dengan list IDs, bukan satu-satu
             if record_ids:
                 success = self.logic.delete_codes(record_ids)
                 if success:
+                    self.code_tree.clearSelection()
+                    self.history_model.remove_ids(record_ids)  # Hapus baris dari tabel tanpa rebuild
                     QMessageBox.information(self, "Sukses", f"{len(record_ids)} data berhasil dihapus!")
-                    self.update_code_display()  # Refresh tampilan
+                    self.update_code_display()  # Refresh statistik
                 else:
-                    QMessageBox.critical(self, "Error", "Gagal menghapus data dari database!")
+                    QMessageBox.critical(self, "Error", "Gagal menghapus data dari database!\n"
+                                         "Pastikan deteksi terbaru sudah tersimpan, lalu coba lagi.")
             else:
                 QMessageBox.warning(self, "Warning", "Tidak ada data valid yang bisa dihapus!")
 
@@ -1301,6 +1338,7 @@ class MainWindow(QMainWindow):
             start_date = None
             end_date = None
             sql_filter = ""
+            sql_params = []  # Nilai untuk placeholder ? di sql_filter
             date_range_desc = ""
 
             try:
@@ -1350,25 +1388,28 @@ class MainWindow(QMainWindow):
                          date_range_desc = f"{start_date.strftime('%d-%m-%Y')} s/d {end_date.strftime('%d-%m-%Y')}"
                     else:
                          date_range_desc = f"{start_date_str_id} s/d {end_date_str_id}"
-                    sql_filter = f"WHERE timestamp BETWEEN '{start_date_str_db}' AND '{end_date_str_db}'"
+                    sql_filter = "WHERE timestamp BETWEEN ? AND ?"  # Range parameterized (memakai index timestamp)
+                    sql_params.extend([start_date_str_db, end_date_str_db])
 
                 selected_export_preset = dialog.export_preset_combo.currentText()
                 if selected_export_preset == "Preset":
                     selected_export_preset = self.preset_combo.currentText()
                 
                 if sql_filter:
-                    sql_filter += f" AND preset = '{selected_export_preset}'"
+                    sql_filter += " AND preset = ?"
                 else:
-                    sql_filter = f"WHERE preset = '{selected_export_preset}'"
+                    sql_filter = "WHERE preset = ?"
+                sql_params.append(selected_export_preset)
 
                 # Filter label
                 if dialog.export_label_filter_enabled.isChecked():
                     selected_export_label = dialog.export_label_type_combo.currentText()
                     if selected_export_label and selected_export_label != "All Label":
                         if sql_filter:
-                            sql_filter += f" AND target_session = '{selected_export_label}'"
+                            sql_filter += " AND target_session = ?"
                         else:
-                            sql_filter = f"WHERE target_session = '{selected_export_label}'"
+                            sql_filter = "WHERE target_session = ?"
+                        sql_params.append(selected_export_label)
                         # Karena Label sudah ada di A3-B3, A1-B1 hanya untuk Date saja
 
                 dialog.accept()
@@ -1402,7 +1443,9 @@ class MainWindow(QMainWindow):
                         sql_filter, 
                         date_range_desc, 
                         dialog.export_label_type_combo.currentText() if dialog.export_label_filter_enabled.isChecked() else "",
-                        selected_export_preset
+                        selected_export_preset,
+                        sql_params,
+                        dialog.export_format_combo.currentText()
                     ), 
                     daemon=True
                 ).start()
@@ -1424,9 +1467,9 @@ class MainWindow(QMainWindow):
                 pass
             self.btn_export.setEnabled(True)
 
-    def _execute_export_thread(self, sql_filter, date_range_desc, export_label="", current_preset=""):
-        #Thread untuk proses export data ke Excel.
-        from export import execute_export
+    def _execute_export_thread(self, sql_filter, date_range_desc, export_label="", current_preset="", sql_params=None, export_format="Excel"):
+        #Thread untuk proses export data ke Excel, atau log mentah ke CSV/Parquet.
+        from export import execute_export, execute_tabular_export
     
         # Tidak perlu emit status signal karena bisa menyebabkan error
         # User akan melihat hasil di message box
@@ -1440,7 +1483,11 @@ class MainWindow(QMainWindow):
             # Emit signal untuk update progress dialog
             self.export_progress_signal.emit(message, f"{current}")
         
-        result = execute_export(sql_filter, date_range_desc, export_label, current_preset, progress_callback)
+        if export_format == "Excel":
+            result = execute_export(sql_filter, date_range_desc, export_label, current_preset, progress_callback, sql_params)
+        else:
+            # CSV/Parquet: filter yang sama, tanpa gambar (image_path sebagai referensi)
+            result = execute_tabular_export(sql_filter, export_format, progress_callback, sql_params)
         
         self.export_result_signal.emit(result)
 
@@ -1464,7 +1511,7 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "Info", "Tidak ada data !")
             self._update_export_button_ui("Export Gagal!", "danger")
         elif result.startswith("EXPORT_ERROR:"):
-            QMessageBox.critical(self, "Error Export", f"Gagal mengekspor data ke Excel:\n{result[13:]}")
+            QMessageBox.critical(self, "Error Export", f"Gagal mengekspor data:\n{result[13:]}")
             self._update_export_button_ui("Export Gagal!", "danger")
         else:
             # Export berhasil - tampilkan custom dialog dengan button open folder
@@ -6,7 +6,7 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt, QTimer, QDate
 from PySide6.QtGui import QFont
 from datetime import datetime, timedelta, time as py_time
-from config import MONTHS, MONTH_MAP
+from config import MONTHS, MONTH_MAP, EXPORT_FORMATS
 
 def create_export_dialog(parent, logic, preset_combo, jis_type_combo):
     from database import get_detection_count
@@ -24,7 +24,7 @@ def create_export_dialog(parent, logic, preset_combo, jis_type_combo):
     # Buat dialog dengan ukuran COMPACT seperti di foto
     dialog = QDialog(parent)
     dialog.setWindowTitle("EXPORT DATA OPTION")
-    dialog.setFixedSize(300, 350)  # Ukuran lebih kecil dan compact
+    dialog.setFixedSize(300, 405)  # Ukuran lebih kecil dan compact
     
     # Main layout
     main_layout = QVBoxLayout(dialog)
@@ -276,6 +276,23 @@ def create_export_dialog(parent, logic, preset_combo, jis_type_combo):
     
     main_layout.addWidget(date_range_group)
 
+    # ===== ROW 4: Format File =====
+    # Excel: laporan dengan gambar | CSV/Parquet: log mentah tanpa gambar (cepat untuk data berbulan-bulan)
+    format_group = QGroupBox("Format File")
+    format_group.setFont(QFont("Arial", 9, QFont.Bold))
+    format_group.setStyleSheet(group_style)
+    format_layout = QHBoxLayout(format_group)
+    format_layout.setContentsMargins(8, 12, 8, 8)
+    format_layout.setSpacing(6)
+
+    export_format_combo = QComboBox()
+    export_format_combo.setStyleSheet(combo_style)
+    export_format_combo.addItems(EXPORT_FORMATS)
+    export_format_combo.setCurrentIndex(0)
+    format_layout.addWidget(export_format_combo)
+
+    main_layout.addWidget(format_group)
+
     # ===== LOGIKA CHECKBOX =====
     # Fungsi untuk handle checkbox "Pilih Bulan"
     def on_month_checkbox_toggled(checked):
@@ -361,6 +378,7 @@ def create_export_dialog(parent, logic, preset_combo, jis_type_combo):
     dialog.export_preset_combo = export_preset_combo
     dialog.export_label_filter_enabled = export_label_filter_enabled
     dialog.export_label_type_combo = export_label_type_combo
+    dialog.export_format_combo = export_format_combo
     # export_range_var tidak perlu lagi karena sudah ada di dialog._export_range_value
     dialog.export_btn = export_btn
     dialog.month_combo = month_combo
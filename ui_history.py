@@ -0,0 +1,130 @@
+# Model tabel untuk panel "Data Barang" (riwayat deteksi per target session)
+# File ini berisi DetectionHistoryModel (QAbstractTableModel) di atas DetectionStore dari detection_store.py
+# Tujuan: Deteksi baru cukup di-insert sebagai baris baru (tanpa clear + rebuild semua item),
+#         view hanya merender baris yang terlihat (virtual scrolling)
+from PySide6.QtCore import Qt, QAbstractTableModel, QModelIndex
+from PySide6.QtGui import QColor
+
+# Kolom tabel: (judul header, key record)
+HISTORY_COLUMNS = [
+    ("Waktu", 'Time'),
+    ("Label", 'Code'),
+    ("Status", 'Status'),
+    ("Path Gambar", 'ImagePath'),
+    ("ID", 'ID'),
+]
+COLUMN_IMAGE_PATH = 3  #Index kolom path gambar (hidden)
+COLUMN_ID = 4  #Index kolom ID (hidden)
+
+NOT_OK_BACKGROUND = QColor(255, 0, 0)  #Warna background baris Not OK
+NOT_OK_FOREGROUND = QColor(255, 255, 255)  #Warna text baris Not OK
+
+
+class DetectionHistoryModel(QAbstractTableModel):
+    # Model riwayat deteksi untuk 1 target session, baris paling atas = deteksi terbaru
+    # Record disimpan urut waktu (append O(1)), baris view dipetakan terbalik: row 0 = record terakhir
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._records = []  #Record session ini (urut berdasarkan waktu, paling lama di depan)
+        self._store = None  #DetectionStore sumber data
+        self._session = None  #Target session yang sedang ditampilkan
+        self._generation = None  #Generation store saat terakhir sinkron (beda = perlu reset)
+
+    # === API QAbstractTableModel ===
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(HISTORY_COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if orientation == Qt.Horizontal:
+            if role == Qt.DisplayRole:
+                return HISTORY_COLUMNS[section][0]
+            if role == Qt.TextAlignmentRole:
+                return int(Qt.AlignCenter)
+        return None
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.record_at(index.row())
+        if record is None:
+            return None
+
+        if role == Qt.DisplayRole:
+            column = index.column()
+            if column == 0:
+                return record['Time'][11:19]  #Hanya jam (HH:MM:SS)
+            if column == 1:
+                return f"{record['Code']} ({record['Type']})"
+            if column == 2:
+                return record.get('Status', 'OK')
+            if column == COLUMN_IMAGE_PATH:
+                return record.get('ImagePath', '')
+            return str(record.get('ID', ''))
+
+        # Baris Not OK: background merah dan text putih untuk semua kolom
+        if record.get('Status', 'OK') == "Not OK":
+            if role == Qt.BackgroundRole:
+                return NOT_OK_BACKGROUND
+            if role == Qt.ForegroundRole:
+                return NOT_OK_FOREGROUND
+        return None
+
+    # === Sinkronisasi dengan DetectionStore ===
+
+    def record_at(self, row):
+        # Return: record untuk baris view (row 0 = terbaru) atau None
+        if 0 <= row < len(self._records):
+            return self._records[len(self._records) - 1 - row]
+        return None
+
+    def clear(self):
+        # Fungsi untuk kosongkan tabel (tidak ada label dipilih / sebelum refresh)
+        self.beginResetModel()
+        self._records = []
+        self._store = None
+        self._session = None
+        self._generation = None
+        self.endResetModel()
+
+    def show_session(self, store, session):
+        # Fungsi untuk tampilkan record 1 target session dari store
+        # Jika store dan session sama seperti sebelumnya dan store hanya bertambah (generation sama),
+        # hanya record baru yang di-insert (O(jumlah record baru), bukan O(jumlah record hari ini))
+        if store is not self._store or session != self._session or store.generation != self._generation:
+            self.beginResetModel()
+            self._store = store
+            self._session = session
+            self._generation = store.generation
+            self._records = list(store.session_records(session))
+            self.endResetModel()
+            return
+
+        new_records = store.session_records(session, start=len(self._records))
+        if not new_records:
+            return
+        # Record baru tampil di atas: insert baris 0..n-1
+        self.beginInsertRows(QModelIndex(), 0, len(new_records) - 1)
+        self._records.extend(new_records)
+        self.endInsertRows()
+
+    def remove_ids(self, record_ids):
+        # Fungsi untuk hapus baris berdasarkan ID secara incremental (setelah delete dari store berhasil)
+        record_ids = set(record_ids)
+        # Loop dari record paling lama (baris paling bawah): setelah 1 record dihapus,
+        # nomor baris record sesudahnya tetap sama karena jumlah record juga berkurang 1
+        position = 0
+        while position < len(self._records):
+            if self._records[position]['ID'] not in record_ids:
+                position += 1
+                continue
+            row = len(self._records) - 1 - position
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self._records[position]
+            self.endRemoveRows()
+        if self._store is not None:
+            self._generation = self._store.generation  #Store sudah sinkron dengan model
@@ -0,0 +1,93 @@
+# Widget tampilan video kamera dengan overlay hasil deteksi
+# File ini berisi VideoWidget (QLabel) yang menampilkan frame preview dan menggambar overlay bounding box dengan QPainter
+# Tujuan: Bounding box, label, dan status OK/Not OK tidak digambar ke setiap frame (copy + rasterize OpenCV),
+#         tapi dikirim 1 kali sebagai data vektor dari DetectionLogic dan digambar saat widget di-paint
+from PySide6.QtWidgets import QLabel
+from PySide6.QtCore import Qt, QTimer, QPointF, QRectF
+from PySide6.QtGui import QPainter, QPen, QColor, QFont, QFontMetrics, QPolygonF
+
+OVERLAY_OK_COLOR = QColor(0, 255, 0)  #Warna bounding box + label untuk status OK (dan tanpa target)
+OVERLAY_NOT_OK_COLOR = QColor(255, 0, 0)  #Warna bounding box + label untuk status Not OK
+OVERLAY_TEXT_COLOR = QColor(0, 0, 0)  #Warna text label di atas background warna status
+
+
+class VideoWidget(QLabel):
+    # QLabel untuk frame preview + overlay deteksi
+    # Overlay: dictionary dari DetectionLogic (lihat DetectionLogic._emit_overlay):
+    #   'polygons' (list polygon, titik dalam koordinat preview ter-normalisasi 0..1), 'label' (kode),
+    #   'status' ("OK" / "Not OK" / None), 'duration' (detik overlay ditampilkan)
+
+    def __init__(self, text="", parent=None):
+        super().__init__(text, parent)
+        self._overlay = None  #Overlay yang sedang ditampilkan (None = tidak ada)
+        self._overlay_timer = QTimer(self)  #Hapus overlay setelah duration
+        self._overlay_timer.setSingleShot(True)
+        self._overlay_timer.timeout.connect(self.clear_overlay)
+        self._overlay_font = QFont()
+        self._overlay_font.setPointSize(12)
+        self._overlay_font.setBold(True)
+
+    def set_overlay(self, overlay):
+        # Fungsi set overlay baru (slot untuk overlay_signal) | None = hapus overlay
+        self._overlay = overlay
+        if overlay and overlay.get('duration'):
+            self._overlay_timer.start(int(overlay['duration'] * 1000))
+        else:
+            self._overlay_timer.stop()
+        self.update()
+
+    def clear_overlay(self):
+        # Fungsi hapus overlay (timer habis, kamera stop)
+        self.set_overlay(None)
+
+    def _pixmap_rect(self):
+        # Return: QRectF area pixmap yang tampil di widget (pixmap di-center karena AlignCenter) | None jika tidak ada pixmap
+        pixmap = self.pixmap()
+        if pixmap is None or pixmap.isNull():
+            return None
+        # Ukuran logis pixmap (deviceIndependentSize() baru ada di Qt 6.2, requirements masih PySide6>=6.0)
+        ratio = pixmap.devicePixelRatio() or 1.0
+        width = pixmap.width() / ratio
+        height = pixmap.height() / ratio
+        area = self.contentsRect()
+        return QRectF(area.x() + (area.width() - width) / 2,
+                      area.y() + (area.height() - height) / 2,
+                      width, height)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)  #Gambar frame preview (pixmap) seperti QLabel biasa
+        if not self._overlay:
+            return
+        rect = self._pixmap_rect()
+        if rect is None:
+            return
+
+        color = OVERLAY_NOT_OK_COLOR if self._overlay.get('status') == "Not OK" else OVERLAY_OK_COLOR
+        painter = QPainter(self)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setFont(self._overlay_font)
+        metrics = QFontMetrics(self._overlay_font)
+
+        label = self._overlay.get('label') or ""
+        if self._overlay.get('status'):
+            label = f"{label} ({self._overlay['status']})"
+
+        for points in self._overlay.get('polygons', []):
+            # Titik ter-normalisasi -> koordinat widget
+            polygon = QPolygonF([QPointF(rect.x() + x * rect.width(), rect.y() + y * rect.height()) for x, y in points])
+
+            # Bounding box (kotak) tebal 3px
+            painter.setPen(QPen(color, 3))
+            painter.setBrush(Qt.NoBrush)
+            painter.drawPolygon(polygon)
+
+            # Label di atas kotak dengan background warna status
+            if label:
+                bounds = polygon.boundingRect()
+                text_rect = QRectF(bounds.left(), bounds.top() - metrics.height() - 6,
+                                   metrics.horizontalAdvance(label) + 10, metrics.height() + 6)
+                painter.fillRect(text_rect, color)
+                painter.setPen(OVERLAY_TEXT_COLOR)
+                painter.drawText(text_rect, Qt.AlignCenter, label)
+
+        painter.end()
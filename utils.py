@@ -290,6 +290,44 @@ def convert_frame_to_binary(frame):
     # Return: frame dengan background hitam dan garis putih neon
     return apply_edge_detection(frame)
 
+
+def draw_bounding_box(frame, bbox, label_text):
+    """
+    Fungsi untuk menggambar bounding box pada frame
+    Tujuan: Visual indicator untuk area kode yang terdeteksi (preview dan gambar yang disimpan)
+    Parameter: frame (numpy array), bbox (list of points), label_text (string)
+    Return: frame baru dengan bounding box tergambar (frame asli tidak diubah)
+    """
+    if bbox is None or len(bbox) == 0:
+        return frame
+    
+    frame_with_box = frame.copy()
+    
+    # Convert bbox points to integer tuples
+    # bbox dari EasyOCR format: [[x1,y1], [x2,y2], [x3,y3], [x4,y4]]
+    points = np.array(bbox, dtype=np.int32)
+    
+    # Draw polygon (kotak) dengan warna hijau tebal
+    cv2.polylines(frame_with_box, [points], isClosed=True, color=(0, 255, 0), thickness=3)
+    
+    # Calculate position untuk label text (di atas kotak)
+    x_min = int(min([p[0] for p in bbox]))
+    y_min = int(min([p[1] for p in bbox]))
+    
+    # Draw background rectangle untuk text
+    text_size = cv2.getTextSize(label_text, cv2.FONT_HERSHEY_SIMPLEX, 0.8, 2)[0]
+    cv2.rectangle(frame_with_box, 
+                 (x_min, y_min - text_size[1] - 10), 
+                 (x_min + text_size[0] + 10, y_min),
+                 (0, 255, 0), -1)
+    
+    # Draw text label
+    cv2.putText(frame_with_box, label_text, 
+               (x_min + 5, y_min - 5),
+               cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 0, 0), 2)
+    
+    return frame_with_box
+
 def get_camera_name(index):
     """
     Fungsi untuk mendapatkan nama device kamera yang sebenarnya